@@ -1,8 +1,26 @@
-from typing import Any, Optional, TypeVar, Union
+from typing import (
+    Any, AsyncIterator, Iterable, List, Optional, Tuple, TypeVar, Union
+)
 
 from redis.asyncio.client import Redis, Pipeline
+from redis.exceptions import NoScriptError
 
-from RSO.base import BaseModel, BaseHashIndex, BaseListIndex, BaseSetIndex
+from RSO.base import (
+    CHUNK_SIZE,
+    HASH_INDEX_SEARCH_SCRIPT,
+    HASH_INDEX_SEARCH_SHA,
+    SCAN_COUNT,
+    BaseModel,
+    BaseHashIndex,
+    BaseListIndex,
+    BaseSetIndex,
+    BaseSortedSetIndex,
+    decode_cursor,
+    encode_cursor,
+)
+from RSO.cache import MISSING
+from RSO.cluster import is_cluster
+from RSO.codec import MODEL
 
 
 T = TypeVar('T')
@@ -11,12 +29,25 @@ T_REDIS = Redis
 T_REDIS_PIPE = Union[Redis, Pipeline]
 
 
+async def evalsha(
+    redis: T_REDIS, script: str, sha: str, keys: list, args: list,
+    **options
+):
+    """EVALSHA cached `script`, load the script when redis lost it"""
+    command = ('EVALSHA', sha, len(keys), *keys, *args)
+    try:
+        return await redis.execute_command(*command, **options)
+    except NoScriptError:
+        await redis.script_load(script)
+        return await redis.execute_command(*command, **options)
+
+
 class HashIndex(BaseHashIndex):
     @classmethod
     async def save(
         cls, redis: T_PIPE, model_obj: T
     ) -> None:
-        index_value = getattr(model_obj, cls.__key__)
+        index_value = cls.index_key_value(model_obj)
         redis.hset(cls.redis_key(), mapping={
             index_value: cls.model_key_value(model_obj)
         })
@@ -25,18 +56,49 @@ class HashIndex(BaseHashIndex):
     async def remove(
         cls, redis: T_PIPE, model_obj: T
     ) -> None:
-        redis.hdel(cls.redis_key(), cls.index_key_value(model_obj))
+        await cls.remove_value(
+            redis,
+            cls.index_key_value(model_obj),
+            cls.model_key_value(model_obj)
+        )
 
     @classmethod
-    async def search_model(cls, redis: T_REDIS, index_value):
-        redis_key = cls.redis_key()
-        if not bool(await redis.exists(redis_key)):
-            return
+    async def remove_value(
+        cls, redis: T_PIPE, index_value: Any, model_value: Any
+    ) -> None:
+        redis.hdel(cls.redis_key(), cls.encode_index_value(index_value))
 
-        model_key_value = await redis.hmget(redis_key, index_value)
-        if model_key_value and isinstance(model_key_value, list):
-            model_key_value = model_key_value[0]
-        return await cls.__model__.search(redis, model_key_value)
+    @classmethod
+    async def search_model(
+        cls, redis: T_REDIS, index_value, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ):
+        index_value = cls.encode_index_value(index_value)
+        model_class = cls.__model__
+        fields = model_class._projection(only, defer)
+        instance = cls._cached_search_model(index_value, mode, fields)
+        if instance is not MISSING:
+            return instance
+        generation = model_class._cache_generation()
+
+        if is_cluster(redis) and not model_class.__hash_tag__:
+            # index and model keys are in different slots
+            key_value = await redis.hget(cls.redis_key(), index_value)
+            result = None
+            if key_value is not None:
+                result = await model_class._queue_search(
+                    redis, model_class.decode_key_value(key_value), fields
+                )
+        else:
+            keys, args = cls._search_script_params(index_value, fields)
+            result = await evalsha(
+                redis, HASH_INDEX_SEARCH_SCRIPT, HASH_INDEX_SEARCH_SHA, keys,
+                args, **model_class.__layout__.read_options
+            )
+        return cls._parse_search_script(
+            index_value, result, generation, mode, fields
+        )
 
 
 class ListIndex(BaseListIndex):
@@ -51,34 +113,102 @@ class ListIndex(BaseListIndex):
         cls, redis: T_PIPE, model_obj: T, count: int = 1
     ):
         """count = 0 to remove all"""
-        redis.lrem(
-            cls.redis_key(model_obj),
-            count,
-            cls.model_key_value(model_obj)
+        await cls.remove_value(
+            redis,
+            cls.index_key_value(model_obj),
+            cls.model_key_value(model_obj),
+            count
         )
 
+    @classmethod
+    async def remove_value(
+        cls, redis: T_PIPE, index_value: Any, model_value: Any, count: int = 0
+    ) -> None:
+        """count = 0 to remove all"""
+        redis.lrem(cls.redis_key_from_value(index_value), count, model_value)
+
     @classmethod
     async def get_members(cls, redis: T_REDIS, index_value):
         redis_key = cls.redis_key_from_value(index_value)
-        return await redis.lrange(redis_key, 0, -1)
+        return cls.__model__.decode_key_values(
+            await redis.lrange(redis_key, 0, -1)
+        )
+
+    @classmethod
+    async def iter_members(
+        cls, redis: T_REDIS, index_value: Any, count: int = SCAN_COUNT
+    ) -> AsyncIterator[Any]:
+        """Iterate members by LRANGE windows of `count` members"""
+        redis_key = cls.redis_key_from_value(index_value)
+        start = 0
+        while True:
+            values = await redis.lrange(redis_key, start, start + count - 1)
+            for value in cls.__model__.decode_key_values(values):
+                yield value
+            if len(values) < count:
+                return
+            start += count
 
     @classmethod
-    async def search_models(cls, redis: T_REDIS, index_value):
+    async def page_members(
+        cls, redis: T_REDIS, index_value: Any, cursor: Optional[str] = None,
+        count: int = SCAN_COUNT
+    ) -> Tuple[List[Any], Optional[str]]:
+        """LRANGE window of `count` members from `cursor` token, `None` for
+        the first page, and the next page token, `None` after the last page
+        """
         redis_key = cls.redis_key_from_value(index_value)
-        if not bool(await redis.exists(redis_key)):
-            return []
+        start = decode_cursor(cursor, redis_key)
+        values = await redis.lrange(redis_key, start, start + count - 1)
+        if len(values) < count:
+            cursor = None
+        else:
+            cursor = encode_cursor(redis_key, start + count)
+        return cls.__model__.decode_key_values(values), cursor
 
-        model_instances = []
-        for value in (await redis.lrange(redis_key, 0, -1)):
-            model_instance = await cls.__model__.search(redis, value)
-            model_instances.append(model_instance)
-        return model_instances
+    @classmethod
+    async def page_models(
+        cls, redis: T_REDIS, index_value: Any, cursor: Optional[str] = None,
+        count: int = SCAN_COUNT, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> Tuple[List[BaseModel], Optional[str]]:
+        """Models of `page_members` page and the next page token"""
+        members, cursor = await cls.page_members(
+            redis, index_value, cursor, count
+        )
+        models = await cls.__model__.get_many(
+            redis, members, count, mode, only, defer
+        )
+        return [model for model in models if model is not None], cursor
+
+    @classmethod
+    async def search_models(
+        cls, redis: T_REDIS, index_value, chunk_size: int = CHUNK_SIZE,
+        mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ):
+        members = await cls.get_members(redis, index_value)
+        return await cls.__model__.get_many(
+            redis, members, chunk_size, mode, only, defer
+        )
+
+    @classmethod
+    async def delete_members(
+        cls, redis: T_REDIS, index_value, chunk_size: int = CHUNK_SIZE
+    ) -> int:
+        """Delete member models, their index entries and this index key"""
+        members = dict.fromkeys(await cls.get_members(redis, index_value))
+        deleted = await cls.__model__.delete_many(redis, members, chunk_size)
+        await redis.delete(cls.redis_key_from_value(index_value))
+        return deleted
 
     @classmethod
     async def has_member(cls, redis: T_REDIS, model_obj: T) -> bool:
         return await cls.has_member_value(
             redis,
-            getattr(model_obj, cls.__key__),
+            cls.index_key_value(model_obj),
             getattr(model_obj, model_obj.__key__)
         )
 
@@ -89,13 +219,13 @@ class ListIndex(BaseListIndex):
         if hasattr(redis, 'lpos'):
             result = await redis.lpos(
                 cls.redis_key_from_value(index_value),
-                model_value
+                cls.__model__.encode_key_value(model_value)
             )
         else:
             result = await redis.execute(
                 'LPOS',
                 cls.redis_key_from_value(index_value),
-                model_value
+                cls.__model__.encode_key_value(model_value)
             )
         return result is not None
 
@@ -108,7 +238,9 @@ class ListIndex(BaseListIndex):
             return
         else:
             model_value = await redis.rpoplpush(redis_key, redis_key)
-            return await cls.__model__.search(redis, model_value)
+            return await cls.__model__.search(
+                redis, cls.__model__.decode_key_value(model_value)
+            )
 
 
 class SetIndex(BaseSetIndex):
@@ -121,24 +253,182 @@ class SetIndex(BaseSetIndex):
 
     @classmethod
     async def remove(cls, redis: T_PIPE, model_obj: T) -> None:
-        redis.srem(
-            cls.redis_key(model_obj),
+        await cls.remove_value(
+            redis,
+            cls.index_key_value(model_obj),
             cls.model_key_value(model_obj)
         )
 
+    @classmethod
+    async def remove_value(
+        cls, redis: T_PIPE, index_value: Any, model_value: Any
+    ) -> None:
+        redis.srem(cls.redis_key_from_value(index_value), model_value)
+
     @classmethod
     async def get_members(cls, redis: T_REDIS, index_value):
         redis_key = cls.redis_key_from_value(index_value)
-        return await redis.smembers(redis_key)
+        return cls.__model__.decode_key_values(
+            await redis.smembers(redis_key)
+        )
 
     @classmethod
-    async def search_models(cls, redis: T_REDIS, index_value):
+    async def iter_members(
+        cls, redis: T_REDIS, index_value: Any, count: int = SCAN_COUNT
+    ) -> AsyncIterator[Any]:
+        """Iterate members by SSCAN pages of `count` hint
+
+        SSCAN may return a member more than once.
+        """
         redis_key = cls.redis_key_from_value(index_value)
-        if not bool(await redis.exists(redis_key)):
-            return []
+        cursor = None
+        while cursor != 0:
+            cursor, values = await redis.sscan(
+                redis_key, cursor or 0, count=count
+            )
+            for value in cls.__model__.decode_key_values(values):
+                yield value
 
+    @classmethod
+    async def page_members(
+        cls, redis: T_REDIS, index_value: Any, cursor: Optional[str] = None,
+        count: int = SCAN_COUNT
+    ) -> Tuple[List[Any], Optional[str]]:
+        """SSCAN page of `count` hint from `cursor` token, `None` for the
+        first page, and the next page token, `None` after the last page
+
+        Page may be empty before the last page.
+        """
+        redis_key = cls.redis_key_from_value(index_value)
+        position, values = await redis.sscan(
+            redis_key, decode_cursor(cursor, redis_key), count=count
+        )
+        cursor = encode_cursor(redis_key, position) if position else None
+        return cls.__model__.decode_key_values(values), cursor
+
+    @classmethod
+    async def page_models(
+        cls, redis: T_REDIS, index_value: Any, cursor: Optional[str] = None,
+        count: int = SCAN_COUNT, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> Tuple[List[BaseModel], Optional[str]]:
+        """Models of `page_members` page and the next page token"""
+        members, cursor = await cls.page_members(
+            redis, index_value, cursor, count
+        )
+        models = await cls.__model__.get_many(
+            redis, members, count, mode, only, defer
+        )
+        return [model for model in models if model is not None], cursor
+
+    @classmethod
+    async def search_models(
+        cls, redis: T_REDIS, index_value, chunk_size: int = CHUNK_SIZE,
+        mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ):
+        """Load members using SSCAN pages of `chunk_size`
+
+        The next SSCAN page is requested on the same pipeline as
+        the current page models, so each page costs a single round trip.
+        """
+        redis_key = cls.redis_key_from_value(index_value)
+        model_class = cls.__model__
+        fields = model_class._projection(only, defer)
         model_instances = []
-        for value in (await redis.smembers(redis_key)):
-            model_instance = await cls.__model__.search(redis, value)
-            model_instances.append(model_instance)
+        seen = set()
+        cursor, values = await redis.sscan(redis_key, 0, count=chunk_size)
+        while values or cursor:
+            # SSCAN may return a member more than once
+            values = [
+                value for value in model_class.decode_key_values(values)
+                if value not in seen
+            ]
+            seen.update(values)
+            async with redis.pipeline(transaction=False) as pipe:
+                for value in values:
+                    model_class._queue_search(pipe, value, fields)
+                if cursor:
+                    pipe.sscan(redis_key, cursor, count=chunk_size)
+                result_data = await pipe.execute()
+            if cursor:
+                cursor, values = result_data.pop()
+            else:
+                values = []
+            model_instances.extend(
+                model_class._parse_search(data, mode, fields)
+                for data in result_data
+            )
         return model_instances
+
+    @classmethod
+    async def delete_members(
+        cls, redis: T_REDIS, index_value, chunk_size: int = CHUNK_SIZE
+    ) -> int:
+        """Delete member models, their index entries and this index key"""
+        members = await cls.get_members(redis, index_value)
+        deleted = await cls.__model__.delete_many(redis, members, chunk_size)
+        await redis.delete(cls.redis_key_from_value(index_value))
+        return deleted
+
+
+class SortedSetIndex(BaseSortedSetIndex):
+    @classmethod
+    async def save(cls, redis: T_REDIS_PIPE, model_obj: T) -> None:
+        redis.zadd(cls.redis_key(), {
+            cls.model_key_value(model_obj):
+                cls.score(getattr(model_obj, cls.__key__))
+        })
+
+    @classmethod
+    async def remove(cls, redis: T_PIPE, model_obj: T) -> None:
+        await cls.remove_value(
+            redis,
+            cls.index_key_value(model_obj),
+            cls.model_key_value(model_obj)
+        )
+
+    @classmethod
+    async def remove_value(
+        cls, redis: T_PIPE, index_value: Any, model_value: Any
+    ) -> None:
+        redis.zrem(cls.redis_key(), model_value)
+
+    @classmethod
+    async def range_members(
+        cls, redis: T_REDIS, min: Any = None, max: Any = None,
+        offset: int = 0, limit: Optional[int] = None, reverse: bool = False
+    ):
+        """Primary key values of index values from `min` to `max`"""
+        return cls.__model__.decode_key_values(await redis.execute_command(
+            *cls._range_command(min, max, offset, limit, reverse)
+        ))
+
+    @classmethod
+    async def range_models(
+        cls, redis: T_REDIS, min: Any = None, max: Any = None,
+        offset: int = 0, limit: Optional[int] = None, reverse: bool = False,
+        chunk_size: int = CHUNK_SIZE, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ):
+        """Models of index values from `min` to `max` ordered by index
+        value, loaded by pipelined `get_many`
+        """
+        members = await cls.range_members(
+            redis, min, max, offset, limit, reverse
+        )
+        return [
+            model for model in await cls.__model__.get_many(
+                redis, members, chunk_size, mode, only, defer
+            )
+            if model is not None
+        ]
+
+    @classmethod
+    async def count_range(
+        cls, redis: T_REDIS, min: Any = None, max: Any = None
+    ) -> int:
+        return await redis.execute_command(*cls._count_command(min, max))
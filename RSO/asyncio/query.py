@@ -0,0 +1,62 @@
+"""Set algebra queries of asyncio models, see `RSO.query`"""
+from typing import Any, Iterable, List, Optional
+
+from redis.asyncio.client import Redis
+
+from RSO.base import CHUNK_SIZE, BaseModel
+from RSO.cluster import transaction_allowed
+from RSO.codec import MODEL
+from RSO.query import BaseQuery
+
+
+class Query(BaseQuery):
+    async def _execute(
+        self, redis: Redis, read: str, offset: int = 0,
+        limit: Optional[int] = None
+    ) -> Any:
+        self._check_cluster(redis)
+        transaction = transaction_allowed(redis, self.model)
+        if self.ttl is not None and self._operation[0] is not None:
+            async with redis.pipeline(transaction=transaction) as pipe:
+                for command in self._cached_commands(read, offset, limit):
+                    pipe.execute_command(*command)
+                exists, result = await pipe.execute()
+            if exists:
+                return result
+        commands, index = self._commands(read, offset, limit)
+        if len(commands) == 1:
+            return await redis.execute_command(*commands[0])
+        async with redis.pipeline(transaction=transaction) as pipe:
+            for command in commands:
+                pipe.execute_command(*command)
+            return (await pipe.execute())[index]
+
+    async def ids(
+        self, redis: Redis, offset: int = 0, limit: Optional[int] = None
+    ) -> List[Any]:
+        """Primary key values of the result, sorted when it is paged"""
+        return list(self.model.decode_key_values(
+            await self._execute(redis, 'members', offset, limit)
+        ))
+
+    async def count(self, redis: Redis) -> int:
+        return await self._execute(redis, 'count')
+
+    async def models(
+        self, redis: Redis, offset: int = 0, limit: Optional[int] = None,
+        chunk_size: int = CHUNK_SIZE, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> List[BaseModel]:
+        """Models of the result loaded by pipelined `get_many`"""
+        return [
+            model for model in await self.model.get_many(
+                redis, await self.ids(redis, offset, limit), chunk_size,
+                mode, only, defer
+            )
+            if model is not None
+        ]
+
+    async def clear(self, redis: Redis) -> None:
+        """Drop the kept result"""
+        await redis.delete(self.redis_key)
@@ -0,0 +1,146 @@
+"""Read/write routing of asyncio models, see `RSO.replica`"""
+import asyncio
+from time import perf_counter
+from typing import Callable, Iterable, List, Optional
+
+from redis.asyncio.client import Redis
+from redis.commands.core import AsyncCoreCommands
+
+from RSO.base import HASH_INDEX_SEARCH_SHA
+from RSO.replica import (
+    ALL,
+    CURSOR,
+    WRITE,
+    BaseReplicaRouter,
+    LatencyWindow,
+)
+
+
+class ReplicaRouter(BaseReplicaRouter, AsyncCoreCommands):
+    """Asyncio router of redis-py asyncio `Redis` primary and replica
+    clients, the late read of hedged read is cancelled
+    """
+
+    def __init__(
+        self, primary: Redis, replicas: Iterable[Redis],
+        pin_seconds: float = 0.0, hedge: Optional[LatencyWindow] = None,
+        read_only_scripts: Iterable[str] = (HASH_INDEX_SEARCH_SHA,)
+    ):
+        super().__init__(
+            primary, replicas, pin_seconds, hedge, read_only_scripts
+        )
+
+    async def __aenter__(self) -> 'ReplicaRouter':
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await asyncio.gather(*[
+            redis.aclose() for redis in [self.primary, *self.replicas]
+        ])
+
+    async def execute_command(self, *args, **options):
+        kind = self._command_kind(args)
+        if kind == WRITE:
+            self.pin()
+            return await self.primary.execute_command(*args, **options)
+        if kind == ALL:
+            for redis in self.replicas:
+                await redis.execute_command(*args, **options)
+            return await self.primary.execute_command(*args, **options)
+        if kind == CURSOR:
+            redis = self.replicas[0] if self.replicas else self.primary
+            return await redis.execute_command(*args, **options)
+        return await self._read(
+            lambda redis: redis.execute_command(*args, **options)
+        )
+
+    def pipeline(
+        self, transaction=True, shard_hint=None
+    ) -> 'ReplicaPipeline':
+        return ReplicaPipeline(self, transaction)
+
+    async def _timed(self, call: Callable, redis: Redis):
+        start = perf_counter()
+        result = await call(redis)
+        self.hedge.add(perf_counter() - start)
+        return result
+
+    async def _read(self, call: Callable):
+        """Reply of `call` of a replica, hedged by a second replica"""
+        nodes = self._read_nodes()
+        if self.hedge is None or len(nodes) < 2:
+            return await call(nodes[0])
+
+        pending = {asyncio.ensure_future(self._timed(call, nodes[0]))}
+        done, pending = await asyncio.wait(
+            pending, timeout=self.hedge.deadline()
+        )
+        if not done:
+            # late first replica
+            pending.add(asyncio.ensure_future(self._timed(call, nodes[1])))
+        error = None
+        try:
+            while True:
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                    error = error or future.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+class ReplicaPipeline(AsyncCoreCommands):
+    """Pipeline of a primary or replica pipeline, see `ReplicaRouter`
+
+    Pipeline of read only commands out of transaction is a read.
+    """
+
+    def __init__(self, router: ReplicaRouter, transaction=True):
+        self.router = router
+        self.transaction = transaction
+        self.command_stack: List[tuple] = []
+
+    async def __aenter__(self) -> 'ReplicaPipeline':
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        self.reset()
+
+    def __len__(self) -> int:
+        return len(self.command_stack)
+
+    def __bool__(self) -> bool:
+        return True
+
+    def reset(self) -> None:
+        self.command_stack = []
+
+    def execute_command(self, *args, **options) -> 'ReplicaPipeline':
+        self.command_stack.append((args, options))
+        return self
+
+    async def execute(self, raise_on_error: bool = True) -> list:
+        commands, self.command_stack = self.command_stack, []
+        router = self.router
+        if not commands:
+            return []
+
+        async def execute(redis: Redis) -> list:
+            async with redis.pipeline(transaction=self.transaction) as pipe:
+                for args, options in commands:
+                    pipe.execute_command(*args, **options)
+                return await pipe.execute(raise_on_error=raise_on_error)
+
+        if router._pipeline_kind(commands, self.transaction) == WRITE:
+            router.pin()
+            return await execute(router.primary)
+        return await router._read(execute)
@@ -0,0 +1,73 @@
+from typing import Iterable, List, Optional, Type
+
+from RSO.base import BaseSession
+from RSO.asyncio.model import Model
+
+
+class Session(BaseSession):
+    """Unit of work with identity map, see `RSO.base.BaseSession`
+
+    >>> async with Session(redis) as session:
+    ...     user = await session.search(UserModel, 1)
+    ...     user.email = 'new@email.com'
+    ...     session.add(user)
+
+    Queued models are flushed when the block exits without exception.
+    """
+
+    async def __aenter__(self) -> 'Session':
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            await self.flush()
+        else:
+            self.rollback()
+
+    async def search(
+        self, model_class: Type[Model], value
+    ) -> Optional[Model]:
+        redis_key = model_class.redis_key_from_value(value)
+        if redis_key not in self._identity_map:
+            self._identity_map[redis_key] = await model_class.search(
+                self.redis, value
+            )
+        return self._identity_map[redis_key]
+
+    async def get_many(
+        self, model_class: Type[Model], values: Iterable
+    ) -> List[Optional[Model]]:
+        """Same as `Model.get_many`, only unknown keys are loaded"""
+        values = list(values)
+        missing = self._missing_values(model_class, values)
+        if missing:
+            instances = await model_class.get_many(
+                self.redis, missing.values()
+            )
+            self._identity_map.update(zip(missing, instances))
+        return self._mapped(model_class, values)
+
+    async def flush(self) -> None:
+        """Write queued models in a single pipeline"""
+        if not self._pending:
+            return
+        async with self.redis.pipeline(
+            transaction=self.transaction
+        ) as pipe:
+            queued = []
+            for operations, model in self._pending.values():
+                for operation in operations:
+                    start = len(pipe)
+                    snapshot = None
+                    if operation == 'delete':
+                        await model.delete(pipe)
+                    else:
+                        snapshot = await model.save(pipe)
+                    queued.append((model, snapshot, start, len(pipe)))
+            try:
+                result = await pipe.execute(raise_on_error=False)
+            finally:
+                # search during execute may have cached the old model
+                for model, *_ in queued:
+                    model._cache_discard_model()
+        self._flushed(queued, result)
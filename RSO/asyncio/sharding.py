@@ -0,0 +1,146 @@
+"""Client side sharding of asyncio models, see `RSO.sharding`"""
+import asyncio
+from typing import Dict, Optional, Tuple
+
+from redis.asyncio.client import Redis
+from redis.commands.core import AsyncCoreCommands
+
+from RSO.base import SCAN_COUNT
+from RSO.sharding import (
+    REPLICAS,
+    BaseShardedPipeline,
+    BaseShardedRedis,
+    Shard,
+    key_moves,
+    restore_commands,
+)
+
+
+class ShardedRedis(BaseShardedRedis, AsyncCoreCommands):
+    """Asyncio sharded client of `nodes` name -> redis-py asyncio `Redis`
+    client, commands of several nodes run concurrently
+    """
+
+    def __init__(self, nodes: Dict[str, Redis], replicas: int = REPLICAS):
+        super().__init__(nodes, replicas)
+
+    async def __aenter__(self) -> 'ShardedRedis':
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await asyncio.gather(*[
+            node.redis.aclose() for node in self.get_primaries()
+        ])
+
+    async def execute_command(self, *args, **options):
+        calls, combine = self._route(args)
+        return combine(await asyncio.gather(*[
+            node.redis.execute_command(*node_args, **options)
+            for node, node_args in calls
+        ]))
+
+    async def scan(
+        self, cursor: int = 0, match=None, count=None, _type=None,
+        target_nodes=None, **kwargs
+    ) -> Tuple[Dict[str, int], list]:
+        """SCAN of every node or `target_nodes`, as cluster client does
+
+        Return cursor of every node name and keys found.
+        """
+        cursors, keys = {}, []
+        for node in self._target_nodes(target_nodes):
+            cursors[node.name], node_keys = await node.redis.scan(
+                cursor, match, count, _type, **kwargs
+            )
+            keys.extend(node_keys)
+        return cursors, keys
+
+    async def scan_iter(self, match=None, count=None, _type=None, **kwargs):
+        for node in self.get_primaries():
+            async for key in node.redis.scan_iter(
+                match, count, _type, **kwargs
+            ):
+                yield key
+
+    def pipeline(
+        self, transaction=None, shard_hint=None
+    ) -> 'ShardedPipeline':
+        """Pipeline of a pipeline per node, `transaction` is allowed for
+        keys of a single node
+        """
+        return ShardedPipeline(self, transaction)
+
+
+class ShardedPipeline(BaseShardedPipeline, AsyncCoreCommands):
+    async def __aenter__(self) -> 'ShardedPipeline':
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        self.reset()
+
+    def execute_command(self, *args, **options) -> 'ShardedPipeline':
+        self._queue(args, options)
+        return self
+
+    async def execute(self, raise_on_error: bool = True) -> list:
+        try:
+            node_commands, positions = self._node_commands()
+        finally:
+            self.reset()
+        transaction = bool(self.transaction)
+
+        async def execute_node(name: str, commands: list) -> list:
+            redis = self.client.get_node(name).redis
+            async with redis.pipeline(transaction=transaction) as pipe:
+                for args, options in commands:
+                    pipe.execute_command(*args, **options)
+                return await pipe.execute(raise_on_error=False)
+
+        replies = await asyncio.gather(*[
+            execute_node(name, commands)
+            for name, commands in node_commands.items()
+        ])
+        return self._result(
+            positions, dict(zip(node_commands, replies)), raise_on_error
+        )
+
+
+async def rebalance(
+    redis: ShardedRedis, match: Optional[str] = None,
+    count: int = SCAN_COUNT
+) -> int:
+    """Move keys to their node on the hash ring, see `RSO.sharding`"""
+    moved = 0
+    for node in redis.get_primaries():
+        cursor = 0
+        while True:
+            cursor, keys = await node.redis.scan(
+                cursor, match=match, count=count
+            )
+            moves = key_moves(redis, node, keys)
+            for owner, owner_keys in moves.items():
+                moved += await _move_keys(
+                    node, redis.get_node(owner), owner_keys
+                )
+            if not cursor:
+                break
+    return moved
+
+
+async def _move_keys(source: Shard, target: Shard, keys: list) -> int:
+    async with source.redis.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.dump(key)
+            pipe.pttl(key)
+        commands = restore_commands(keys, await pipe.execute())
+    if not commands:
+        return 0
+    async with target.redis.pipeline(transaction=False) as pipe:
+        for command in commands:
+            pipe.execute_command(*command)
+        await pipe.execute()
+    await source.redis.delete(*[command[1] for command in commands])
+    return len(commands)
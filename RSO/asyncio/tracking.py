@@ -0,0 +1,110 @@
+import asyncio
+from typing import Optional, Type
+
+from redis.asyncio.client import Redis
+from redis.asyncio.connection import Connection
+from redis.exceptions import ConnectionError, TimeoutError
+
+from RSO.base import BaseModel
+from RSO.cache import (
+    MISSING,
+    ModelCache,
+    invalidated_keys,
+    is_resp3,
+    tracking_commands,
+    tracking_connection_kwargs,
+)
+
+
+async def _push_message(message: list) -> list:
+    return message
+
+
+class TrackingCache(ModelCache):
+    """`ModelCache` invalidated by redis server-assisted client side caching
+
+    Same as `RSO.tracking.TrackingCache`, messages are read by a task
+    running on the event loop of `start` caller.
+
+    >>> UserModel.__cache__ = TrackingCache(ttl=None)
+    >>> await UserModel.__cache__.start(redis, UserModel)
+    """
+
+    def __init__(self, *args, retry_interval: float = 1.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.retry_interval = retry_interval
+        self._model_classes = []
+        self._connection: Optional[Connection] = None
+        self._connected = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(
+        self, redis: Redis, *model_classes: Type[BaseModel]
+    ) -> None:
+        """Track keys of `model_classes` on `redis` server"""
+        pool = redis.connection_pool
+        self._connection = pool.connection_class(
+            **tracking_connection_kwargs(pool.connection_kwargs)
+        )
+        self._model_classes = model_classes
+        await self._subscribe()
+        self._task = asyncio.ensure_future(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._connection is not None:
+            await self._connection.disconnect()
+            self._connection = None
+        self._connected = False
+        self.clear()
+
+    def get(self, key):
+        if not self._connected:
+            return MISSING
+        return super().get(key)
+
+    async def _read(self):
+        """Read reply or message, including RESP3 push messages"""
+        if is_resp3(self._connection):
+            return await self._connection.read_response(push_request=True)
+        return await self._connection.read_response()
+
+    async def _subscribe(self) -> None:
+        connection = self._connection
+        await connection.disconnect()
+        await connection.connect()
+        await connection.send_command('CLIENT', 'ID')
+        client_id = await connection.read_response()
+        resp3 = is_resp3(connection)
+        if resp3:
+            # redis-py drops `invalidate` push messages without handler
+            parser = getattr(connection, '_parser', None)
+            if hasattr(parser, 'set_invalidation_push_handler'):
+                parser.set_invalidation_push_handler(_push_message)
+        for command in tracking_commands(
+            client_id, self._model_classes, resp3
+        ):
+            await connection.send_command(*command)
+            await self._read()
+        self.clear()
+        self._connected = True
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                if not self._connected:
+                    await self._subscribe()
+                keys = invalidated_keys(await self._read())
+            except (ConnectionError, TimeoutError, OSError):
+                self._connected = False
+                self.clear()
+                await asyncio.sleep(self.retry_interval)
+                continue
+            if keys is not MISSING:
+                self.invalidate(keys)
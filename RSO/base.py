@@ -1,12 +1,117 @@
-from datetime import date, datetime
-from dataclasses import asdict, fields
-from enum import Enum
-from typing import Any, ClassVar, List, TypeVar
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from dataclasses import asdict
+from datetime import date, datetime, timezone
+from hashlib import sha1
+from itertools import islice
+from typing import (
+    Any, ClassVar, Dict, Iterable, Iterator, List, Optional, Sequence,
+    Tuple, TypeVar, Union
+)
 from uuid import UUID
 
+from RSO.cache import MISSING, ModelCache
+from RSO.codec import DEFERRED, MODEL, RAW, ROW, KeyCodec, model_codec
+from RSO.layout import HASH_LAYOUT, HashLayout
+from RSO.schema import key_schema
+
 T = TypeVar('T')
 
 REDIS_MODEL_PREFIX = None
+# default number of commands sent in a single pipeline by bulk operations
+CHUNK_SIZE = 500
+# default SCAN COUNT hint used when iterating models
+SCAN_COUNT = 1000
+
+# Resolve hash index value -> model primary key -> model fields on server.
+# KEYS[1]: hash index key
+# ARGV[1]: index value, ARGV[2]: model key prefix,
+# ARGV[3...]: `HashLayout.script_args`, read command and its arguments:
+# HMGET and model fields, GET of packed layout or HGET and bucket size
+HASH_INDEX_SEARCH_SCRIPT = """
+local model_key_value = redis.call('HGET', KEYS[1], ARGV[1])
+if not model_key_value then
+    return false
+end
+if ARGV[3] == 'GET' then
+    return redis.call('GET', ARGV[2] .. model_key_value)
+end
+if ARGV[3] == 'HGET' then
+    local bucket = math.floor(tonumber(model_key_value) / tonumber(ARGV[4]))
+    return redis.call(
+        'HGET', ARGV[2] .. ':bucket:' .. string.format('%d', bucket),
+        model_key_value
+    )
+end
+return redis.call('HMGET', ARGV[2] .. model_key_value, unpack(ARGV, 4))
+"""
+HASH_INDEX_SEARCH_SHA = sha1(HASH_INDEX_SEARCH_SCRIPT.encode()).hexdigest()
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def stored_text(value: Any) -> str:
+    """Text of a stored value, e.g. a number of txredisapi reply"""
+    if isinstance(value, bytes):
+        return value.decode()
+    return str(value)
+
+
+def apply_snapshots(queued: list, result: list) -> list:
+    """Take snapshots of models saved by an executed pipeline
+
+    `queued` is `(model, snapshot, start, end)` of every model written on
+    the pipeline, `snapshot` returned by `save` on the pipeline (`None` for
+    delete) and `start`, `end` the position of its commands. Snapshot is
+    taken only when none of the model replies of `result` is an error, so
+    failed model is written again by the next `save`. Return `(model,
+    error)` of failed models.
+    """
+    failed = []
+    for model, snapshot, start, end in queued:
+        error = next(
+            (item for item in result[start:end]
+             if isinstance(item, Exception)),
+            None
+        )
+        if error is not None:
+            failed.append((model, error))
+        elif snapshot is not None:
+            model._take_snapshot(snapshot)
+    return failed
+
+
+def encode_cursor(redis_key: str, position: int) -> str:
+    """Opaque page token of `position` (SSCAN cursor or list offset) of
+    `redis_key`, e.g. for HTTP pagination
+    """
+    digest = sha1(redis_key.encode()).hexdigest()[:8]
+    token = urlsafe_b64encode(f'{position}:{digest}'.encode()).decode()
+    return token.rstrip('=')
+
+
+def decode_cursor(token: Optional[str], redis_key: str) -> int:
+    """Position of `encode_cursor` token, `0` (first page) for `None`
+
+    Raise `ValueError` for invalid token or token of another key.
+    """
+    if token is None:
+        return 0
+    try:
+        text = urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        position, digest = text.split(':')
+        position = int(position)
+    except ValueError:
+        raise ValueError(f'Invalid cursor: {token!r}') from None
+    if position < 0 or digest != sha1(redis_key.encode()).hexdigest()[:8]:
+        raise ValueError(f'Invalid cursor: {token!r}')
+    return position
 
 
 class BaseIndex:
@@ -15,17 +120,82 @@ class BaseIndex:
     __index_name__: str = 'index'
     # Model class that using this index
     __model__: ClassVar
-    __key__: str
+    # model field, or tuple of model fields of compound index
+    __key__: Union[str, Tuple[str, ...]]
+    # short name of `__key__` in redis keys, e.g. `g` of `group_id`
+    __tag__: Optional[str] = None
 
     @classmethod
     def model_key_value(cls, model_obj: T) -> Any:
-        value = getattr(model_obj, model_obj.__key__)
+        """Stored primary key value of model, see `__key_codec__`"""
+        return model_obj.encode_key_value(
+            getattr(model_obj, model_obj.__key__)
+        )
+
+    @classmethod
+    def key_fields(cls) -> Tuple[str, ...]:
+        """Model fields of index value"""
+        if isinstance(cls.__key__, tuple):
+            return cls.__key__
+        return (cls.__key__,)
+
+    @classmethod
+    def encode_index_value(cls, value: Any) -> Any:
+        """Index value of compound index field values tuple
+
+        Stored text of the values are joined by `:`, backslash escapes `:`
+        of a value. `None` if any value is `None`. Value of single field
+        index, or already encoded value, is returned as is.
+        """
+        if not (isinstance(cls.__key__, tuple) and isinstance(value, tuple)):
+            return value
+        if len(value) != len(cls.__key__):
+            raise ValueError(
+                f'{cls.__name__} value is a tuple of '
+                f'{", ".join(cls.__key__)}'
+            )
+        codec = model_codec(cls.__model__)
+        parts = []
+        for name, item in zip(cls.__key__, value):
+            if item is None:
+                return None
+            if isinstance(item, bytes):
+                item = item.decode()
+            elif not isinstance(item, str):
+                item = str(codec.encode_value(name, item))
+            parts.append(item.replace('\\', '\\\\').replace(':', '\\:'))
+        return ':'.join(parts)
+
+    @classmethod
+    def data_index_value(cls, data: dict) -> Any:
+        """Index value of stored field values by field name
+
+        Stored value of single field index is decoded, so it is the same
+        as `index_key_value` of the model, e.g. `Status.ACTIVE` of
+        `'active'`.
+        """
+        if isinstance(cls.__key__, tuple):
+            return cls.encode_index_value(tuple(
+                # stored values are encoded already
+                None if data.get(name) is None else stored_text(data[name])
+                for name in cls.__key__
+            ))
+        value = data.get(cls.__key__)
+        if value is None:
+            return None
+        value = model_codec(cls.__model__).decode(
+            {cls.__key__: value}
+        )[cls.__key__]
         if isinstance(value, UUID):
             value = str(value)
         return value
 
     @classmethod
     def index_key_value(cls, model_obj: T) -> Any:
+        if isinstance(cls.__key__, tuple):
+            return cls.encode_index_value(tuple(
+                getattr(model_obj, name) for name in cls.__key__
+            ))
         value = getattr(model_obj, cls.__key__)
         if isinstance(value, UUID):
             value = str(value)
@@ -35,54 +205,172 @@ class BaseIndex:
 class BaseHashIndex(BaseIndex):
     @classmethod
     def redis_key(cls) -> str:
-        model_prefix = cls.__model__.__model_name__
-        if cls.__prefix__ is not None:
-            redis_key = f'{cls.__prefix__}::'
-        else:
-            redis_key = ''
-        redis_key = f'{redis_key}{model_prefix}::' \
-                    f'{cls.__index_name__}::{cls.__key__}'
-        return redis_key
+        return key_schema(cls).base
+
+    @classmethod
+    def _search_script_params(
+        cls, index_value: Any, fields: Optional[Sequence[str]] = None
+    ) -> tuple:
+        """KEYS and ARGV for `HASH_INDEX_SEARCH_SCRIPT`"""
+        model_class = cls.__model__
+        return [cls.redis_key()], [
+            index_value, model_class.redis_key_prefix(),
+            *model_class.__layout__.script_args(
+                model_class, model_class._stored_fields(fields)
+            )
+        ]
+
+    @classmethod
+    def _cache_key(cls, index_value: Any) -> tuple:
+        """Model cache key of index value -> primary key value entry"""
+        return cls.redis_key(), str(index_value)
+
+    @classmethod
+    def _cached_search_model(
+        cls, index_value: Any, mode: str = MODEL,
+        fields: Optional[Sequence[str]] = None
+    ) -> Any:
+        """Cached `search_model` result or `MISSING`
+
+        Index entry is trusted only when the cached model still has
+        `index_value`, as the model entry is dropped when it is written.
+        """
+        model_class = cls.__model__
+        cache = model_class.__cache__
+        if cache is None:
+            return MISSING
+        key_value = cache.get(cls._cache_key(index_value))
+        if key_value is MISSING or key_value is None:
+            return key_value
+        redis_data = cache.get(model_class.redis_key_from_value(key_value))
+        if redis_data is MISSING or redis_data is None:
+            return MISSING
+        stored_value = cls.data_index_value(
+            model_class._search_data(redis_data)
+        )
+        if stored_value is None or str(stored_value) != str(index_value):
+            return MISSING
+        return model_class._parse_search(
+            model_class._project(redis_data, fields), mode, fields
+        )
+
+    @classmethod
+    def _parse_search_script(
+        cls, index_value: Any, result, generation: Optional[int] = None,
+        mode: str = MODEL, fields: Optional[Sequence[str]] = None
+    ) -> Any:
+        """Build model from script result and cache it
+
+        `generation` is model cache generation taken before the script call,
+        projected result of `fields` is not cached.
+        """
+        model_class = cls.__model__
+        cache = model_class.__cache__
+        if not result:
+            if cache is not None:
+                cache.set(cls._cache_key(index_value), None, generation)
+            return None
+        instance = model_class._parse_search(result, mode, fields)
+        if cache is not None and instance is not None and fields is None:
+            key_value = str(
+                model_class._search_data(result)[model_class.__key__]
+            )
+            cache.set(
+                model_class.redis_key_from_value(key_value), result,
+                generation, model_class._cache_source(key_value)
+            )
+            cache.set(cls._cache_key(index_value), key_value, generation)
+        return instance
 
 
 class BaseListIndex(BaseIndex):
     @classmethod
     def redis_key_from_value(cls, value: Any) -> str:
-        model_prefix = cls.__model__.__model_name__
-        if cls.__prefix__ is not None:
-            redis_key = f'{cls.__prefix__}::'
-        else:
-            redis_key = ''
-        redis_key = f'{redis_key}{model_prefix}::' \
-                    f'{cls.__index_name__}::{cls.__key__}:{value}'
-        return redis_key
+        return key_schema(cls).key(cls.encode_index_value(value))
 
     @classmethod
     def redis_key(cls, instance: T) -> str:
-        value = getattr(instance, cls.__key__)
-        return cls.redis_key_from_value(value)
+        return cls.redis_key_from_value(cls.index_key_value(instance))
 
 
 class BaseSetIndex(BaseIndex):
     @classmethod
     def redis_key_from_value(cls, value: Any) -> str:
-        model_prefix = cls.__model__.__model_name__
-        if cls.__prefix__ is not None:
-            redis_key = f'{cls.__prefix__}::'
-        else:
-            redis_key = ''
-        redis_key = f'{redis_key}{model_prefix}::' \
-                    f'{cls.__index_name__}::{cls.__key__}:{value}'
-        return redis_key
+        return key_schema(cls).key(cls.encode_index_value(value))
 
     @classmethod
     def redis_key(cls, instance: T) -> str:
-        value = getattr(instance, cls.__key__)
-        return cls.redis_key_from_value(value)
+        return cls.redis_key_from_value(cls.index_key_value(instance))
+
 
+class BaseSortedSetIndex(BaseIndex):
+    """Index of a numeric, date or datetime field for range queries
+
+    The single `base` key is a sorted set of model primary key values
+    scored by `score` of the index value.
+    """
+
+    @classmethod
+    def redis_key(cls) -> str:
+        return key_schema(cls).base
+
+    @classmethod
+    def score(cls, value: Any) -> float:
+        """Score of index value, date and naive datetime are UTC
+        timestamps, so both are comparable in the same index
+        """
+        if isinstance(value, datetime):
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=timezone.utc)
+            return value.timestamp()
+        if isinstance(value, date):
+            return datetime(
+                value.year, value.month, value.day, tzinfo=timezone.utc
+            ).timestamp()
+        return float(value)
+
+    @classmethod
+    def score_bound(cls, value: Any, default: str) -> Any:
+        """Range bound of index value, `default` infinity for `None`
+
+        String is sent as is, e.g. `'(100'` for exclusive bound.
+        """
+        if value is None:
+            return default
+        if isinstance(value, str):
+            return value
+        return cls.score(value)
+
+    @classmethod
+    def _range_command(
+        cls, min: Any = None, max: Any = None, offset: int = 0,
+        limit: Optional[int] = None, reverse: bool = False
+    ) -> tuple:
+        """ZRANGEBYSCORE (ZREVRANGEBYSCORE if `reverse`) of index values
+        from `min` to `max`
+        """
+        low = cls.score_bound(min, '-inf')
+        high = cls.score_bound(max, '+inf')
+        if reverse:
+            command = ['ZREVRANGEBYSCORE', cls.redis_key(), high, low]
+        else:
+            command = ['ZRANGEBYSCORE', cls.redis_key(), low, high]
+        if offset or limit is not None:
+            command.extend(['LIMIT', offset, -1 if limit is None else limit])
+        return tuple(command)
+
+    @classmethod
+    def _count_command(cls, min: Any = None, max: Any = None) -> tuple:
+        return (
+            'ZCOUNT', cls.redis_key(),
+            cls.score_bound(min, '-inf'), cls.score_bound(max, '+inf')
+        )
 
 
 class BaseModel:
+    # no instance `__dict__` is added for `@dataclass(slots=True)` models
+    __slots__ = ('_redis_snapshot',)
+
     # prefix for redis key
     __prefix__: str
     # infix for redis key and model name
@@ -90,39 +378,101 @@ class BaseModel:
     # Object property name that are to be redis key suffix
     __key__: str
     __indexes__: List[BaseIndex]
+    # Keep primary key values on a sorted set, used by `all`, `count`, etc.
+    __registry__: bool = False
+    # In-process cache of `search` and `HashIndex.search_model` results
+    __cache__: ClassVar[Optional[ModelCache]] = None
+    # Storage of model fields, e.g. `RSO.layout.MsgpackLayout()`
+    __layout__: ClassVar[HashLayout] = HASH_LAYOUT
+    # short name in redis keys instead of `__model_name__`
+    __tag__: ClassVar[Optional[str]] = None
+    # field name -> short stored field name, e.g. `{'birth_date': 'bd'}`
+    __aliases__: ClassVar[Dict[str, str]] = {}
+    # primary key text in redis keys and members, e.g. `Base62Key()`
+    __key_codec__: ClassVar[Optional[KeyCodec]] = None
+    # Redis Cluster hash tag of model tag, keeping model, registry and
+    # index keys in a single slot, see `RSO.cluster`
+    __hash_tag__: ClassVar[bool] = False
 
     @classmethod
     def get_fields(cls) -> List[str]:
-        return [f.name for f in fields(cls)]
+        """Model field names, the list is shared and not to be changed"""
+        return model_codec(cls).fields
 
     def __post_init__(self):
-        for field, desc in self.__dataclass_fields__.items():
-            f_value = getattr(self, field)
-            if f_value is None:
-                continue
+        model_codec(type(self)).coerce(self)
 
-            f_type = desc.type
-            if f_type == bool and not isinstance(f_value, bool):
-                # bool saved as 'True' / 'False' by txredisapi
-                if f_value in ['False', '0']:
-                    value = False
-                else:
-                    value = bool(f_value)
-            elif f_type == date and not isinstance(f_value, date):
-                value = date.fromisoformat(f_value)
-            elif f_type == datetime and not isinstance(f_value, datetime):
-                value = datetime.fromisoformat(f_value)
-            else:
-                continue
-            setattr(self, field, value)
+    # models loaded from redis skip `__init__` unless it is overridden
+    __post_init__.__rso_trusted__ = True
+
+    @classmethod
+    def redis_key_prefix(cls) -> str:
+        """Model keys are the prefix followed by stored primary key value"""
+        return key_schema(cls).prefix
+
+    @classmethod
+    def encode_key_value(cls, value: Any) -> Any:
+        """Stored primary key value, see `__key_codec__`"""
+        return key_schema(cls).encode(value)
+
+    @classmethod
+    def decode_key_value(cls, value: Any) -> Any:
+        """Primary key value of stored key value, e.g. index member"""
+        if cls.__key_codec__ is None:
+            return value
+        return cls.__key_codec__.decode(value)
+
+    @classmethod
+    def decode_key_values(cls, values: Iterable) -> Iterable:
+        """`decode_key_value` of list or set of stored key values"""
+        if cls.__key_codec__ is None:
+            return values
+        decode = cls.__key_codec__.decode
+        return type(values)(decode(value) for value in values)
 
     @classmethod
     def redis_key_from_value(cls, value):
-        if isinstance(value, UUID):
-            value = str(value)
-        if cls.__prefix__ is None:
-            return f'{cls.__model_name__}:{value}'
-        return f'{cls.__prefix__}::{cls.__model_name__}:{value}'
+        return key_schema(cls).key(value)
+
+    @classmethod
+    def redis_key_pattern(cls) -> str:
+        """SCAN pattern matching model keys only
+
+        Index and registry keys share model key prefix followed by `:`, e.g.
+        `user::index::email`, so the first character of model key value
+        is not allowed to be `:`.
+        """
+        return key_schema(cls).pattern
+
+    @classmethod
+    def key_value_from_redis_key(cls, redis_key: str) -> Any:
+        return key_schema(cls).value(redis_key)
+
+    @classmethod
+    def registry_key(cls) -> str:
+        return key_schema(cls).registry_key
+
+    @classmethod
+    def registry_member(cls, value) -> str:
+        """Registry member of primary key value"""
+        return str(cls.encode_key_value(value))
+
+    @classmethod
+    def registry_score(cls, value) -> float:
+        """Numeric primary key is registry score, so it is sorted by value"""
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return 0
+
+    @classmethod
+    def _check_registry(cls) -> None:
+        if not cls.__registry__:
+            raise RuntimeError(
+                f'{cls.__name__} has no registry, set `__registry__ = True`'
+            )
 
     @property
     def redis_key(self):
@@ -132,26 +482,482 @@ class BaseModel:
         return asdict(self)
 
     def to_redis(self):
-        dict_data = self.dict()
-        for key, value in self.dict().items():
-            if value is None:
-                del dict_data[key]
-            elif isinstance(value, bool):
-                dict_data[key] = int(value)
-            elif isinstance(value, (date, datetime)):
-                dict_data[key] = value.isoformat()
-            elif isinstance(value, Enum):
-                dict_data[key] = value.value
-        return dict_data
+        return model_codec(type(self)).encode(self)
 
     @classmethod
     def from_redis(cls, dict_data: dict) -> dict:
         return dict_data
 
+    @classmethod
+    def _from_redis_data(
+        cls, dict_data: dict, mode: str = MODEL,
+        fields: Optional[Sequence[str]] = None
+    ) -> Any:
+        """Build model from HMGET/HGETALL result, `None` for missing key
+
+        `mode` is one of `MODEL` (model instance), `ROW` (named tuple of
+        decoded values) or `RAW` (dict of stored values as returned by redis).
+        `fields` is the projection of `dict_data`, other fields of model
+        instance are `DEFERRED` and left out of row.
+        """
+        if all(value is None for value in dict_data.values()):
+            return None
+        if mode == MODEL:
+            instance = model_codec(cls).build(
+                cls.from_redis(dict_data), fields
+            )
+            instance._take_snapshot()
+            return instance
+        elif mode == ROW:
+            return model_codec(cls).build_row(
+                cls.from_redis(dict_data), fields
+            )
+        elif mode == RAW:
+            return {
+                key: value for key, value in dict_data.items()
+                if value is not None
+            }
+        raise ValueError(f'Unknown mode: {mode!r}')
+
+    def _snapshot(self) -> tuple:
+        """Stored text of fields in field order, `None` for unset field and
+        `DEFERRED` for deferred field, followed by index values in
+        `__indexes__` order
+
+        A flat tuple is kept by every loaded model instead of dicts, see
+        `_diff_snapshot`.
+        """
+        data = self.to_redis()
+        return (
+            *(
+                DEFERRED if getattr(self, name) is DEFERRED
+                else None if stored not in data else str(data[stored])
+                for name, stored, _ in model_codec(type(self)).encoders
+            ),
+            *(
+                index_class.index_key_value(self)
+                for index_class in self.__indexes__ or []
+            )
+        )
+
+    def _take_snapshot(self, snapshot: Optional[tuple] = None) -> None:
+        """Remember `snapshot` of `save`, or current values of loaded model
+
+        Pending snapshot of `save` on a pipeline is only taken after the
+        pipeline is executed, see `apply_snapshots`.
+        """
+        if snapshot is None:
+            snapshot = self._snapshot()
+        object.__setattr__(self, '_redis_snapshot', snapshot)
+
+    def _deferred_fields(self) -> List[str]:
+        """Fields not loaded by `only` / `defer` projection"""
+        return [
+            name for name in self.get_fields()
+            if getattr(self, name) is DEFERRED
+        ]
+
+    def _set_deferred(self, fields: List[str], redis_data) -> None:
+        """Set deferred `fields` from their HMGET reply
+
+        Loaded values are added to the snapshot, so `save` does not write
+        them back unless they are changed.
+        """
+        codec = model_codec(type(self))
+        data = codec.decode(self.from_redis(dict(zip(fields, redis_data))))
+        for name, value in data.items():
+            object.__setattr__(self, name, value)
+        snapshot = getattr(self, '_redis_snapshot', None)
+        if snapshot is not None:
+            encoded = codec.encode(self)
+            loaded = set(codec.stored(fields))
+            texts = [
+                text if stored not in loaded
+                else str(encoded[stored]) if stored in encoded else None
+                for (_, stored, _), text in zip(codec.encoders, snapshot)
+            ]
+            object.__setattr__(
+                self, '_redis_snapshot', (*texts, *snapshot[len(texts):])
+            )
+
+    def _changed_index_values(self) -> dict:
+        """Stored values of index fields changed since model is loaded"""
+        changes = self._diff_snapshot()
+        if changes is None:
+            return {}
+        return {
+            index_class: old_value for index_class, old_value, _ in changes[2]
+        }
+
+    def _forget_snapshot(self) -> None:
+        """Next `save` writes whole model, e.g. after it is deleted"""
+        object.__setattr__(self, '_redis_snapshot', None)
+
+    def _diff_snapshot(self) -> Optional[tuple]:
+        """Changes since the model is loaded from or saved to redis
+
+        Return changed fields mapping, removed (set to `None`) field names and
+        `(index_class, old_value, new_value)` of changed index values.
+        `None` means there is no snapshot and whole model is to be written.
+        """
+        snapshot = getattr(self, '_redis_snapshot', None)
+        if snapshot is None:
+            return None
+
+        codec = model_codec(type(self))
+        data = self.to_redis()
+        key = codec.aliases.get(self.__key__, self.__key__)
+        changed = {}
+        removed = []
+        for (name, stored, _), text in zip(codec.encoders, snapshot):
+            value = data.get(stored)
+            if text is DEFERRED:
+                # stored value is unknown, any assignment is written
+                if getattr(self, name) is DEFERRED:
+                    continue
+                if value is None:
+                    removed.append(stored)
+                else:
+                    changed[stored] = value
+                continue
+            if stored == key and text != str(value):
+                # primary key is changed, it is a new model
+                return None
+            if value is None:
+                if text is not None:
+                    removed.append(stored)
+            elif text != str(value):
+                changed[stored] = value
+
+        indexes = []
+        for index_class, old_value in zip(
+            self.__indexes__ or [], snapshot[len(codec.encoders):]
+        ):
+            new_value = index_class.index_key_value(self)
+            if old_value is None and new_value is None:
+                continue
+            if old_value is None or new_value is None \
+                    or str(old_value) != str(new_value):
+                indexes.append((index_class, old_value, new_value))
+        return changed, removed, indexes
+
+    @classmethod
+    def _index_fields(cls) -> List[str]:
+        """Model fields used by `__indexes__`"""
+        return list(dict.fromkeys(
+            name for index_class in cls.__indexes__ or []
+            for name in index_class.key_fields()
+        ))
+
+    @classmethod
+    def _delete_rows(cls, items: list, redis_data: Iterator) -> list:
+        """Primary key value and index values by index class of
+        `delete_many` items
+
+        `redis_data` is HMGET result of `_index_fields` for every item
+        that is not a model instance, in the same order.
+        """
+        index_fields = cls._index_fields()
+        rows = []
+        for item in items:
+            if isinstance(item, BaseModel):
+                key_value = getattr(item, item.__key__)
+                index_data = {
+                    index_class: index_class.index_key_value(item)
+                    for index_class in cls.__indexes__ or []
+                }
+            else:
+                key_value = item
+                data = dict(zip(index_fields, cls.__layout__.values(
+                    cls, next(redis_data, None),
+                    cls._stored_fields(index_fields)
+                )))
+                index_data = {
+                    index_class: index_class.data_index_value(data)
+                    for index_class in cls.__indexes__ or []
+                }
+            rows.append((key_value, index_data))
+        return rows
+
+    @classmethod
+    def _projection(
+        cls, only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> Optional[List[str]]:
+        """Fields read by `only` / `defer` projection, `None` for all
+
+        Primary key and index fields are always read, so projected model
+        can be saved and deleted. Packed layout always reads all fields.
+        """
+        if only is None and defer is None:
+            return None
+        fields = cls.get_fields()
+        only = fields if only is None else list(only)
+        defer = set(defer or ())
+        unknown = set(only).union(defer).difference(fields)
+        if unknown:
+            raise ValueError(
+                f'{cls.__name__} has no field: {", ".join(sorted(unknown))}'
+            )
+        selected = set(only).difference(defer)
+        selected.add(cls.__key__)
+        selected.update(cls._index_fields())
+        if len(selected) == len(fields) or cls.__layout__.packed:
+            return None
+        return [name for name in fields if name in selected]
+
+    @classmethod
+    def _stored_fields(
+        cls, fields: Optional[Sequence[str]] = None
+    ) -> Sequence[str]:
+        """Stored names of `fields`, of all fields by default"""
+        codec = model_codec(cls)
+        if fields is None:
+            return codec.stored_fields
+        return codec.stored(fields)
+
+    @classmethod
+    def _search_command(
+        cls, value, fields: Optional[Sequence[str]] = None
+    ) -> tuple:
+        """Model read command of `value`, see `RSO.layout`"""
+        return cls.__layout__.read_command(
+            cls, value, cls._stored_fields(fields)
+        )
+
+    @classmethod
+    def _queue_search(
+        cls, pipe, value, fields: Optional[Sequence[str]] = None
+    ) -> Any:
+        """Queue model read command of `value` on pipeline
+
+        Command runs at once on client, the reply is returned.
+        """
+        return pipe.execute_command(
+            *cls._search_command(value, fields), **cls.__layout__.read_options
+        )
+
+    @classmethod
+    def _search_reply(cls, reply) -> Any:
+        """`_queue_search` reply, `None` for not found model"""
+        return reply if cls.__layout__.found(reply) else None
+
+    @classmethod
+    def _search_data(
+        cls, redis_data, fields: Optional[Sequence[str]] = None
+    ) -> dict:
+        """Field values of the reply of `_queue_search` command"""
+        return dict(zip(
+            fields or cls.get_fields(),
+            cls.__layout__.values(cls, redis_data, cls._stored_fields(fields))
+        ))
+
+    def _write_commands(self, changes: Optional[tuple] = None) -> list:
+        """Commands writing model fields, `changes` of `_diff_snapshot`"""
+        return self.__layout__.write_commands(
+            type(self), getattr(self, self.__key__), self.to_redis(),
+            None if changes is None else changes[:2]
+        )
+
+    def _exists_command(self) -> tuple:
+        return self.__layout__.exists_command(
+            type(self), getattr(self, self.__key__)
+        )
+
+    @classmethod
+    def _delete_commands(cls, values: list) -> list:
+        """Commands deleting models of primary key `values`"""
+        return cls.__layout__.delete_commands(cls, values)
+
+    @classmethod
+    def _migrate_commands(
+        cls, source: HashLayout, values: list, replies: list
+    ) -> Tuple[list, list]:
+        """Moved values and commands moving them from `source` layout
+
+        `replies` are of `source.read_command` for every value, error
+        replies are of values already stored in another layout. Source
+        storage is deleted first, as both layouts may use the same key.
+        """
+        fields = cls.get_fields()
+        moved, commands = [], []
+        for value, reply in zip(values, replies):
+            if isinstance(reply, Exception) or not source.found(reply):
+                continue
+            instance = cls._from_redis_data(dict(zip(
+                fields, source.values(cls, reply, cls._stored_fields())
+            )))
+            moved.append(value)
+            commands.extend(cls.__layout__.write_commands(
+                cls, value, instance.to_redis()
+            ))
+        return moved, source.delete_commands(cls, moved) + commands
+
+    @classmethod
+    def _project(cls, redis_data, fields: Optional[Sequence[str]]) -> list:
+        """Reply of `fields` projection taken from reply of all fields"""
+        if fields is None:
+            return redis_data
+        data = cls._search_data(redis_data)
+        return [data[name] for name in fields]
+
+    @classmethod
+    def _parse_search(
+        cls, redis_data, mode: str = MODEL,
+        fields: Optional[Sequence[str]] = None
+    ) -> Any:
+        """Build model from the reply of `_queue_search` command"""
+        return cls._from_redis_data(
+            cls._search_data(redis_data, fields), mode, fields
+        )
+
+    @classmethod
+    def _cached_search(
+        cls, value, mode: str = MODEL,
+        fields: Optional[Sequence[str]] = None
+    ) -> Any:
+        """Cached `search` result of `value` or `MISSING`"""
+        if cls.__cache__ is None:
+            return MISSING
+        redis_data = cls.__cache__.get(cls.redis_key_from_value(value))
+        if redis_data is MISSING or redis_data is None:
+            return redis_data
+        return cls._parse_search(
+            cls._project(redis_data, fields), mode, fields
+        )
+
+    @classmethod
+    def _cache_generation(cls) -> Optional[int]:
+        """Model cache generation, taken before reading redis"""
+        if cls.__cache__ is None:
+            return None
+        return cls.__cache__.generation
+
+    @classmethod
+    def _cache_search(
+        cls, value, redis_data, generation: Optional[int] = None
+    ) -> None:
+        """Cache `_queue_search` reply, `None` for not found model"""
+        if cls.__cache__ is not None:
+            cls.__cache__.set(
+                cls.redis_key_from_value(value), redis_data, generation,
+                cls._cache_source(value)
+            )
+
+    @classmethod
+    def _cache_source(cls, value) -> Optional[str]:
+        """Redis key of model `value` when it is not the model key"""
+        if not cls.__layout__.bucketed:
+            return None
+        return cls.__layout__.storage_key(cls, value)
+
+    @classmethod
+    def _cache_discard(cls, value) -> None:
+        if cls.__cache__ is not None:
+            cls.__cache__.discard(cls.redis_key_from_value(value))
+
+    def _cache_discard_model(self) -> None:
+        """Drop cached entries of written model and its hash index values"""
+        cache = self.__cache__
+        if cache is None:
+            return
+        cache.discard(self.redis_key)
+        for index_class in self.__indexes__ or []:
+            if not issubclass(index_class, BaseHashIndex):
+                continue
+            index_value = index_class.index_key_value(self)
+            if index_value is not None:
+                cache.discard(index_class._cache_key(index_value))
+
     @classmethod
     def search(cls, redis, value):
         raise NotImplementedError
 
+    @classmethod
+    def get_many(cls, redis, values, chunk_size: int = CHUNK_SIZE):
+        raise NotImplementedError
+
     @classmethod
     def all(cls, redis):
         raise NotImplementedError
+
+    @classmethod
+    def iter_all(cls, redis, count: int = SCAN_COUNT):
+        raise NotImplementedError
+
+    @classmethod
+    def count(cls, redis) -> int:
+        raise NotImplementedError
+
+
+class BaseSession:
+    """Unit of work shared by sync and asyncio `Session`
+
+    Models found by the session are kept in an identity map, so searching
+    the same key again returns the same instance without a round trip.
+    `add` and `delete` only queue the model and `flush` writes all queued
+    models in a single pipeline, MULTI/EXEC when `transaction` is set.
+    A model queued more than once is saved once, a save followed by
+    delete only deletes and a delete followed by save writes whole model.
+    """
+
+    def __init__(self, redis, transaction: bool = False):
+        self.redis = redis
+        self.transaction = transaction
+        # model redis key -> model instance, `None` for not found model
+        self._identity_map: dict = {}
+        # model redis key -> (queued operations, model instance)
+        self._pending: dict = {}
+
+    def __contains__(self, model: BaseModel) -> bool:
+        return model.redis_key in self._pending
+
+    def add(self, model: BaseModel) -> None:
+        """Queue `model` save"""
+        operations, _ = self._pending.get(model.redis_key, ([], None))
+        if not operations or operations[-1] != 'save':
+            operations = operations + ['save']
+        self._pending[model.redis_key] = (operations, model)
+        self._identity_map[model.redis_key] = model
+
+    def delete(self, model: BaseModel) -> None:
+        """Queue `model` delete, replacing its queued save"""
+        self._pending[model.redis_key] = (['delete'], model)
+        self._identity_map[model.redis_key] = None
+
+    def rollback(self) -> None:
+        """Drop queued operations and the identity map"""
+        self._pending.clear()
+        self._identity_map.clear()
+
+    def _flushed(self, queued: list, result: list) -> None:
+        """Take snapshots of models written by `flush` pipeline `result`,
+        see `apply_snapshots`
+
+        Operations of failed models stay queued for the next `flush` and
+        the first error is raised.
+        """
+        failed = apply_snapshots(queued, result)
+        failed_keys = {model.redis_key for model, _ in failed}
+        self._pending = {
+            redis_key: pending
+            for redis_key, pending in self._pending.items()
+            if redis_key in failed_keys
+        }
+        if failed:
+            raise failed[0][1]
+
+    def _missing_values(self, model_class, values: list) -> dict:
+        """Redis key -> value of `values` not in the identity map"""
+        missing = {}
+        for value in values:
+            redis_key = model_class.redis_key_from_value(value)
+            if redis_key not in self._identity_map:
+                missing[redis_key] = value
+        return missing
+
+    def _mapped(self, model_class, values: list) -> list:
+        return [
+            self._identity_map[model_class.redis_key_from_value(value)]
+            for value in values
+        ]
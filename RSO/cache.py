@@ -0,0 +1,220 @@
+import sys
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from typing import Any, Dict, Hashable, Iterable, Optional, Set
+
+# `ModelCache.get` result of key that is not cached
+MISSING = object()
+# pubsub channel of redis client side caching invalidation messages
+INVALIDATE_CHANNEL = '__redis__:invalidate'
+
+
+def sizeof(value: Any) -> int:
+    """Approximate memory size of cached redis reply"""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        size += sum(sizeof(item) for item in value)
+    return size
+
+
+def tracking_connection_kwargs(connection_kwargs: dict) -> dict:
+    """Kwargs of dedicated invalidation connection, without read timeout"""
+    return dict(connection_kwargs, socket_timeout=None)
+
+
+def is_resp3(connection: Any) -> bool:
+    return str(getattr(connection, 'protocol', 2)) == '3'
+
+
+def tracking_commands(
+    client_id: int, model_classes: Iterable, resp3: bool = False
+) -> list:
+    """Commands enabling BCAST tracking of model keys
+
+    RESP3 connection receives `invalidate` push messages itself, RESP2
+    connection redirects them to itself on `__redis__:invalidate` channel.
+    """
+    tracking = ['CLIENT', 'TRACKING', 'on', 'BCAST']
+    for model_class in model_classes:
+        tracking.extend(['PREFIX', model_class.redis_key_prefix()])
+    if resp3:
+        return [tracking]
+    tracking.extend(['REDIRECT', client_id])
+    return [tracking, ['SUBSCRIBE', INVALIDATE_CHANNEL]]
+
+
+def invalidated_keys(message: Any) -> Any:
+    """Redis keys of RESP3 `invalidate` or RESP2 `__redis__:invalidate`
+    message
+
+    `None` means all keys are flushed, `MISSING` for any other message.
+    """
+    if not isinstance(message, list) or not message:
+        return MISSING
+    kind = message[0].decode() if isinstance(message[0], bytes) \
+        else message[0]
+    if kind == 'invalidate' and len(message) == 2:
+        keys = message[1]
+    elif kind == 'message' and len(message) == 3:
+        channel = message[1].decode() if isinstance(message[1], bytes) \
+            else message[1]
+        if channel != INVALIDATE_CHANNEL:
+            return MISSING
+        keys = message[2]
+    else:
+        return MISSING
+    if keys is None:
+        return None
+    return [
+        key.decode() if isinstance(key, bytes) else key for key in keys
+    ]
+
+
+class ModelCache:
+    """In-process read-through cache of model `search` replies
+
+    Used by setting model `__cache__`, e.g.
+    `__cache__ = ModelCache(max_entries=10000, ttl=30)`.
+    `Model.search` and `HashIndex.search_model` are served from the cache
+    and `save` / `delete` of the model drop its entries.
+    Writes by other processes are not seen until the entry expires,
+    unless it is invalidated by `RSO.tracking.TrackingCache`.
+
+    `max_entries` and `max_bytes` bound the cache size, the least recently
+    used entries are evicted first. `None` means unbounded.
+    `ttl` is lifetime in seconds of found entries and `negative_ttl` of
+    not found ones, `None` means no expiration and `0` means not cached.
+
+    Model entries are keyed by model redis key and hash index entries by
+    `(index redis key, index value)`, so `invalidate` takes written redis
+    keys, e.g. from `RSO.tracking.TrackingCache`.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = 1024,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = 60.0,
+        negative_ttl: Optional[float] = 1.0,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        # incremented whenever entries are dropped, see `set`
+        self.generation = 0
+        # key -> (expire time or None, value, size, source redis key)
+        self._entries = OrderedDict()
+        # source redis key -> keys of entries dropped when it is written
+        self._dependents: Dict[str, Set[Hashable]] = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any:
+        """Cached value of `key` or `MISSING`, `None` is cached not found"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expire_at, value = entry[:2]
+                if expire_at is None or expire_at > monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._pop(key)
+            self.misses += 1
+            return MISSING
+
+    def set(
+        self, key: Hashable, value: Any, generation: Optional[int] = None,
+        source: Optional[str] = None
+    ) -> None:
+        """Cache `value` of `key`, `None` value is cached for `negative_ttl`
+
+        `generation` taken before reading `value` from redis skips caching
+        when any entry is dropped meanwhile, as `value` may be outdated.
+        `source` is redis key `value` is read from when it is not `key`,
+        e.g. bucket of `RSO.layout.BucketLayout`, `invalidate` of `source`
+        drops the entry.
+        """
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl is not None and ttl <= 0:
+            return
+        expire_at = None if ttl is None else monotonic() + ttl
+        size = sizeof(key) + sizeof(value)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._pop(key)
+            if source is None and value is None and isinstance(key, tuple):
+                # not found hash index value
+                source = key[0]
+            if source is not None:
+                self._dependents.setdefault(source, set()).add(key)
+            self._entries[key] = (expire_at, value, size, source)
+            self.bytes += size
+            while self._entries and (
+                (self.max_entries is not None
+                 and len(self._entries) > self.max_entries)
+                or (self.max_bytes is not None
+                    and self.bytes > self.max_bytes)
+            ):
+                key = next(iter(self._entries))
+                self._pop(key)
+                self.evictions += 1
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self.generation += 1
+            self._pop(key)
+
+    def invalidate(self, redis_keys: Optional[Iterable[str]]) -> None:
+        """Drop entries of written redis keys, `None` drops all entries
+
+        Cached hash index values are checked against cached model on read,
+        so only the not found values of a written hash index are dropped.
+        Entries of a written `source` key of `set` are dropped as well.
+        """
+        if redis_keys is None:
+            self.clear()
+            return
+        with self._lock:
+            self.generation += 1
+            for redis_key in redis_keys:
+                self._pop(redis_key)
+                for key in self._dependents.pop(redis_key, ()):
+                    self._pop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._dependents.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+        }
+
+    def _pop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+            dependents = self._dependents.get(entry[3])
+            if dependents is not None:
+                dependents.discard(key)
+                if not dependents:
+                    del self._dependents[entry[3]]
+
@@ -0,0 +1,93 @@
+"""Redis Cluster support of redis-py sync and asyncio clients
+
+Model keys are spread over cluster slots, so model save is not atomic and
+hash index is searched by HGET and model read instead of the server side
+script. Model `__hash_tag__` places model, registry and index keys of the
+model class in a single slot (see `RSO.schema`) to keep them atomic at the
+price of a single node holding all of them.
+"""
+from collections import defaultdict
+from typing import List
+
+from redis.asyncio.cluster import (
+    ClusterPipeline as AsyncClusterPipeline,
+    RedisCluster as AsyncRedisCluster,
+)
+from redis.cluster import ClusterPipeline, RedisCluster
+from redis.crc import key_slot as _key_slot
+
+
+class ClusterClient:
+    """Base of clients spreading keys over nodes the way cluster does,
+    e.g. `RSO.sharding.ShardedRedis`
+
+    Subclass provides `get_primaries`, `get_node_from_key` and `scan` of
+    `target_nodes` returning cursor of every node as cluster client does.
+    """
+
+
+CLUSTER_CLIENTS = (
+    RedisCluster, ClusterPipeline, AsyncRedisCluster, AsyncClusterPipeline,
+    ClusterClient,
+)
+# commands taking keys only, split into one command per slot
+MULTI_KEY_COMMANDS = frozenset(['DEL', 'UNLINK', 'EXISTS', 'TOUCH'])
+GLOB_CHARS = frozenset('*?[\\')
+
+
+def is_cluster(redis) -> bool:
+    """Whether `redis` is a cluster client or cluster pipeline"""
+    return isinstance(redis, CLUSTER_CLIENTS)
+
+
+def key_slot(key: str) -> int:
+    return _key_slot(key.encode())
+
+
+def split_commands(commands: List[tuple]) -> List[tuple]:
+    """Split multi key commands into one command per slot
+
+    Sum of the replies of the split commands of DEL, UNLINK, EXISTS and
+    TOUCH is the reply of the original command.
+    """
+    result = []
+    for command in commands:
+        if command[0] not in MULTI_KEY_COMMANDS or len(command) <= 2:
+            result.append(command)
+            continue
+        slots = defaultdict(list)
+        for key in command[1:]:
+            slots[key_slot(key)].append(key)
+        result.extend((command[0], *keys) for keys in slots.values())
+    return result
+
+
+def scan_nodes(redis, pattern: str) -> list:
+    """Primary nodes holding keys matched by SCAN `pattern`
+
+    Hash tag in front of any glob character pins the keys to a single
+    node, otherwise every primary is scanned.
+    """
+    start = pattern.find('{')
+    end = pattern.find('}', start + 1)
+    if start != -1 and end > start + 1 \
+            and GLOB_CHARS.isdisjoint(pattern[:end]):
+        return [redis.get_node_from_key(pattern)]
+    return redis.get_primaries()
+
+
+def transaction_allowed(redis, model_class) -> bool:
+    """Whether model keys are written in a transaction on `redis`
+
+    Cluster transaction is limited to a single slot, keys of model without
+    `__hash_tag__` are spread over slots.
+    """
+    return not is_cluster(redis) or model_class.__hash_tag__
+
+
+def check_transaction(redis, model_class) -> None:
+    if not transaction_allowed(redis, model_class):
+        raise RuntimeError(
+            f'{model_class.__name__} keys are in different cluster slots, '
+            f'set `__hash_tag__ = True` for transaction'
+        )
@@ -0,0 +1,369 @@
+from collections import namedtuple
+from dataclasses import fields, is_dataclass
+from datetime import date, datetime
+from enum import Enum
+from typing import (
+    Any, Callable, Dict, List, Optional, Sequence, Tuple, Union, get_type_hints
+)
+from uuid import UUID
+
+# bool field values stored by older versions or `txredisapi`
+FALSE_VALUES = ('0', 'False', '')
+
+# errors of decoding a value that is not of its field type
+DECODE_ERRORS = (ValueError, TypeError, KeyError)
+
+# read modes: model instance, named tuple of decoded values, stored dict
+MODEL = 'model'
+ROW = 'row'
+RAW = 'raw'
+
+
+class _Deferred:
+    """Value of model field not loaded by `only` / `defer` projection"""
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return '<deferred>'
+
+    def __reduce__(self) -> str:
+        return 'DEFERRED'
+
+    def __copy__(self) -> '_Deferred':
+        return self
+
+    def __deepcopy__(self, memo: dict) -> '_Deferred':
+        return self
+
+
+DEFERRED = _Deferred()
+
+
+def _text(value: Any) -> Any:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def decode_bool(value: Any) -> bool:
+    value = _text(value)
+    return value not in FALSE_VALUES and bool(value)
+
+
+def decode_date(value: Any) -> date:
+    return date.fromisoformat(_text(value))
+
+
+def decode_datetime(value: Any) -> datetime:
+    return datetime.fromisoformat(_text(value))
+
+
+def decode_uuid(value: Any) -> UUID:
+    return UUID(_text(value))
+
+
+def enum_decoder(enum_class) -> Callable[[Any], Enum]:
+    """Enum member of its value or of stored value as text"""
+    members = {str(member.value): member for member in enum_class}
+
+    def decode_enum(value: Any) -> Enum:
+        try:
+            return enum_class(value)
+        except ValueError:
+            return members[str(_text(value))]
+    return decode_enum
+
+
+def encode_isoformat(value: Any) -> str:
+    # undecodable stored value is written back as is, see `decode`
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def encode_enum(value: Enum) -> Any:
+    return value.value if isinstance(value, Enum) else value
+
+
+def encode_any(value: Any) -> Any:
+    """Encoder of field without supported type annotation"""
+    if isinstance(value, bool):
+        return int(value)
+    elif isinstance(value, (date, datetime)):
+        return value.isoformat()
+    elif isinstance(value, Enum):
+        return value.value
+    elif isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def field_type(annotation: Any) -> Any:
+    """Type of `Optional[T]` annotation, `None` for other unions"""
+    if getattr(annotation, '__origin__', None) is Union:
+        args = [arg for arg in annotation.__args__ if arg is not type(None)]
+        return args[0] if len(args) == 1 else None
+    return annotation if isinstance(annotation, type) else None
+
+
+def type_decoder(value_type: Any) -> Optional[Callable[[Any], Any]]:
+    """Redis value decoder of `value_type`, `None` if kept as is"""
+    if value_type is None:
+        return None
+    if value_type is bool:
+        return decode_bool
+    if issubclass(value_type, Enum):
+        return enum_decoder(value_type)
+    if value_type is datetime:
+        return decode_datetime
+    if value_type is date:
+        return decode_date
+    if value_type is UUID:
+        return decode_uuid
+    if value_type in (int, float):
+        return value_type
+    return None
+
+
+def type_encoder(value_type: Any) -> Optional[Callable[[Any], Any]]:
+    """Redis value encoder of `value_type`, `None` if sent as is"""
+    if value_type is None:
+        return encode_any
+    if value_type is bool:
+        return int
+    if issubclass(value_type, Enum):
+        return encode_enum
+    if issubclass(value_type, date):
+        return encode_isoformat
+    if value_type is UUID:
+        return str
+    if value_type in (int, float, str, bytes):
+        return None
+    return encode_any
+
+
+class KeyCodec:
+    """Compact text of primary key values in redis keys and members
+
+    Used by setting model `__key_codec__`, e.g. `Base62Key()`. Model keys,
+    registry and index members and hash index values hold the encoded
+    value. Use `txredisapi` connection with `convertNumbers=False`, as
+    encoded text may look like a number.
+    """
+
+    def encode(self, value: Any) -> str:
+        raise NotImplementedError
+
+    def decode(self, text: Any) -> Any:
+        raise NotImplementedError
+
+
+BASE62 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+BASE62_DIGITS = {char: digit for digit, char in enumerate(BASE62)}
+
+
+def base62_encode(number: int) -> str:
+    if number < 0:
+        raise ValueError(f'Negative number: {number}')
+    chars = []
+    while True:
+        number, digit = divmod(number, 62)
+        chars.append(BASE62[digit])
+        if not number:
+            return ''.join(reversed(chars))
+
+
+def base62_decode(text: str) -> int:
+    number = 0
+    for char in text:
+        number = number * 62 + BASE62_DIGITS[char]
+    return number
+
+
+class Base62Key(KeyCodec):
+    """Non negative `int` primary key as base62 text, e.g. `'G8'` of 1000
+
+    Shorter model keys, but index sets of encoded members are no longer
+    stored as compact redis integer sets.
+    """
+
+    def encode(self, value: Any) -> str:
+        return base62_encode(int(value))
+
+    def decode(self, text: Any) -> int:
+        # `txredisapi` replies number like text as number
+        return base62_decode(str(_text(text)))
+
+
+class Base62UUIDKey(KeyCodec):
+    """`UUID` primary key as 22 characters of base62 text instead of 36"""
+
+    def encode(self, value: Any) -> str:
+        if not isinstance(value, UUID):
+            value = UUID(_text(value))
+        return base62_encode(value.int).rjust(22, '0')
+
+    def decode(self, text: Any) -> UUID:
+        return UUID(int=base62_decode(str(_text(text))))
+
+
+class ModelCodec:
+    """Field encoders and decoders of a model class, built once
+
+    Use `model_codec` to get the codec of a model class.
+    """
+
+    def __init__(self, model_class):
+        self.model_class = model_class
+        self.fields: List[str] = [f.name for f in fields(model_class)]
+        self.field_set = set(self.fields)
+        # field -> stored field name of `__aliases__`
+        self.aliases: Dict[str, str] = dict(
+            getattr(model_class, '__aliases__', None) or {}
+        )
+        unknown = set(self.aliases).difference(self.field_set)
+        if unknown:
+            raise ValueError(
+                f'{model_class.__name__} has no field: '
+                f'{", ".join(sorted(unknown))}'
+            )
+        self.stored_fields = self.stored(self.fields)
+        if len(set(self.stored_fields)) != len(self.fields):
+            raise ValueError(
+                f'{model_class.__name__} has duplicate stored field names'
+            )
+        try:
+            hints = get_type_hints(model_class)
+        except (NameError, TypeError):
+            hints = {}
+
+        # field -> type of `Optional[type]` annotation, `None` if unknown
+        self.types: Dict[str, Any] = {}
+        # (field, stored name, encoder) of every field, `None` encoder sends
+        # value as is
+        self.encoders = []
+        # field -> encoder
+        self.field_encoders: Dict[str, Any] = {}
+        # (field, type, decoder) of fields with decoder
+        self.decoders = []
+        for f in fields(model_class):
+            value_type = field_type(hints.get(f.name, f.type))
+            self.types[f.name] = value_type
+            encoder = type_encoder(value_type)
+            self.encoders.append((
+                f.name, self.aliases.get(f.name, f.name), encoder
+            ))
+            self.field_encoders[f.name] = encoder
+            decoder = type_decoder(value_type)
+            if decoder is not None:
+                self.decoders.append((f.name, value_type, decoder))
+
+        # plain dataclass instance can be built without `__init__`
+        post_init = getattr(model_class, '__post_init__', None)
+        self.trusted = is_dataclass(model_class) \
+            and getattr(post_init, '__rso_trusted__', False)
+        # `False` for `__slots__` only dataclass
+        self.has_dict = model_class.__dictoffset__ != 0
+        self.row_class = namedtuple(
+            f'{model_class.__name__}Row', self.fields, rename=True
+        )
+        # projected fields -> (deferred fields, row class)
+        self._projections: Dict[Tuple[str, ...], tuple] = {}
+
+    def stored(self, names: Sequence[str]) -> Sequence[str]:
+        """Stored names of fields, see `__aliases__`"""
+        if not self.aliases:
+            return names
+        return [self.aliases.get(name, name) for name in names]
+
+    def encode_value(self, name: str, value: Any) -> Any:
+        """Stored value of field `name` value"""
+        encoder = self.field_encoders[name]
+        return value if encoder is None else encoder(value)
+
+    def encode(self, instance) -> Dict[str, Any]:
+        """Values to be saved by stored field name, `None` values are left
+        out
+        """
+        result = {}
+        for name, stored, encoder in self.encoders:
+            value = getattr(instance, name)
+            if value is None or value is DEFERRED:
+                continue
+            result[stored] = value if encoder is None else encoder(value)
+        return result
+
+    def decode(self, data: dict) -> dict:
+        """Convert values of `data` that are not of their field type
+
+        Value that can not be converted, e.g. `''` of `int` field, is kept
+        as is, like the stored values read by older versions.
+        """
+        for name, value_type, decoder in self.decoders:
+            value = data.get(name)
+            if value is not None and value.__class__ is not value_type:
+                try:
+                    data[name] = decoder(value)
+                except DECODE_ERRORS:
+                    pass
+        return data
+
+    def coerce(self, instance) -> None:
+        """Convert field values of `instance` built by user, see `decode`"""
+        for name, value_type, decoder in self.decoders:
+            value = getattr(instance, name)
+            if value is not None and value is not DEFERRED \
+                    and not isinstance(value, value_type):
+                try:
+                    setattr(instance, name, decoder(value))
+                except DECODE_ERRORS:
+                    pass
+
+    def projection(self, fields: Sequence[str]) -> tuple:
+        """Deferred fields and row class of `fields` projection"""
+        key = tuple(fields)
+        projection = self._projections.get(key)
+        if projection is None:
+            projection = (
+                tuple(name for name in self.fields if name not in key),
+                namedtuple(
+                    f'{self.model_class.__name__}Row', key, rename=True
+                ),
+            )
+            self._projections[key] = projection
+        return projection
+
+    def build(self, data: dict, fields: Optional[Sequence[str]] = None):
+        """Model instance of decoded redis data
+
+        Fields left out of `fields` projection are set to `DEFERRED`.
+        """
+        self.decode(data)
+        if fields is not None:
+            data.update(dict.fromkeys(self.projection(fields)[0], DEFERRED))
+        if not self.trusted or data.keys() != self.field_set:
+            return self.model_class(**data)
+
+        instance = self.model_class.__new__(self.model_class)
+        if self.has_dict:
+            instance.__dict__.update(data)
+        else:
+            for name, value in data.items():
+                object.__setattr__(instance, name, value)
+        return instance
+
+    def build_row(
+        self, data: dict, fields: Optional[Sequence[str]] = None
+    ) -> tuple:
+        """Named tuple of decoded redis data, in `fields` order"""
+        self.decode(data)
+        if fields is None:
+            fields, row_class = self.fields, self.row_class
+        else:
+            row_class = self.projection(fields)[1]
+        return row_class._make(data.get(name) for name in fields)
+
+
+def model_codec(model_class) -> ModelCodec:
+    """Codec of `model_class`, built on first use"""
+    codec = model_class.__dict__.get('__codec__')
+    if codec is None:
+        codec = ModelCodec(model_class)
+        model_class.__codec__ = codec
+    return codec
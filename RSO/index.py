@@ -1,12 +1,42 @@
-from typing import Any, List, Optional, TypeVar, Union
+from typing import (
+    Any, Iterable, Iterator, List, Optional, Tuple, TypeVar, Union
+)
 
 from redis.client import Pipeline, Redis
+from redis.exceptions import NoScriptError
 
-from .base import BaseModel, BaseHashIndex, BaseListIndex, BaseSetIndex
+from .base import (
+    CHUNK_SIZE,
+    HASH_INDEX_SEARCH_SCRIPT,
+    HASH_INDEX_SEARCH_SHA,
+    SCAN_COUNT,
+    BaseModel,
+    BaseHashIndex,
+    BaseListIndex,
+    BaseSetIndex,
+    BaseSortedSetIndex,
+    decode_cursor,
+    encode_cursor,
+)
+from .cache import MISSING
+from .cluster import is_cluster
+from .codec import MODEL
 
 T = TypeVar('T')
 
 
+def evalsha(
+    redis: Redis, script: str, sha: str, keys: list, args: list, **options
+):
+    """EVALSHA cached `script`, load the script when redis lost it"""
+    command = ('EVALSHA', sha, len(keys), *keys, *args)
+    try:
+        return redis.execute_command(*command, **options)
+    except NoScriptError:
+        redis.script_load(script)
+        return redis.execute_command(*command, **options)
+
+
 class HashIndex(BaseHashIndex):
     @classmethod
     def save(
@@ -22,18 +52,49 @@ class HashIndex(BaseHashIndex):
     def remove(
         cls, redis: Union[Pipeline, Redis], model_obj: T
     ) -> None:
-        redis.hdel(cls.redis_key(), cls.index_key_value(model_obj))
+        cls.remove_value(
+            redis,
+            cls.index_key_value(model_obj),
+            cls.model_key_value(model_obj)
+        )
 
     @classmethod
-    def search_model(cls, redis: Redis, index_value) -> Optional[BaseModel]:
-        redis_key = cls.redis_key()
-        if bool(not redis.exists(redis_key)):
-            return
+    def remove_value(
+        cls, redis: Union[Pipeline, Redis], index_value: Any, model_value: Any
+    ) -> None:
+        redis.hdel(cls.redis_key(), cls.encode_index_value(index_value))
 
-        model_key_value = redis.hmget(redis_key, index_value)
-        if isinstance(model_key_value, list):
-            model_key_value = model_key_value[0]
-        return cls.__model__.search(redis, model_key_value)
+    @classmethod
+    def search_model(
+        cls, redis: Redis, index_value, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> Optional[BaseModel]:
+        index_value = cls.encode_index_value(index_value)
+        model_class = cls.__model__
+        fields = model_class._projection(only, defer)
+        instance = cls._cached_search_model(index_value, mode, fields)
+        if instance is not MISSING:
+            return instance
+        generation = model_class._cache_generation()
+
+        if is_cluster(redis) and not model_class.__hash_tag__:
+            # index and model keys are in different slots
+            key_value = redis.hget(cls.redis_key(), index_value)
+            result = None
+            if key_value is not None:
+                result = model_class._queue_search(
+                    redis, model_class.decode_key_value(key_value), fields
+                )
+        else:
+            keys, args = cls._search_script_params(index_value, fields)
+            result = evalsha(
+                redis, HASH_INDEX_SEARCH_SCRIPT, HASH_INDEX_SEARCH_SHA, keys,
+                args, **model_class.__layout__.read_options
+            )
+        return cls._parse_search_script(
+            index_value, result, generation, mode, fields
+        )
 
 
 class ListIndex(BaseListIndex):
@@ -49,35 +110,101 @@ class ListIndex(BaseListIndex):
     @classmethod
     def remove(cls, redis: Redis, model_obj: T, count: int = 1) -> None:
         """count = 0 to remove all"""
-        redis.lrem(
-            cls.redis_key(model_obj),
-            count,
-            cls.model_key_value(model_obj)
+        cls.remove_value(
+            redis,
+            cls.index_key_value(model_obj),
+            cls.model_key_value(model_obj),
+            count
         )
 
+    @classmethod
+    def remove_value(
+        cls, redis: Union[Pipeline, Redis], index_value: Any,
+        model_value: Any, count: int = 0
+    ) -> None:
+        """count = 0 to remove all"""
+        redis.lrem(cls.redis_key_from_value(index_value), count, model_value)
+
     @classmethod
     def get_members(
         cls, redis: Union[Pipeline, Redis], index_value: Any
     ) -> List[Any]:
-        return redis.lrange(cls.redis_key_from_value(index_value), 0, -1)
+        return cls.__model__.decode_key_values(
+            redis.lrange(cls.redis_key_from_value(index_value), 0, -1)
+        )
+
+    @classmethod
+    def iter_members(
+        cls, redis: Redis, index_value: Any, count: int = SCAN_COUNT
+    ) -> Iterator[Any]:
+        """Iterate members by LRANGE windows of `count` members"""
+        redis_key = cls.redis_key_from_value(index_value)
+        start = 0
+        while True:
+            values = redis.lrange(redis_key, start, start + count - 1)
+            yield from cls.__model__.decode_key_values(values)
+            if len(values) < count:
+                return
+            start += count
 
     @classmethod
-    def search_models(cls, redis: Redis, index_value: Any) -> List[BaseModel]:
+    def page_members(
+        cls, redis: Redis, index_value: Any, cursor: Optional[str] = None,
+        count: int = SCAN_COUNT
+    ) -> Tuple[List[Any], Optional[str]]:
+        """LRANGE window of `count` members from `cursor` token, `None` for
+        the first page, and the next page token, `None` after the last page
+        """
         redis_key = cls.redis_key_from_value(index_value)
-        if not redis.exists(redis_key):
-            return []
+        start = decode_cursor(cursor, redis_key)
+        values = redis.lrange(redis_key, start, start + count - 1)
+        if len(values) < count:
+            cursor = None
+        else:
+            cursor = encode_cursor(redis_key, start + count)
+        return cls.__model__.decode_key_values(values), cursor
+
+    @classmethod
+    def page_models(
+        cls, redis: Redis, index_value: Any, cursor: Optional[str] = None,
+        count: int = SCAN_COUNT, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> Tuple[List[BaseModel], Optional[str]]:
+        """Models of `page_members` page and the next page token"""
+        members, cursor = cls.page_members(redis, index_value, cursor, count)
+        models = cls.__model__.get_many(
+            redis, members, count, mode, only, defer
+        )
+        return [model for model in models if model is not None], cursor
 
-        instance_list = []
-        for value in cls.get_members(redis, index_value):
-            instance = cls.__model__.search(redis, value)
-            instance_list.append(instance)
-        return instance_list
+    @classmethod
+    def search_models(
+        cls, redis: Redis, index_value: Any, chunk_size: int = CHUNK_SIZE,
+        mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> List[BaseModel]:
+        members = cls.get_members(redis, index_value)
+        return cls.__model__.get_many(
+            redis, members, chunk_size, mode, only, defer
+        )
+
+    @classmethod
+    def delete_members(
+        cls, redis: Redis, index_value: Any, chunk_size: int = CHUNK_SIZE
+    ) -> int:
+        """Delete member models, their index entries and this index key"""
+        members = dict.fromkeys(cls.get_members(redis, index_value))
+        deleted = cls.__model__.delete_many(redis, members, chunk_size)
+        redis.delete(cls.redis_key_from_value(index_value))
+        return deleted
 
     @classmethod
     def has_member(cls, redis: Redis, model_obj: T) -> bool:
         return cls.has_member_value(
             redis,
-            getattr(model_obj, cls.__key__),
+            cls.index_key_value(model_obj),
             getattr(model_obj, model_obj.__key__)
         )
 
@@ -87,7 +214,7 @@ class ListIndex(BaseListIndex):
     ) -> bool:
         result = redis.lpos(
             cls.redis_key_from_value(index_value),
-            model_value
+            cls.__model__.encode_key_value(model_value)
         )
         return result is not None
 
@@ -100,7 +227,9 @@ class ListIndex(BaseListIndex):
             return None
         else:
             value = redis.rpoplpush(redis_key, redis_key)
-            return cls.__model__.search(redis, value)
+            return cls.__model__.search(
+                redis, cls.__model__.decode_key_value(value)
+            )
 
 
 class SetIndex(BaseSetIndex):
@@ -115,21 +244,173 @@ class SetIndex(BaseSetIndex):
 
     @classmethod
     def remove(cls, redis: Union[Pipeline, Redis], model_obj: T):
-        redis.srem(cls.redis_key(model_obj), cls.model_key_value(model_obj))
+        cls.remove_value(
+            redis,
+            cls.index_key_value(model_obj),
+            cls.model_key_value(model_obj)
+        )
+
+    @classmethod
+    def remove_value(
+        cls, redis: Union[Pipeline, Redis], index_value: Any, model_value: Any
+    ) -> None:
+        redis.srem(cls.redis_key_from_value(index_value), model_value)
 
     @classmethod
     def get_members(cls, redis: Redis, index_value) -> List[Any]:
         redis_key = cls.redis_key_from_value(index_value)
-        return redis.smembers(redis_key)
+        return cls.__model__.decode_key_values(redis.smembers(redis_key))
 
     @classmethod
-    def search_models(cls, redis: Redis, index_value) -> List[BaseModel]:
+    def iter_members(
+        cls, redis: Redis, index_value: Any, count: int = SCAN_COUNT
+    ) -> Iterator[Any]:
+        """Iterate members by SSCAN pages of `count` hint
+
+        SSCAN may return a member more than once.
+        """
         redis_key = cls.redis_key_from_value(index_value)
-        if not redis.exists(redis_key):
-            return []
+        cursor = None
+        while cursor != 0:
+            cursor, values = redis.sscan(redis_key, cursor or 0, count=count)
+            yield from cls.__model__.decode_key_values(values)
+
+    @classmethod
+    def page_members(
+        cls, redis: Redis, index_value: Any, cursor: Optional[str] = None,
+        count: int = SCAN_COUNT
+    ) -> Tuple[List[Any], Optional[str]]:
+        """SSCAN page of `count` hint from `cursor` token, `None` for the
+        first page, and the next page token, `None` after the last page
+
+        Page may be empty before the last page.
+        """
+        redis_key = cls.redis_key_from_value(index_value)
+        position, values = redis.sscan(
+            redis_key, decode_cursor(cursor, redis_key), count=count
+        )
+        cursor = encode_cursor(redis_key, position) if position else None
+        return cls.__model__.decode_key_values(values), cursor
 
+    @classmethod
+    def page_models(
+        cls, redis: Redis, index_value: Any, cursor: Optional[str] = None,
+        count: int = SCAN_COUNT, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> Tuple[List[BaseModel], Optional[str]]:
+        """Models of `page_members` page and the next page token"""
+        members, cursor = cls.page_members(redis, index_value, cursor, count)
+        models = cls.__model__.get_many(
+            redis, members, count, mode, only, defer
+        )
+        return [model for model in models if model is not None], cursor
+
+    @classmethod
+    def search_models(
+        cls, redis: Redis, index_value, chunk_size: int = CHUNK_SIZE,
+        mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> List[BaseModel]:
+        """Load members using SSCAN pages of `chunk_size`
+
+        The next SSCAN page is requested on the same pipeline as
+        the current page models, so each page costs a single round trip.
+        """
+        redis_key = cls.redis_key_from_value(index_value)
+        model_class = cls.__model__
+        fields = model_class._projection(only, defer)
         model_instances = []
-        for value in redis.smembers(redis_key):
-            model_instance = cls.__model__.search(redis, value)
-            model_instances.append(model_instance)
+        seen = set()
+        cursor, values = redis.sscan(redis_key, 0, count=chunk_size)
+        while values or cursor:
+            # SSCAN may return a member more than once
+            values = [
+                value for value in model_class.decode_key_values(values)
+                if value not in seen
+            ]
+            seen.update(values)
+            with redis.pipeline(transaction=False) as pipe:
+                for value in values:
+                    model_class._queue_search(pipe, value, fields)
+                if cursor:
+                    pipe.sscan(redis_key, cursor, count=chunk_size)
+                result_data = pipe.execute()
+            if cursor:
+                cursor, values = result_data.pop()
+            else:
+                values = []
+            model_instances.extend(
+                model_class._parse_search(data, mode, fields)
+                for data in result_data
+            )
         return model_instances
+
+    @classmethod
+    def delete_members(
+        cls, redis: Redis, index_value: Any, chunk_size: int = CHUNK_SIZE
+    ) -> int:
+        """Delete member models, their index entries and this index key"""
+        members = cls.get_members(redis, index_value)
+        deleted = cls.__model__.delete_many(redis, members, chunk_size)
+        redis.delete(cls.redis_key_from_value(index_value))
+        return deleted
+
+
+class SortedSetIndex(BaseSortedSetIndex):
+    @classmethod
+    def save(cls, redis: Union[Pipeline, Redis], model_obj: T) -> None:
+        redis.zadd(cls.redis_key(), {
+            cls.model_key_value(model_obj):
+                cls.score(getattr(model_obj, cls.__key__))
+        })
+
+    @classmethod
+    def remove(cls, redis: Union[Pipeline, Redis], model_obj: T) -> None:
+        cls.remove_value(
+            redis,
+            cls.index_key_value(model_obj),
+            cls.model_key_value(model_obj)
+        )
+
+    @classmethod
+    def remove_value(
+        cls, redis: Union[Pipeline, Redis], index_value: Any, model_value: Any
+    ) -> None:
+        redis.zrem(cls.redis_key(), model_value)
+
+    @classmethod
+    def range_members(
+        cls, redis: Redis, min: Any = None, max: Any = None,
+        offset: int = 0, limit: Optional[int] = None, reverse: bool = False
+    ) -> List[Any]:
+        """Primary key values of index values from `min` to `max`"""
+        return cls.__model__.decode_key_values(redis.execute_command(
+            *cls._range_command(min, max, offset, limit, reverse)
+        ))
+
+    @classmethod
+    def range_models(
+        cls, redis: Redis, min: Any = None, max: Any = None,
+        offset: int = 0, limit: Optional[int] = None, reverse: bool = False,
+        chunk_size: int = CHUNK_SIZE, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> List[BaseModel]:
+        """Models of index values from `min` to `max` ordered by index
+        value, loaded by pipelined `get_many`
+        """
+        members = cls.range_members(redis, min, max, offset, limit, reverse)
+        return [
+            model for model in cls.__model__.get_many(
+                redis, members, chunk_size, mode, only, defer
+            )
+            if model is not None
+        ]
+
+    @classmethod
+    def count_range(
+        cls, redis: Redis, min: Any = None, max: Any = None
+    ) -> int:
+        return redis.execute_command(*cls._count_command(min, max))
@@ -0,0 +1,326 @@
+import struct
+from itertools import chain
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from RSO.codec import model_codec
+from RSO.schema import key_schema
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+# redis-py command option returning reply as bytes for binary values
+NEVER_DECODE = 'NEVER_DECODE'
+
+
+class HashLayout:
+    """Model stored as redis hash, a hash field per model field
+
+    Default layout of `Model.__layout__`. Layouts turn model field values
+    (`Model.to_redis` result) into write commands and read command reply
+    into field values, so models and indexes work the same on any layout.
+    Models are addressed by primary key `value`.
+    """
+
+    # whole value is read and written at once
+    packed = False
+    # many models are stored in a single redis key
+    bucketed = False
+    # options of read commands, see `NEVER_DECODE`
+    read_options: Dict[str, Any] = {}
+
+    def storage_key(self, model_class, value: Any) -> str:
+        """Redis key holding the model of `value`"""
+        return model_class.redis_key_from_value(value)
+
+    def scan_pattern(self, model_class) -> str:
+        """SCAN pattern of `storage_key` keys"""
+        return model_class.redis_key_pattern()
+
+    def read_command(
+        self, model_class, value: Any, fields: Sequence[str]
+    ) -> tuple:
+        return ('HMGET', self.storage_key(model_class, value), *fields)
+
+    def script_args(self, model_class, fields: Sequence[str]) -> tuple:
+        """Read arguments of `RSO.base.HASH_INDEX_SEARCH_SCRIPT`"""
+        return ('HMGET', *fields)
+
+    def exists_command(self, model_class, value: Any) -> tuple:
+        return ('EXISTS', self.storage_key(model_class, value))
+
+    def found(self, reply: Any) -> bool:
+        """Whether `read_command` reply is of existing model"""
+        return any(value is not None for value in reply)
+
+    def values(self, model_class, reply: Any, fields: Sequence[str]) -> list:
+        """Field values of `read_command` reply, in `fields` order"""
+        if reply is None:
+            return [None] * len(fields)
+        return reply
+
+    def write_commands(
+        self, model_class, value: Any, data: dict,
+        changes: Optional[Tuple[dict, List[str]]] = None
+    ) -> List[tuple]:
+        """Commands writing `data`, or only `(changed, removed)` fields"""
+        redis_key = self.storage_key(model_class, value)
+        if changes is None:
+            return [('HSET', redis_key, *chain.from_iterable(data.items()))]
+        changed, removed = changes
+        commands = []
+        if changed:
+            commands.append(
+                ('HSET', redis_key, *chain.from_iterable(changed.items()))
+            )
+        if removed:
+            commands.append(('HDEL', redis_key, *removed))
+        return commands
+
+    def delete_commands(
+        self, model_class, values: Sequence[Any]
+    ) -> List[tuple]:
+        """Commands deleting models of `values`, replies sum is the number
+        of deleted models
+        """
+        if not values:
+            return []
+        return [('DEL', *key_schema(model_class).keys(values))]
+
+
+class PackedLayout(HashLayout):
+    """Model packed into a single string value, read with GET
+
+    Whole value is written whenever any field is changed and `only` /
+    `defer` projections have no effect. Subclasses implement `dumps` and
+    `loads` of `Model.to_redis` result.
+    """
+
+    packed = True
+    read_options = {NEVER_DECODE: True}
+
+    def dumps(self, model_class, data: dict) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, model_class, value: bytes) -> dict:
+        raise NotImplementedError
+
+    def read_command(
+        self, model_class, value: Any, fields: Sequence[str]
+    ) -> tuple:
+        return ('GET', self.storage_key(model_class, value))
+
+    def script_args(self, model_class, fields: Sequence[str]) -> tuple:
+        return ('GET',)
+
+    def found(self, reply: Any) -> bool:
+        return reply is not None
+
+    def values(self, model_class, reply: Any, fields: Sequence[str]) -> list:
+        if reply is None:
+            return [None] * len(fields)
+        if isinstance(reply, str):
+            # value decoded by client
+            reply = reply.encode('utf-8', 'surrogateescape')
+        data = self.loads(model_class, reply)
+        return [data.get(name) for name in fields]
+
+    def write_commands(
+        self, model_class, value: Any, data: dict,
+        changes: Optional[Tuple[dict, List[str]]] = None
+    ) -> List[tuple]:
+        if changes is not None and not any(changes):
+            return []
+        return [(
+            'SET', self.storage_key(model_class, value),
+            self.dumps(model_class, data)
+        )]
+
+
+class MsgpackLayout(PackedLayout):
+    """Model packed by msgpack as map of field name to value
+
+    Requires `msgpack` package, `pip install redis_simple_orm[msgpack]`.
+    """
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImportError('MsgpackLayout requires msgpack package')
+
+    def dumps(self, model_class, data: dict) -> bytes:
+        return msgpack.packb(data, use_bin_type=True)
+
+    def loads(self, model_class, value: bytes) -> dict:
+        return msgpack.unpackb(value, raw=False)
+
+
+class StructLayout(PackedLayout):
+    """Model packed by `struct` in field order, without field names
+
+    `int`, `float` and `bool` fields are stored as 8 byte integer, double
+    and a byte, `bytes` and other fields as length prefixed (UTF-8) text.
+    Value starts with `MAGIC` byte, field count and a bitmap of not `None`
+    fields. Fields are stored by position, so new fields are to be added
+    last and fields are not to be removed or reordered.
+    """
+
+    # not valid as first UTF-8 byte, clients keep the value as bytes
+    MAGIC = b'\xff'
+    HEADER = struct.Struct('<H')
+    LENGTH = struct.Struct('<I')
+    NUMBERS = {
+        int: struct.Struct('<q'),
+        float: struct.Struct('<d'),
+        bool: struct.Struct('<?'),
+    }
+
+    def __init__(self):
+        # model class -> [(stored field name, number struct, is bytes)]
+        self._schemas: Dict[type, list] = {}
+
+    def _schema(self, model_class) -> list:
+        schema = self._schemas.get(model_class)
+        if schema is None:
+            codec = model_codec(model_class)
+            schema = [
+                (
+                    stored,
+                    self.NUMBERS.get(codec.types[name]),
+                    codec.types[name] is bytes
+                )
+                for name, stored in zip(codec.fields, codec.stored_fields)
+            ]
+            self._schemas[model_class] = schema
+        return schema
+
+    def dumps(self, model_class, data: dict) -> bytes:
+        schema = self._schema(model_class)
+        bitmap = bytearray((len(schema) + 7) // 8)
+        parts = []
+        for position, (name, number, _) in enumerate(schema):
+            value = data.get(name)
+            if value is None:
+                continue
+            bitmap[position // 8] |= 1 << (position % 8)
+            if number is not None:
+                parts.append(number.pack(value))
+                continue
+            if not isinstance(value, bytes):
+                value = str(value).encode()
+            parts.append(self.LENGTH.pack(len(value)))
+            parts.append(value)
+        return b''.join((
+            self.MAGIC, self.HEADER.pack(len(schema)), bitmap, *parts
+        ))
+
+    def loads(self, model_class, value: bytes) -> dict:
+        if value[:1] != self.MAGIC:
+            raise ValueError(f'Not a {type(self).__name__} value')
+        schema = self._schema(model_class)
+        count, = self.HEADER.unpack_from(value, 1)
+        offset = 1 + self.HEADER.size
+        bitmap = value[offset:offset + (count + 7) // 8]
+        offset += len(bitmap)
+        data = {}
+        for position, (name, number, is_bytes) in enumerate(schema[:count]):
+            if not bitmap[position // 8] & (1 << (position % 8)):
+                continue
+            if number is not None:
+                data[name], = number.unpack_from(value, offset)
+                offset += number.size
+                continue
+            length, = self.LENGTH.unpack_from(value, offset)
+            offset += self.LENGTH.size
+            text = value[offset:offset + length]
+            offset += length
+            data[name] = text if is_bytes else text.decode()
+        return data
+
+
+class BucketLayout(PackedLayout):
+    """Models packed into shared hashes of `bucket_size` models each
+
+    Model of integer primary key `value` is a field of hash
+    `{model key prefix}::bucket:{value // bucket_size}`, packed by
+    `packing` layout (`StructLayout` by default). Small hashes are kept in
+    compact listpack (ziplist before redis 7) encoding, saving per key
+    overhead of a key per model. Keep `bucket_size` within
+    `hash-max-listpack-entries` (default 128) and raise
+    `hash-max-listpack-value` (default 64 bytes) over the packed model
+    size, otherwise the bucket is converted to a regular hash table.
+
+    >>> UserModel.__layout__ = BucketLayout(bucket_size=100)
+    >>> UserModel.migrate_layout(redis, HASH_LAYOUT)
+    """
+
+    bucketed = True
+
+    def __init__(
+        self, packing: Optional[PackedLayout] = None, bucket_size: int = 100
+    ):
+        if bucket_size < 1:
+            raise ValueError('bucket_size must be positive')
+        self.packing = StructLayout() if packing is None else packing
+        self.bucket_size = bucket_size
+
+    def dumps(self, model_class, data: dict) -> bytes:
+        return self.packing.dumps(model_class, data)
+
+    def loads(self, model_class, value: bytes) -> dict:
+        return self.packing.loads(model_class, value)
+
+    def bucket(self, value: Any) -> int:
+        """Bucket number of primary key `value`"""
+        try:
+            return int(value) // self.bucket_size
+        except (TypeError, ValueError):
+            raise ValueError(
+                f'BucketLayout requires integer primary key, got {value!r}'
+            ) from None
+
+    def storage_key(self, model_class, value: Any) -> str:
+        if model_class.__key_codec__ is not None:
+            raise ValueError('BucketLayout does not support __key_codec__')
+        return f'{key_schema(model_class).bucket_prefix}{self.bucket(value)}'
+
+    def scan_pattern(self, model_class) -> str:
+        return f'{key_schema(model_class).bucket_prefix}*'
+
+    def read_command(
+        self, model_class, value: Any, fields: Sequence[str]
+    ) -> tuple:
+        return ('HGET', self.storage_key(model_class, value), str(value))
+
+    def script_args(self, model_class, fields: Sequence[str]) -> tuple:
+        return ('HGET', self.bucket_size)
+
+    def exists_command(self, model_class, value: Any) -> tuple:
+        return ('HEXISTS', self.storage_key(model_class, value), str(value))
+
+    def write_commands(
+        self, model_class, value: Any, data: dict,
+        changes: Optional[Tuple[dict, List[str]]] = None
+    ) -> List[tuple]:
+        if changes is not None and not any(changes):
+            return []
+        return [(
+            'HSET', self.storage_key(model_class, value), str(value),
+            self.dumps(model_class, data)
+        )]
+
+    def delete_commands(
+        self, model_class, values: Sequence[Any]
+    ) -> List[tuple]:
+        buckets: Dict[str, List[str]] = {}
+        for value in values:
+            buckets.setdefault(
+                self.storage_key(model_class, value), []
+            ).append(str(value))
+        return [
+            ('HDEL', redis_key, *fields)
+            for redis_key, fields in buckets.items()
+        ]
+
+
+HASH_LAYOUT = HashLayout()
@@ -0,0 +1,50 @@
+from typing import Any
+
+from redis.client import Redis
+
+from RSO.codec import DEFERRED
+from RSO.model import Model
+
+
+class LazyModel:
+    """Proxy of a model loaded with `only` / `defer` projection
+
+    Deferred fields are loaded by `Model.load_deferred`, a single HMGET,
+    on first access to any of them. Other attributes and methods are
+    those of the model, `isinstance` checks against the model class pass.
+    Use `load_deferred` directly with asyncio and txredisapi models.
+
+    >>> user = LazyModel(redis, UserModel.search(redis, 1, only=['email']))
+    >>> user.username  # loads deferred fields
+    """
+
+    __slots__ = ('_redis', '_model')
+
+    def __init__(self, redis: Redis, model: Model):
+        object.__setattr__(self, '_redis', redis)
+        object.__setattr__(self, '_model', model)
+
+    @property
+    def __class__(self):
+        return type(self._model)
+
+    def __getattr__(self, name: str) -> Any:
+        value = getattr(self._model, name)
+        if value is DEFERRED:
+            self._model.load_deferred(self._redis)
+            value = getattr(self._model, name)
+        return value
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._model, name, value)
+
+    def __eq__(self, other: Any) -> bool:
+        self._model.load_deferred(self._redis)
+        if isinstance(other, LazyModel):
+            other = other._model
+        return self._model == other
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f'LazyModel({self._model!r})'
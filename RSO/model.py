@@ -1,75 +1,452 @@
-from typing import List, Optional, Union
+from itertools import chain
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
 
 from redis.client import Pipeline, Redis
+from redis.cluster import ClusterPipeline
+from redis.exceptions import RedisError
 
-from RSO.base import BaseModel
+from RSO.base import (
+    CHUNK_SIZE,
+    SCAN_COUNT,
+    BaseIndex,
+    BaseListIndex,
+    BaseModel,
+    apply_snapshots,
+    chunked,
+)
+from RSO.cache import MISSING
+from RSO.cluster import (
+    check_transaction,
+    is_cluster,
+    scan_nodes,
+    split_commands,
+    transaction_allowed,
+)
+from RSO.codec import MODEL
+from RSO.layout import HashLayout
+from RSO.replica import ReplicaPipeline
+from RSO.sharding import ShardedPipeline
+
+PIPE_CLS = (Pipeline, ClusterPipeline, ShardedPipeline, ReplicaPipeline)
+
+
+def scan_keys(redis: Redis, match: str, count: int) -> Iterator[List[str]]:
+    """Iterate pages of keys found by SCAN, of every cluster primary"""
+    nodes = scan_nodes(redis, match) if is_cluster(redis) else [None]
+    for node in nodes:
+        cursor = 0
+        while True:
+            if node is None:
+                cursor, keys = redis.scan(cursor, match=match, count=count)
+            else:
+                cursors, keys = redis.scan(
+                    cursor, match=match, count=count, target_nodes=node
+                )
+                cursor = cursors[node.name]
+            if keys:
+                yield keys
+            if not cursor:
+                break
 
 
 class Model(BaseModel):
+    __slots__ = ()
+
     def is_exists(self, redis: Redis):
-        return bool(redis.exists(self.redis_key))
+        return bool(redis.execute_command(*self._exists_command()))
+
+    def load_deferred(self, redis: Redis) -> None:
+        """Load fields deferred by `only` / `defer` using a single HMGET"""
+        fields = self._deferred_fields()
+        if fields:
+            self._set_deferred(fields, redis.hmget(
+                self.redis_key, self._stored_fields(fields)
+            ))
+
+    def save(self, redis: Union[Pipeline, Redis]) -> Optional[tuple]:
+        """Write the model, only its changes when it is loaded or saved
 
-    def save(self, redis: Union[Pipeline, Redis]):
-        if isinstance(redis, Pipeline):
+        Saving on a pipeline returns the pending snapshot, taken by
+        `apply_snapshots` once the pipeline is executed.
+        """
+        if isinstance(redis, PIPE_CLS):
             pipe = redis
         else:
-            pipe = redis.pipeline()
+            pipe = redis.pipeline(
+                transaction=transaction_allowed(redis, type(self))
+            )
 
-        pipe.hset(self.redis_key, mapping=self.to_redis())
-        for index_class in self.__indexes__ or []:
-            if getattr(self, index_class.__key__) is None:
-                continue
-            index_class.save(pipe, self)
+        changes = self._diff_snapshot()
+        if changes is None:
+            for command in self._write_commands():
+                pipe.execute_command(*command)
+            if self.__registry__:
+                key_value = getattr(self, self.__key__)
+                pipe.zadd(self.registry_key(), {
+                    self.registry_member(key_value):
+                        self.registry_score(key_value)
+                })
+            for index_class in self.__indexes__ or []:
+                if index_class.index_key_value(self) is None:
+                    continue
+                index_class.save(pipe, self)
+        else:
+            # loaded model, only write the changes
+            for command in self._write_commands(changes):
+                pipe.execute_command(*command)
+            _, _, indexes = changes
+            for index_class, old_value, new_value in indexes:
+                if old_value is not None:
+                    index_class.remove_value(
+                        pipe, old_value, BaseIndex.model_key_value(self)
+                    )
+                if new_value is not None:
+                    index_class.save(pipe, self)
+            changed = {index_class for index_class, _, _ in indexes}
+            for index_class in self.__indexes__ or []:
+                # every save pushes list index member, e.g. to queue again
+                if issubclass(index_class, BaseListIndex) \
+                        and index_class not in changed \
+                        and index_class.index_key_value(self) is not None:
+                    index_class.save(pipe, self)
 
-        if not isinstance(redis, Pipeline):
-            pipe.execute()
+        snapshot = self._snapshot()
+        if isinstance(redis, PIPE_CLS):
+            # dropped again once the pipeline is executed, see `save_many`
+            self._cache_discard_model()
+            return snapshot
+        pipe.execute()
+        self._cache_discard_model()
+        self._take_snapshot(snapshot)
+        return None
 
     @classmethod
-    def search(cls, redis: Redis, value) -> Optional['Model']:
-        redis_key = cls.redis_key_from_value(value)
-        if bool(redis.exists(redis_key)):
-            fields = cls.get_fields()
-            redis_data = redis.hmget(redis_key, fields)
-            dict_data = cls.from_redis(dict(zip(fields, redis_data)))
-            return cls(**dict_data)
-        else:
+    def save_many(
+        cls, redis: Redis, models: Iterable['Model'],
+        chunk_size: int = CHUNK_SIZE, transactional: bool = False
+    ) -> List[Tuple[List['Model'], Exception]]:
+        """Save models and their indexes using one pipeline per chunk
+
+        Failed chunk does not stop the next chunks, the failed chunks are
+        returned with their first error. Empty list means all is saved.
+        """
+        if transactional:
+            check_transaction(redis, cls)
+        failures = []
+        for chunk in chunked(models, chunk_size):
+            queued = []
+            with redis.pipeline(transaction=transactional) as pipe:
+                for model in chunk:
+                    start = len(pipe)
+                    snapshot = model.save(pipe)
+                    queued.append((model, snapshot, start, len(pipe)))
+                try:
+                    result = pipe.execute(raise_on_error=False)
+                except RedisError as error:
+                    failures.append((chunk, error))
+                    continue
+                finally:
+                    # search during execute may have cached the old model
+                    for model in chunk:
+                        model._cache_discard_model()
+            failed = apply_snapshots(queued, result)
+            if failed:
+                failures.append((chunk, failed[0][1]))
+        return failures
+
+    @classmethod
+    def search(
+        cls, redis: Redis, value, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> Optional['Model']:
+        fields = cls._projection(only, defer)
+        instance = cls._cached_search(value, mode, fields)
+        if instance is not MISSING:
+            return instance
+        generation = cls._cache_generation()
+
+        redis_data = cls._search_reply(
+            cls._queue_search(redis, value, fields)
+        )
+        if fields is None or redis_data is None:
+            cls._cache_search(value, redis_data, generation)
+        if redis_data is None:
             return None
+        return cls._parse_search(redis_data, mode, fields)
 
     @classmethod
-    def all(cls, redis: Redis) -> List['Model']:
-        redis_key = cls.redis_key_from_value('*')
-        members = redis.keys(redis_key)
-        indexes = []
-        for index_class in cls.__indexes__:
-            indexes.append(
-                f'::{index_class.__index_name__}::{index_class.__key__}'
-            )
-        with redis.pipeline(transaction=True) as pipe:
-            for member in members:
-                is_index = False
-                for index in indexes:
-                    if index in member:
-                        is_index = True
-                        break
-                if not is_index:
-                    pipe.hgetall(member)
-            result_data = pipe.execute()
+    def get_many(
+        cls, redis: Redis, values: Iterable, chunk_size: int = CHUNK_SIZE,
+        mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> List[Optional['Model']]:
+        """Search models by primary key values using pipelined HMGET
 
+        Result follows `values` order, `None` for not found model.
+        """
+        fields = cls._projection(only, defer)
         result = []
-        for data in result_data:
-            result.append(cls(**data))
+        for chunk in chunked(values, chunk_size):
+            with redis.pipeline(transaction=False) as pipe:
+                for value in chunk:
+                    cls._queue_search(pipe, value, fields)
+                result_data = pipe.execute()
+            result.extend(
+                cls._parse_search(data, mode, fields)
+                for data in result_data
+            )
         return result
 
+    @classmethod
+    def all(
+        cls, redis: Redis, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> List['Model']:
+        if not cls.__registry__:
+            return list(
+                cls.iter_all(redis, mode=mode, only=only, defer=defer)
+            )
+        members = cls.decode_key_values(
+            redis.zrange(cls.registry_key(), 0, -1)
+        )
+        result = cls.get_many(
+            redis, members, mode=mode, only=only, defer=defer
+        )
+        return [instance for instance in result if instance is not None]
+
+    @classmethod
+    def _scan_key_values(
+        cls, redis: Redis, count: int = SCAN_COUNT,
+        layout: Optional[HashLayout] = None
+    ) -> Iterator[List[str]]:
+        """Iterate pages of primary key values found by keyspace SCAN
+
+        Keys of `layout`, model `__layout__` by default, are scanned.
+        Primary key values of bucketed layout are its bucket hash fields.
+        """
+        layout = layout or cls.__layout__
+        for keys in scan_keys(redis, layout.scan_pattern(cls), count):
+            if layout.bucketed:
+                with redis.pipeline(transaction=False) as pipe:
+                    for key in keys:
+                        pipe.hkeys(key)
+                    yield list(chain.from_iterable(pipe.execute()))
+            else:
+                yield [cls.key_value_from_redis_key(key) for key in keys]
+
+    @classmethod
+    def _iter_key_values(
+        cls, redis: Redis, count: int = SCAN_COUNT,
+        layout: Optional[HashLayout] = None
+    ) -> Iterator[List[str]]:
+        """Iterate pages of primary key values, from registry if enabled"""
+        if not cls.__registry__:
+            yield from cls._scan_key_values(redis, count, layout)
+            return
+
+        cursor = 0
+        while True:
+            cursor, members = redis.zscan(
+                cls.registry_key(), cursor, count=count
+            )
+            if members:
+                yield [
+                    cls.decode_key_value(member) for member, _ in members
+                ]
+            if not cursor:
+                break
+
+    @classmethod
+    def iter_all(
+        cls, redis: Redis, count: int = SCAN_COUNT, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> Iterator['Model']:
+        """Iterate all models without blocking redis
+
+        Model keys (or registry members) are walked by SCAN with `count`
+        hint and each page is loaded in a single non-transactional pipeline.
+        As with SCAN, a model may be yielded more than once while keyspace
+        is rehashed.
+        """
+        fields = cls._projection(only, defer)
+        for values in cls._iter_key_values(redis, count):
+            with redis.pipeline(transaction=False) as pipe:
+                for value in values:
+                    cls._queue_search(pipe, value, fields)
+                result_data = pipe.execute()
+            for data in result_data:
+                instance = cls._parse_search(data, mode, fields)
+                if instance is not None:
+                    yield instance
+
+    @classmethod
+    def count(cls, redis: Redis) -> int:
+        if cls.__registry__:
+            return redis.zcard(cls.registry_key())
+        return sum(len(values) for values in cls._iter_key_values(redis))
+
+    @classmethod
+    def page(
+        cls, redis: Redis, offset: int = 0, limit: int = CHUNK_SIZE,
+        mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> List['Model']:
+        """Models ordered by primary key, registry is required"""
+        cls._check_registry()
+        members = cls.decode_key_values(redis.zrange(
+            cls.registry_key(), offset, offset + limit - 1
+        ))
+        result = cls.get_many(
+            redis, members, mode=mode, only=only, defer=defer
+        )
+        return [instance for instance in result if instance is not None]
+
+    @classmethod
+    def random(
+        cls, redis: Redis, count: int = 1, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> List['Model']:
+        """Sample distinct random models, registry is required"""
+        cls._check_registry()
+        members = redis.zrandmember(cls.registry_key(), count)
+        result = cls.get_many(
+            redis, cls.decode_key_values(members or []), mode=mode,
+            only=only, defer=defer
+        )
+        return [instance for instance in result if instance is not None]
+
+    @classmethod
+    def build_registry(cls, redis: Redis, count: int = SCAN_COUNT) -> int:
+        """Register existing models found by SCAN, return registered count"""
+        cls._check_registry()
+        total = 0
+        for values in cls._scan_key_values(redis, count):
+            redis.zadd(cls.registry_key(), {
+                cls.registry_member(value): cls.registry_score(value)
+                for value in values
+            })
+            total += len(values)
+        return total
+
+    @classmethod
+    def migrate_layout(
+        cls, redis: Redis, source: HashLayout, count: int = SCAN_COUNT
+    ) -> int:
+        """Move models stored in `source` layout to model `__layout__`
+
+        Models are walked by registry or by SCAN of `source` keys, every
+        page is moved in a transaction. Indexes and registry are kept as
+        they are. Interrupted migration is resumed by calling it again.
+        Return the number of moved models.
+        """
+        moved = 0
+        for values in cls._iter_key_values(redis, count, source):
+            with redis.pipeline(transaction=False) as pipe:
+                for value in values:
+                    pipe.execute_command(
+                        *source.read_command(cls, value, cls.get_fields()),
+                        **source.read_options
+                    )
+                replies = pipe.execute(raise_on_error=False)
+            done, commands = cls._migrate_commands(source, values, replies)
+            if not commands:
+                continue
+            if is_cluster(redis):
+                commands = split_commands(commands)
+            with redis.pipeline(
+                transaction=transaction_allowed(redis, cls)
+            ) as pipe:
+                for command in commands:
+                    pipe.execute_command(*command)
+                pipe.execute()
+            moved += len(done)
+        if cls.__cache__ is not None:
+            cls.__cache__.clear()
+        return moved
+
+    @classmethod
+    def delete_many(
+        cls, redis: Redis, keys_or_models: Iterable,
+        chunk_size: int = CHUNK_SIZE
+    ) -> int:
+        """Delete models by primary key values or model instances
+
+        Only index fields of primary key values are loaded to clean up
+        the indexes. Return the number of deleted models.
+        """
+        index_fields = cls._index_fields()
+        deleted = 0
+        for chunk in chunked(keys_or_models, chunk_size):
+            values = [
+                item for item in chunk if not isinstance(item, BaseModel)
+            ]
+            result_data = []
+            if values and index_fields:
+                with redis.pipeline(transaction=False) as pipe:
+                    for value in values:
+                        cls._queue_search(pipe, value, index_fields)
+                    result_data = pipe.execute()
+            rows = cls._delete_rows(chunk, iter(result_data))
+
+            with redis.pipeline(transaction=False) as pipe:
+                commands = cls._delete_commands([
+                    key_value for key_value, _ in rows
+                ])
+                if is_cluster(redis):
+                    commands = split_commands(commands)
+                for command in commands:
+                    pipe.execute_command(*command)
+                for key_value, index_data in rows:
+                    for index_class in cls.__indexes__ or []:
+                        index_value = index_data.get(index_class)
+                        if index_value is not None:
+                            index_class.remove_value(
+                                pipe, index_value,
+                                cls.encode_key_value(key_value)
+                            )
+                if cls.__registry__:
+                    pipe.zrem(cls.registry_key(), *[
+                        cls.registry_member(key_value) for key_value, _ in rows
+                    ])
+                deleted += sum(pipe.execute()[:len(commands)])
+            for key_value, _ in rows:
+                cls._cache_discard(key_value)
+        return deleted
+
     def delete(self, redis: Union[Pipeline, Redis]):
-        if isinstance(redis, Pipeline):
+        if isinstance(redis, PIPE_CLS):
             pipe = redis
         else:
-            pipe = redis.pipeline()
+            pipe = redis.pipeline(
+                transaction=transaction_allowed(redis, type(self))
+            )
 
+        changed = self._changed_index_values()
         for index_class in self.__indexes__:
-            if getattr(self, index_class.__key__) is not None:
+            if index_class in changed:
+                # loaded model, remove the stored index value
+                if changed[index_class] is not None:
+                    index_class.remove_value(
+                        pipe, changed[index_class],
+                        BaseIndex.model_key_value(self)
+                    )
+            elif index_class.index_key_value(self) is not None:
                 index_class.remove(pipe, self)
 
-        pipe.delete(self.redis_key)
-        if not isinstance(redis, Pipeline):
+        for command in self._delete_commands([getattr(self, self.__key__)]):
+            pipe.execute_command(*command)
+        if self.__registry__:
+            pipe.zrem(
+                self.registry_key(),
+                self.registry_member(getattr(self, self.__key__))
+            )
+        if not isinstance(redis, PIPE_CLS):
             pipe.execute()
+        self._cache_discard_model()
+        self._forget_snapshot()
@@ -0,0 +1,306 @@
+"""Set algebra queries of `SetIndex` members, run on the server
+
+Conditions of set index values are composed by `&` (and), `|` (or) and
+`~` (not, only within and), the matching primary key values are computed
+by SINTER, SUNION and SDIFF:
+
+>>> condition = Match(SetIndexGroupID, 7) & Match(SetIndexQueue, 3) \\
+...     & ~Match(SetIndexGroupID, 9)
+>>> Query(condition, ttl=60).models(redis, limit=20)
+
+Nested conditions are stored in temporary keys. Query of `ttl` stores its
+result by the *STORE variant in a key kept for `ttl` seconds, the next
+reads of the same query reuse the result. Only the result page of
+`offset` and `limit`, sorted by SORT, is hydrated.
+"""
+from hashlib import sha1
+from typing import Any, Iterable, List, Optional, Tuple
+
+from redis.client import Redis
+
+from RSO.base import CHUNK_SIZE, BaseModel, BaseSetIndex
+from RSO.cluster import transaction_allowed
+from RSO.codec import MODEL, model_codec
+from RSO.schema import key_schema
+
+# seconds temporary keys are kept when a query fails
+TEMP_TTL = 60
+
+
+class Condition:
+    """Condition of a `Query`, composed by `&`, `|`, `-` and `~`"""
+
+    def __and__(self, other: 'Condition') -> 'And':
+        return And(self, other)
+
+    def __or__(self, other: 'Condition') -> 'Or':
+        return Or(self, other)
+
+    def __sub__(self, other: 'Condition') -> 'And':
+        return And(self, Not(other))
+
+    def __invert__(self) -> 'Not':
+        return Not(self)
+
+    def model_classes(self) -> set:
+        raise NotImplementedError
+
+
+class Match(Condition):
+    """Members of `index_class` set index of `value`"""
+
+    def __init__(self, index_class, value: Any):
+        if not issubclass(index_class, BaseSetIndex):
+            raise TypeError(f'{index_class.__name__} is not a set index')
+        self.index_class = index_class
+        self.value = value
+        self.redis_key = index_class.redis_key_from_value(value)
+
+    def __repr__(self) -> str:
+        return f'Match({self.redis_key})'
+
+    def model_classes(self) -> set:
+        return {self.index_class.__model__}
+
+
+class And(Condition):
+    def __init__(self, *conditions: Condition):
+        self.conditions: Tuple[Condition, ...] = tuple(
+            child for condition in conditions
+            for child in (
+                condition.conditions if isinstance(condition, And)
+                else (condition,)
+            )
+        )
+
+    def __repr__(self) -> str:
+        return f'And({", ".join(map(repr, self.conditions))})'
+
+    def model_classes(self) -> set:
+        return set().union(*(
+            child.model_classes() for child in self.conditions
+        ))
+
+
+class Or(Condition):
+    def __init__(self, *conditions: Condition):
+        self.conditions: Tuple[Condition, ...] = tuple(
+            child for condition in conditions
+            for child in (
+                condition.conditions if isinstance(condition, Or)
+                else (condition,)
+            )
+        )
+
+    def __repr__(self) -> str:
+        return f'Or({", ".join(map(repr, self.conditions))})'
+
+    def model_classes(self) -> set:
+        return set().union(*(
+            child.model_classes() for child in self.conditions
+        ))
+
+
+class Not(Condition):
+    def __init__(self, condition: Condition):
+        self.condition = condition
+
+    def __repr__(self) -> str:
+        return f'Not({self.condition!r})'
+
+    def model_classes(self) -> set:
+        return self.condition.model_classes()
+
+
+class BaseQuery:
+    """Commands of a query shared by sync, asyncio and txredisapi queries
+
+    Conditions are of the same model. `ttl` seconds result is kept for,
+    empty result is not kept.
+    """
+
+    def __init__(self, condition: Condition, ttl: Optional[int] = None):
+        models = condition.model_classes()
+        if len(models) != 1:
+            raise ValueError('Query conditions are of different models')
+        self.condition = condition
+        self.ttl = ttl
+        self.model: Any = models.pop()
+        self.redis_key = self._query_key(condition)
+        # STORE commands of nested conditions and their keys
+        self._stores: List[tuple] = []
+        self._temp_keys: List[str] = []
+        self._operation = self._compile(condition)
+
+    def _query_key(self, condition: Condition) -> str:
+        digest = sha1(repr(condition).encode()).hexdigest()
+        return f'{key_schema(self.model).query_prefix}{digest}'
+
+    def _compile(self, condition: Condition) -> tuple:
+        """SINTER, SUNION or SDIFF command of `condition`, `None` command
+        name of `Match`
+        """
+        if isinstance(condition, Match):
+            return None, condition.redis_key
+        if isinstance(condition, Not):
+            raise ValueError('Not is only allowed in And condition')
+        if isinstance(condition, Or):
+            if any(isinstance(child, Not) for child in condition.conditions):
+                raise ValueError('Not is only allowed in And condition')
+            return ('SUNION', *map(self._key, condition.conditions))
+
+        included = [
+            child for child in condition.conditions
+            if not isinstance(child, Not)
+        ]
+        excluded = [
+            child.condition for child in condition.conditions
+            if isinstance(child, Not)
+        ]
+        if not included:
+            raise ValueError('And condition is not to be only of Not')
+        if not excluded:
+            return ('SINTER', *map(self._key, included))
+        if len(included) == 1:
+            first = self._key(included[0])
+        else:
+            first = self._store(And(*included))
+        return ('SDIFF', first, *map(self._key, excluded))
+
+    def _key(self, condition: Condition) -> str:
+        if isinstance(condition, Match):
+            return condition.redis_key
+        return self._store(condition)
+
+    def _store(self, condition: Condition) -> str:
+        """Temporary key of nested condition"""
+        redis_key = self._query_key(condition)
+        name, *keys = self._compile(condition)
+        if redis_key not in self._temp_keys:
+            self._stores.extend([
+                (f'{name}STORE', redis_key, *keys),
+                ('EXPIRE', redis_key, TEMP_TTL),
+            ])
+            self._temp_keys.append(redis_key)
+        return redis_key
+
+    def _check_cluster(self, redis) -> None:
+        if self._operation[0] is not None \
+                and not transaction_allowed(redis, self.model):
+            raise RuntimeError(
+                f'{self.model.__name__} index keys are in different cluster '
+                f'slots, set `__hash_tag__ = True` for query'
+            )
+
+    def _sort_command(
+        self, redis_key: str, offset: int, limit: Optional[int]
+    ) -> tuple:
+        """SORT page of primary key values, numeric keys by value"""
+        command = [
+            'SORT', redis_key, 'LIMIT', offset, -1 if limit is None else limit
+        ]
+        numeric = model_codec(self.model).types.get(self.model.__key__)
+        if self.model.__key_codec__ is not None or numeric not in (int, float):
+            command.append('ALPHA')
+        return tuple(command)
+
+    def _read_command(
+        self, redis_key: str, read: str, offset: int, limit: Optional[int]
+    ) -> tuple:
+        if read == 'count':
+            return 'SCARD', redis_key
+        if offset or limit is not None:
+            return self._sort_command(redis_key, offset, limit)
+        return 'SMEMBERS', redis_key
+
+    def _cached_commands(
+        self, read: str, offset: int = 0, limit: Optional[int] = None
+    ) -> List[tuple]:
+        """EXISTS and read of the kept result"""
+        return [
+            ('EXISTS', self.redis_key),
+            self._read_command(self.redis_key, read, offset, limit),
+        ]
+
+    def _commands(
+        self, read: str, offset: int = 0, limit: Optional[int] = None
+    ) -> Tuple[List[tuple], int]:
+        """Commands of the query and index of the read command reply
+
+        `read` is `members` or `count`. The result is stored when it is
+        kept, counted or paged, otherwise it is read by SINTER, SUNION or
+        SDIFF. Temporary keys are deleted after the read.
+        """
+        name, *keys = self._operation
+        commands = list(self._stores)
+        delete = list(self._temp_keys)
+        if name is None:
+            commands.append(self._read_command(keys[0], read, offset, limit))
+        elif self.ttl is None and read == 'members' \
+                and not offset and limit is None:
+            commands.append((name, *keys))
+        else:
+            commands.extend([
+                (f'{name}STORE', self.redis_key, *keys),
+                ('EXPIRE', self.redis_key, self.ttl or TEMP_TTL),
+                self._read_command(self.redis_key, read, offset, limit),
+            ])
+            if self.ttl is None:
+                delete.append(self.redis_key)
+        index = len(commands) - 1
+        if delete:
+            commands.append(('DEL', *delete))
+        return commands, index
+
+
+class Query(BaseQuery):
+    def _execute(
+        self, redis: Redis, read: str, offset: int = 0,
+        limit: Optional[int] = None
+    ) -> Any:
+        self._check_cluster(redis)
+        transaction = transaction_allowed(redis, self.model)
+        if self.ttl is not None and self._operation[0] is not None:
+            with redis.pipeline(transaction=transaction) as pipe:
+                for command in self._cached_commands(read, offset, limit):
+                    pipe.execute_command(*command)
+                exists, result = pipe.execute()
+            if exists:
+                return result
+        commands, index = self._commands(read, offset, limit)
+        if len(commands) == 1:
+            return redis.execute_command(*commands[0])
+        with redis.pipeline(transaction=transaction) as pipe:
+            for command in commands:
+                pipe.execute_command(*command)
+            return pipe.execute()[index]
+
+    def ids(
+        self, redis: Redis, offset: int = 0, limit: Optional[int] = None
+    ) -> List[Any]:
+        """Primary key values of the result, sorted when it is paged"""
+        return list(self.model.decode_key_values(
+            self._execute(redis, 'members', offset, limit)
+        ))
+
+    def count(self, redis: Redis) -> int:
+        return self._execute(redis, 'count')
+
+    def models(
+        self, redis: Redis, offset: int = 0, limit: Optional[int] = None,
+        chunk_size: int = CHUNK_SIZE, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> List[BaseModel]:
+        """Models of the result loaded by pipelined `get_many`"""
+        return [
+            model for model in self.model.get_many(
+                redis, self.ids(redis, offset, limit), chunk_size, mode,
+                only, defer
+            )
+            if model is not None
+        ]
+
+    def clear(self, redis: Redis) -> None:
+        """Drop the kept result"""
+        redis.delete(self.redis_key)
@@ -0,0 +1,259 @@
+"""Read/write routing of models over a primary and its replicas
+
+`ReplicaRouter` is used anywhere a redis-py client is taken, read only
+commands and pipelines go to replicas and the rest to the primary:
+
+>>> redis = ReplicaRouter(primary, [replica_1, replica_2], pin_seconds=1)
+>>> UserModel.search(redis, 1)
+
+Replicas are asynchronously replicated, `pin_seconds` keeps reads of the
+context (thread or asyncio task) writing to the primary on the primary
+for a while, so the context reads its own writes. `hedge` sends the read
+to a second replica when the first one has not replied within the
+percentile of recent read latencies, see `LatencyWindow`.
+"""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import ContextVar
+from itertools import count
+from time import monotonic, perf_counter
+from typing import Callable, Iterable, List, Optional
+
+from redis.client import Redis
+from redis.commands.core import CoreCommands
+
+from RSO.base import HASH_INDEX_SEARCH_SHA
+
+READ, WRITE, ALL, CURSOR = 'read', 'write', 'all', 'cursor'
+READ_COMMANDS = frozenset([
+    'DBSIZE', 'EVAL_RO', 'EVALSHA_RO', 'EXISTS', 'GET', 'HEXISTS', 'HGET',
+    'HGETALL', 'HKEYS', 'HLEN', 'HMGET', 'HVALS', 'KEYS', 'LINDEX', 'LLEN',
+    'LPOS', 'LRANGE', 'MGET', 'PTTL', 'SCARD', 'SDIFF', 'SINTER',
+    'SINTERCARD', 'SISMEMBER', 'SMEMBERS', 'SMISMEMBER', 'SRANDMEMBER',
+    'STRLEN', 'SUNION', 'TTL', 'TYPE', 'ZCARD', 'ZCOUNT', 'ZMSCORE',
+    'ZRANDMEMBER', 'ZRANGE', 'ZRANGEBYLEX', 'ZRANGEBYSCORE', 'ZRANK',
+    'ZREVRANGE', 'ZREVRANGEBYSCORE', 'ZREVRANK', 'ZSCORE',
+])
+# cursor of SCAN commands is valid on the node returning it only
+CURSOR_COMMANDS = frozenset(['HSCAN', 'SCAN', 'SSCAN', 'ZSCAN'])
+
+
+class LatencyWindow:
+    """Latencies of recent replica reads
+
+    `deadline` is `percentile` of the last `size` latencies, `initial`
+    until `min_samples` latencies are known. It is computed again after
+    every `min_samples` new latencies.
+    """
+
+    def __init__(
+        self, percentile: float = 95.0, size: int = 1000,
+        min_samples: int = 20, initial: float = 0.01
+    ):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+        self._deadline = initial
+        self._new = 0
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._new += 1
+
+    def deadline(self) -> float:
+        """Seconds to wait for a read before hedging it"""
+        if self._new >= self.min_samples \
+                and len(self._samples) >= self.min_samples:
+            self._new = 0
+            samples = sorted(self._samples)
+            index = round((len(samples) - 1) * self.percentile / 100)
+            self._deadline = samples[index]
+        return self._deadline
+
+
+class BaseReplicaRouter:
+    """Command routing shared by sync and asyncio replica routers
+
+    EVALSHA of `read_only_scripts` SHA1, by default `HashIndex` search
+    script, is a read. Commands with a cursor always go to the first
+    replica.
+    """
+
+    def __init__(
+        self, primary, replicas: Iterable, pin_seconds: float = 0.0,
+        hedge: Optional[LatencyWindow] = None,
+        read_only_scripts: Iterable[str] = (HASH_INDEX_SEARCH_SHA,)
+    ):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.pin_seconds = pin_seconds
+        self.hedge = hedge
+        self.read_only_scripts = frozenset(read_only_scripts)
+        self._pinned_until = ContextVar(
+            f'pinned_until_{id(self)}', default=0.0
+        )
+        self._counter = count()
+
+    def pin(self, seconds: Optional[float] = None) -> None:
+        """Send reads of current context to the primary for `seconds`,
+        `pin_seconds` by default
+        """
+        if seconds is None:
+            seconds = self.pin_seconds
+        if seconds > 0:
+            self._pinned_until.set(monotonic() + seconds)
+
+    def is_pinned(self) -> bool:
+        return monotonic() < self._pinned_until.get()
+
+    def _command_kind(self, args: tuple) -> str:
+        # redis-py sends some subcommands as one word, e.g. `SCRIPT LOAD`
+        name = str(args[0]).split(' ', 1)[0].upper()
+        if name in READ_COMMANDS:
+            return READ
+        if name in CURSOR_COMMANDS:
+            return CURSOR
+        if name == 'EVALSHA' and args[1] in self.read_only_scripts:
+            return READ
+        if name == 'SCRIPT':
+            return ALL
+        return WRITE
+
+    def _pipeline_kind(self, commands: list, transaction) -> str:
+        kinds = {self._command_kind(args) for args, _ in commands}
+        if transaction or not kinds or kinds - {READ}:
+            return WRITE
+        return READ
+
+    def _read_nodes(self) -> list:
+        """Replicas of the next read, rotated for every read"""
+        if not self.replicas or self.is_pinned():
+            return [self.primary]
+        start = next(self._counter) % len(self.replicas)
+        return self.replicas[start:] + self.replicas[:start]
+
+
+class ReplicaRouter(BaseReplicaRouter, CoreCommands):
+    """Sync router of redis-py `Redis` primary and replica clients
+
+    Hedged reads run in a thread pool of `max_workers` threads, the late
+    read is not cancelled.
+    """
+
+    def __init__(
+        self, primary: Redis, replicas: Iterable[Redis],
+        pin_seconds: float = 0.0, hedge: Optional[LatencyWindow] = None,
+        read_only_scripts: Iterable[str] = (HASH_INDEX_SEARCH_SHA,),
+        max_workers: Optional[int] = None
+    ):
+        super().__init__(
+            primary, replicas, pin_seconds, hedge, read_only_scripts
+        )
+        self._executor = ThreadPoolExecutor(max_workers)
+
+    def __enter__(self) -> 'ReplicaRouter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._executor.shutdown()
+        for redis in [self.primary, *self.replicas]:
+            redis.close()
+
+    def execute_command(self, *args, **options):
+        kind = self._command_kind(args)
+        if kind == WRITE:
+            self.pin()
+            return self.primary.execute_command(*args, **options)
+        if kind == ALL:
+            for redis in self.replicas:
+                redis.execute_command(*args, **options)
+            return self.primary.execute_command(*args, **options)
+        if kind == CURSOR:
+            redis = self.replicas[0] if self.replicas else self.primary
+            return redis.execute_command(*args, **options)
+        return self._read(
+            lambda redis: redis.execute_command(*args, **options)
+        )
+
+    def pipeline(
+        self, transaction=True, shard_hint=None
+    ) -> 'ReplicaPipeline':
+        return ReplicaPipeline(self, transaction)
+
+    def _timed(self, call: Callable, redis: Redis):
+        start = perf_counter()
+        result = call(redis)
+        self.hedge.add(perf_counter() - start)
+        return result
+
+    def _read(self, call: Callable):
+        """Reply of `call` of a replica, hedged by a second replica"""
+        nodes = self._read_nodes()
+        if self.hedge is None or len(nodes) < 2:
+            return call(nodes[0])
+
+        pending = {self._executor.submit(self._timed, call, nodes[0])}
+        done, pending = wait(pending, timeout=self.hedge.deadline())
+        if not done:
+            # late first replica
+            pending.add(self._executor.submit(self._timed, call, nodes[1]))
+        error = None
+        while True:
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = error or future.exception()
+            if not pending:
+                raise error
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+
+class ReplicaPipeline(CoreCommands):
+    """Pipeline of a primary or replica pipeline, see `ReplicaRouter`
+
+    Pipeline of read only commands out of transaction is a read.
+    """
+
+    def __init__(self, router: ReplicaRouter, transaction=True):
+        self.router = router
+        self.transaction = transaction
+        self.command_stack: List[tuple] = []
+
+    def __enter__(self) -> 'ReplicaPipeline':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.reset()
+
+    def __len__(self) -> int:
+        return len(self.command_stack)
+
+    def __bool__(self) -> bool:
+        return True
+
+    def reset(self) -> None:
+        self.command_stack = []
+
+    def execute_command(self, *args, **options) -> 'ReplicaPipeline':
+        self.command_stack.append((args, options))
+        return self
+
+    def execute(self, raise_on_error: bool = True) -> list:
+        commands, self.command_stack = self.command_stack, []
+        router = self.router
+        if not commands:
+            return []
+
+        def execute(redis: Redis) -> list:
+            with redis.pipeline(transaction=self.transaction) as pipe:
+                for args, options in commands:
+                    pipe.execute_command(*args, **options)
+                return pipe.execute(raise_on_error=raise_on_error)
+
+        if router._pipeline_kind(commands, self.transaction) == WRITE:
+            router.pin()
+            return execute(router.primary)
+        return router._read(execute)
@@ -0,0 +1,166 @@
+from typing import Any, Iterable, List, NamedTuple, Optional
+from uuid import UUID
+
+# `ParsedKey.kind` values
+MODEL_KEY = 'model'
+INDEX_KEY = 'index'
+REGISTRY_KEY = 'registry'
+BUCKET_KEY = 'bucket'
+QUERY_KEY = 'query'
+
+
+class ParsedKey(NamedTuple):
+    """Redis key parsed by `ModelKeySchema.parse`
+
+    `index` is the index class of index key, `value` is primary key value
+    of model key, index value of list and set index key, bucket number of
+    bucket key and digest of query key, otherwise `None`.
+    """
+    kind: str
+    model: Any
+    index: Any = None
+    value: Any = None
+
+
+def model_tag(model_class) -> str:
+    """Model name in redis keys, in braces of `__hash_tag__` model"""
+    tag = model_class.__tag__ or model_class.__model_name__
+    if model_class.__hash_tag__:
+        return f'{{{tag}}}'
+    return tag
+
+
+class ModelKeySchema:
+    """Redis keys of a model class, built once
+
+    Use `key_schema` to get the schema of a model class. Key related model
+    attributes (`__prefix__`, `__model_name__`, `__tag__`, `__key_codec__`,
+    `__hash_tag__`) are not to be changed after the schema is built.
+
+    Model key is `prefix` followed by stored primary key value. Registry,
+    index and bucket keys follow `prefix` with `:`, which stored primary
+    key value does not start with, so keys are parsed without ambiguity.
+    """
+
+    def __init__(self, model_class):
+        self.owner = self.model_class = model_class
+        tag = model_tag(model_class)
+        if model_class.__prefix__ is None:
+            self.prefix = f'{tag}:'
+        else:
+            self.prefix = f'{model_class.__prefix__}::{tag}:'
+        self.pattern = f'{self.prefix}[^:]*'
+        self.registry_key = f'{self.prefix}:registry'
+        self.bucket_prefix = f'{self.prefix}:bucket:'
+        # kept `RSO.query.Query` results
+        self.query_prefix = f'{self.prefix}:query:'
+        self.codec = model_class.__key_codec__
+
+    def encode(self, value: Any) -> Any:
+        """Stored primary key value"""
+        if self.codec is not None:
+            return self.codec.encode(value)
+        if isinstance(value, UUID):
+            return str(value)
+        return value
+
+    def key(self, value: Any) -> str:
+        """Model key of primary key value"""
+        if self.codec is not None:
+            return self.prefix + self.codec.encode(value)
+        return f'{self.prefix}{value}'
+
+    def keys(self, values: Iterable) -> List[str]:
+        """Model keys of primary key values"""
+        if self.codec is not None:
+            encode = self.codec.encode
+            return [self.prefix + encode(value) for value in values]
+        prefix = self.prefix
+        return [f'{prefix}{value}' for value in values]
+
+    def value(self, redis_key: str) -> Any:
+        """Primary key value of model key"""
+        value = redis_key[len(self.prefix):]
+        if self.codec is None:
+            return value
+        return self.codec.decode(value)
+
+    def parse(self, redis_key: str) -> Optional[ParsedKey]:
+        """Parse key of the model or its `__indexes__`, `None` for other
+        keys
+        """
+        if redis_key.startswith(self.prefix):
+            if redis_key[len(self.prefix):len(self.prefix) + 1] != ':':
+                return ParsedKey(
+                    MODEL_KEY, self.model_class, None, self.value(redis_key)
+                )
+            if redis_key == self.registry_key:
+                return ParsedKey(REGISTRY_KEY, self.model_class)
+            if redis_key.startswith(self.query_prefix):
+                return ParsedKey(
+                    QUERY_KEY, self.model_class, None,
+                    redis_key[len(self.query_prefix):]
+                )
+            bucket = redis_key[len(self.bucket_prefix):]
+            if redis_key.startswith(self.bucket_prefix) \
+                    and bucket.lstrip('-').isdigit():
+                return ParsedKey(
+                    BUCKET_KEY, self.model_class, None, int(bucket)
+                )
+        # index prefix may differ from model prefix
+        for index_class in self.model_class.__indexes__ or []:
+            schema = key_schema(index_class)
+            if redis_key == schema.base:
+                # hash or sorted set index key
+                return ParsedKey(INDEX_KEY, self.model_class, index_class)
+            if redis_key.startswith(schema.value_prefix):
+                return ParsedKey(
+                    INDEX_KEY, self.model_class, index_class,
+                    redis_key[len(schema.value_prefix):]
+                )
+        return None
+
+
+class IndexKeySchema:
+    """Redis keys of an index class, built once, see `ModelKeySchema`
+
+    Hash and sorted set index are the single `base` key, list and set
+    index keys are `base` followed by `:` and index value.
+    """
+
+    def __init__(self, index_class):
+        self.owner = self.index_class = index_class
+        tag = model_tag(index_class.__model__)
+        # fields of compound index are joined by `+`
+        name = index_class.__tag__ or '+'.join(index_class.key_fields())
+        self.base = f'{tag}::{index_class.__index_name__}::{name}'
+        if index_class.__prefix__ is not None:
+            self.base = f'{index_class.__prefix__}::{self.base}'
+        self.value_prefix = f'{self.base}:'
+
+    def key(self, value: Any) -> str:
+        """Index key of index value"""
+        return f'{self.value_prefix}{value}'
+
+
+def key_schema(cls):
+    """Key schema of model or index class, built on first use"""
+    # attribute lookup is faster than `cls.__dict__`, schema of the base
+    # class is inherited by subclass
+    schema = getattr(cls, '__key_schema__', None)
+    if schema is None or schema.owner is not cls:
+        if hasattr(cls, '__model__'):
+            schema = IndexKeySchema(cls)
+        else:
+            schema = ModelKeySchema(cls)
+        cls.__key_schema__ = schema
+    return schema
+
+
+def parse_key(redis_key: str, model_classes: Iterable) -> Optional[ParsedKey]:
+    """Parse key of any of `model_classes`, `None` for other keys"""
+    for model_class in model_classes:
+        parsed = key_schema(model_class).parse(redis_key)
+        if parsed is not None:
+            return parsed
+    return None
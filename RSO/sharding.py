@@ -0,0 +1,422 @@
+"""Client side sharding of models over standalone redis nodes
+
+`ShardedRedis` routes every command by its key on a consistent hash ring
+and is used anywhere a redis-py client is taken:
+
+>>> redis = ShardedRedis({'a': Redis(port=6379), 'b': Redis(port=6380)})
+>>> UserModel.save_many(redis, users)
+
+Hash tag of key (see `RSO.cluster`) is hashed instead of the whole key,
+so keys of `__hash_tag__` model are on a single node. Models are handled
+as in Redis Cluster: keys of a model without hash tag are on different
+nodes, multi key commands are split per node and pipelines run one
+pipeline per node in parallel.
+"""
+from bisect import bisect
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import md5
+from itertools import chain
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from redis.client import Redis
+from redis.commands.core import CoreCommands
+
+from RSO.base import SCAN_COUNT
+from RSO.cluster import MULTI_KEY_COMMANDS, ClusterClient
+
+# virtual nodes of a node on the hash ring
+REPLICAS = 160
+
+
+def first(replies: list) -> Any:
+    return replies[0]
+
+
+def concat(replies: list) -> list:
+    return list(chain.from_iterable(replies))
+
+
+# keyless commands run on every node, function combining node replies
+BROADCAST_COMMANDS = {
+    'DBSIZE': sum,
+    'FLUSHALL': first,
+    'FLUSHDB': first,
+    'KEYS': concat,
+    'PING': first,
+    'SCRIPT': first,
+}
+# keyless commands run on the first node
+KEYLESS_COMMANDS = {
+    'ACL', 'CLIENT', 'COMMAND', 'CONFIG', 'DISCARD', 'ECHO', 'EXEC',
+    'INFO', 'LASTSAVE', 'MEMORY', 'MULTI', 'RANDOMKEY', 'ROLE', 'SLOWLOG',
+    'TIME', 'UNWATCH', 'WAIT',
+}
+# commands of several keys which are to be on a single node, key arguments
+SINGLE_NODE_COMMANDS = {
+    'MGET': slice(1, None),
+    'RENAME': slice(1, 3),
+    'RPOPLPUSH': slice(1, 3),
+    'SDIFF': slice(1, None),
+    'SDIFFSTORE': slice(1, None),
+    'SINTER': slice(1, None),
+    'SINTERSTORE': slice(1, None),
+    'SMOVE': slice(1, 3),
+    'SUNION': slice(1, None),
+    'SUNIONSTORE': slice(1, None),
+}
+
+
+def hash_key(key: Any) -> bytes:
+    """Hashed part of key, hash tag of the key if any"""
+    if isinstance(key, str):
+        key = key.encode()
+    elif not isinstance(key, bytes):
+        key = str(key).encode()
+    start = key.find(b'{')
+    if start != -1:
+        end = key.find(b'}', start + 1)
+        if end > start + 1:
+            return key[start + 1:end]
+    return key
+
+
+def _point(data: bytes) -> int:
+    return int.from_bytes(md5(data).digest()[:8], 'big')
+
+
+class HashRing:
+    """Consistent hash ring of node names
+
+    Every node has `replicas` points on the ring, key belongs to the node
+    of the first point following the key hash. Adding a node moves only
+    the keys the new node takes over.
+    """
+
+    def __init__(self, replicas: int = REPLICAS):
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._names: List[str] = []
+
+    def add(self, name: str) -> None:
+        for replica in range(self.replicas):
+            point = _point(f'{name}-{replica}'.encode())
+            index = bisect(self._points, point)
+            self._points.insert(index, point)
+            self._names.insert(index, name)
+
+    def remove(self, name: str) -> None:
+        kept = [
+            (point, node) for point, node in zip(self._points, self._names)
+            if node != name
+        ]
+        self._points = [point for point, _ in kept]
+        self._names = [node for _, node in kept]
+
+    def get(self, key: Any) -> str:
+        """Node name of `key`"""
+        if not self._points:
+            raise RuntimeError('Hash ring has no node')
+        index = bisect(self._points, _point(hash_key(key)))
+        return self._names[index % len(self._names)]
+
+
+class Shard(NamedTuple):
+    """Node of sharded client, `redis` is the client of the node"""
+    name: str
+    redis: Any
+
+
+class BaseShardedRedis(ClusterClient):
+    """Node routing shared by sync and asyncio sharded clients"""
+
+    def __init__(self, nodes: Dict[str, Any], replicas: int = REPLICAS):
+        self.ring = HashRing(replicas)
+        self.nodes: Dict[str, Shard] = {}
+        for name, redis in nodes.items():
+            self.add_node(name, redis)
+
+    def add_node(self, name: str, redis) -> Shard:
+        """Add node to the ring, see `rebalance` to move its keys to it"""
+        if name in self.nodes:
+            raise ValueError(f'Node {name!r} exists')
+        self.nodes[name] = Shard(name, redis)
+        self.ring.add(name)
+        return self.nodes[name]
+
+    def remove_node(self, name: str) -> Shard:
+        """Remove node from the ring, keys of the node are left on it"""
+        self.ring.remove(name)
+        return self.nodes.pop(name)
+
+    def get_node(self, node_name: str) -> Shard:
+        return self.nodes[node_name]
+
+    def get_primaries(self) -> List[Shard]:
+        return list(self.nodes.values())
+
+    def get_node_from_key(self, key: Any, replica: bool = False) -> Shard:
+        return self.nodes[self.ring.get(key)]
+
+    def _target_nodes(self, target_nodes=None) -> List[Shard]:
+        if target_nodes is None:
+            return self.get_primaries()
+        if isinstance(target_nodes, Shard):
+            return [target_nodes]
+        return list(target_nodes)
+
+    def _route(self, args: tuple) -> Tuple[List[tuple], Callable]:
+        """Node commands of command `args` and function combining replies
+
+        Node commands are `(node, args)` pairs.
+        """
+        # redis-py sends some subcommands as one word, e.g. `SCRIPT LOAD`
+        name = str(args[0]).split(' ', 1)[0].upper()
+        if name in BROADCAST_COMMANDS:
+            return [
+                (node, args) for node in self.get_primaries()
+            ], BROADCAST_COMMANDS[name]
+        if name in MULTI_KEY_COMMANDS and len(args) > 2:
+            node_keys = defaultdict(list)
+            for key in args[1:]:
+                node_keys[self.ring.get(key)].append(key)
+            return [
+                (self.nodes[node_name], (args[0], *keys))
+                for node_name, keys in node_keys.items()
+            ], sum
+        if name in ('EVAL', 'EVALSHA'):
+            # script keys follow the script and the number of keys
+            if not int(args[2]):
+                return [(self.get_primaries()[0], args)], first
+            return [(self.get_node_from_key(args[3]), args)], first
+        if name in KEYLESS_COMMANDS:
+            return [(self.get_primaries()[0], args)], first
+        if name in SINGLE_NODE_COMMANDS:
+            keys = args[SINGLE_NODE_COMMANDS[name]]
+            if len({self.ring.get(key) for key in keys}) > 1:
+                raise RuntimeError(
+                    f'{name} keys are on different nodes, use hash tags'
+                )
+        if len(args) < 2:
+            raise RuntimeError(f'{name} has no key to route by')
+        return [(self.get_node_from_key(args[1]), args)], first
+
+
+class BaseShardedPipeline(ClusterClient):
+    """Command queue of sharded pipelines, see `BaseShardedRedis`"""
+
+    def __init__(self, client: BaseShardedRedis, transaction=None):
+        self.client = client
+        self.transaction = transaction
+        self.command_stack: List[tuple] = []
+
+    def __len__(self) -> int:
+        return len(self.command_stack)
+
+    def __bool__(self) -> bool:
+        return True
+
+    def reset(self) -> None:
+        self.command_stack = []
+
+    def _queue(self, args: tuple, options: dict) -> None:
+        calls, combine = self.client._route(args)
+        self.command_stack.append((calls, combine, options))
+
+    def _node_commands(self) -> Tuple[Dict[str, list], list]:
+        """Queued commands of every node name and reply positions
+
+        Reply position of queued command are the node replies used and
+        the function combining them.
+        """
+        node_commands = defaultdict(list)
+        positions = []
+        for calls, combine, options in self.command_stack:
+            refs = []
+            for node, args in calls:
+                commands = node_commands[node.name]
+                refs.append((node.name, len(commands)))
+                commands.append((args, options))
+            positions.append((refs, combine))
+        if self.transaction and len(node_commands) > 1:
+            raise RuntimeError(
+                'Transaction keys are on different nodes, use hash tags'
+            )
+        return node_commands, positions
+
+    @staticmethod
+    def _result(
+        positions: list, node_replies: Dict[str, list], raise_on_error: bool
+    ) -> list:
+        result = []
+        for refs, combine in positions:
+            replies = [node_replies[name][index] for name, index in refs]
+            errors = [reply for reply in replies if isinstance(
+                reply, Exception
+            )]
+            result.append(errors[0] if errors else combine(replies))
+        if raise_on_error:
+            for item in result:
+                if isinstance(item, Exception):
+                    raise item
+        return result
+
+
+class ShardedRedis(BaseShardedRedis, CoreCommands):
+    """Sync sharded client of `nodes` name -> redis-py `Redis` client
+
+    Commands of several nodes run in parallel in a thread pool of
+    `max_workers` threads.
+    """
+
+    def __init__(
+        self, nodes: Dict[str, Redis], replicas: int = REPLICAS,
+        max_workers: Optional[int] = None
+    ):
+        super().__init__(nodes, replicas)
+        self._executor = ThreadPoolExecutor(max_workers)
+
+    def __enter__(self) -> 'ShardedRedis':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._executor.shutdown()
+        for node in self.get_primaries():
+            node.redis.close()
+
+    def _map(self, func: Callable, items: list) -> list:
+        if len(items) <= 1:
+            return [func(*item) for item in items]
+        return list(self._executor.map(lambda item: func(*item), items))
+
+    def execute_command(self, *args, **options):
+        calls, combine = self._route(args)
+        return combine(self._map(
+            lambda node, node_args: node.redis.execute_command(
+                *node_args, **options
+            ),
+            calls
+        ))
+
+    def scan(
+        self, cursor: int = 0, match=None, count=None, _type=None,
+        target_nodes=None, **kwargs
+    ) -> Tuple[Dict[str, int], list]:
+        """SCAN of every node or `target_nodes`, as cluster client does
+
+        Return cursor of every node name and keys found.
+        """
+        cursors, keys = {}, []
+        for node in self._target_nodes(target_nodes):
+            cursors[node.name], node_keys = node.redis.scan(
+                cursor, match, count, _type, **kwargs
+            )
+            keys.extend(node_keys)
+        return cursors, keys
+
+    def scan_iter(self, match=None, count=None, _type=None, **kwargs):
+        for node in self.get_primaries():
+            yield from node.redis.scan_iter(match, count, _type, **kwargs)
+
+    def pipeline(
+        self, transaction=None, shard_hint=None
+    ) -> 'ShardedPipeline':
+        """Pipeline of a pipeline per node, `transaction` is allowed for
+        keys of a single node
+        """
+        return ShardedPipeline(self, transaction)
+
+
+class ShardedPipeline(BaseShardedPipeline, CoreCommands):
+    def __enter__(self) -> 'ShardedPipeline':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.reset()
+
+    def execute_command(self, *args, **options) -> 'ShardedPipeline':
+        self._queue(args, options)
+        return self
+
+    def execute(self, raise_on_error: bool = True) -> list:
+        try:
+            node_commands, positions = self._node_commands()
+        finally:
+            self.reset()
+        transaction = bool(self.transaction)
+
+        def execute_node(name: str, commands: list) -> list:
+            redis = self.client.get_node(name).redis
+            with redis.pipeline(transaction=transaction) as pipe:
+                for args, options in commands:
+                    pipe.execute_command(*args, **options)
+                return pipe.execute(raise_on_error=False)
+
+        replies = self.client._map(execute_node, list(node_commands.items()))
+        return self._result(
+            positions, dict(zip(node_commands, replies)), raise_on_error
+        )
+
+
+def key_moves(client: BaseShardedRedis, node: Shard, keys: list):
+    """Keys of `node` owned by other nodes, by owner node name"""
+    moves = defaultdict(list)
+    for key in keys:
+        owner = client.ring.get(key)
+        if owner != node.name:
+            moves[owner].append(key)
+    return moves
+
+
+def restore_commands(keys: list, replies: list) -> List[tuple]:
+    """RESTORE commands of DUMP and PTTL `replies` of `keys`"""
+    commands = []
+    for key, dumped, ttl in zip(keys, replies[::2], replies[1::2]):
+        if dumped is None:
+            # deleted after SCAN
+            continue
+        commands.append(('RESTORE', key, max(ttl, 0), dumped, 'REPLACE'))
+    return commands
+
+
+def rebalance(
+    redis: ShardedRedis, match: Optional[str] = None,
+    count: int = SCAN_COUNT
+) -> int:
+    """Move keys to their node on the hash ring, e.g. after `add_node`
+
+    Every node is walked by SCAN, keys (matching `match`) owned by another
+    node are copied by DUMP and RESTORE keeping their TTL, then deleted
+    from the node. Interrupted rebalance is resumed by calling it again.
+    Keys written while rebalancing are not to be moved, so writes are to
+    be paused. Return the number of moved keys.
+    """
+    moved = 0
+    for node in redis.get_primaries():
+        cursor = 0
+        while True:
+            cursor, keys = node.redis.scan(cursor, match=match, count=count)
+            for owner, owner_keys in key_moves(redis, node, keys).items():
+                moved += _move_keys(node, redis.get_node(owner), owner_keys)
+            if not cursor:
+                break
+    return moved
+
+
+def _move_keys(source: Shard, target: Shard, keys: list) -> int:
+    with source.redis.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.dump(key)
+            pipe.pttl(key)
+        commands = restore_commands(keys, pipe.execute())
+    if not commands:
+        return 0
+    with target.redis.pipeline(transaction=False) as pipe:
+        for command in commands:
+            pipe.execute_command(*command)
+        pipe.execute()
+    source.redis.delete(*[command[1] for command in commands])
+    return len(commands)
@@ -0,0 +1,115 @@
+from threading import Event, Thread
+from typing import Optional, Type
+
+from redis.client import Redis
+from redis.connection import Connection
+from redis.exceptions import ConnectionError, TimeoutError
+
+from RSO.base import BaseModel
+from RSO.cache import (
+    MISSING,
+    ModelCache,
+    invalidated_keys,
+    is_resp3,
+    tracking_commands,
+    tracking_connection_kwargs,
+)
+
+
+def _push_message(message: list) -> list:
+    return message
+
+
+class TrackingCache(ModelCache):
+    """`ModelCache` invalidated by redis server-assisted client side caching
+
+    `start` opens a dedicated connection with `CLIENT TRACKING on BCAST`
+    over the model key prefix, so entries are dropped as soon as any client
+    writes the model or its hash index keys. RESP3 connection receives
+    `invalidate` push messages, RESP2 connection redirects them to itself
+    and subscribes to `__redis__:invalidate`. Messages are read by a daemon
+    thread. The cache is cleared whenever the connection is established,
+    entries are not served while the connection is lost.
+    Requires redis server 6.0+.
+
+    >>> UserModel.__cache__ = TrackingCache(ttl=None)
+    >>> UserModel.__cache__.start(redis, UserModel)
+    """
+
+    def __init__(self, *args, retry_interval: float = 1.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.retry_interval = retry_interval
+        self._model_classes = []
+        self._connection: Optional[Connection] = None
+        self._connected = Event()
+        self._stopped = Event()
+        self._thread: Optional[Thread] = None
+
+    def start(self, redis: Redis, *model_classes: Type[BaseModel]) -> None:
+        """Track keys of `model_classes` on `redis` server"""
+        pool = redis.connection_pool
+        self._connection = pool.connection_class(
+            **tracking_connection_kwargs(pool.connection_kwargs)
+        )
+        self._model_classes = model_classes
+        self._stopped.clear()
+        self._subscribe()
+        self._thread = Thread(target=self._listen, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._connection is not None:
+            self._connection.disconnect()
+            self._connection = None
+        self.clear()
+
+    def get(self, key):
+        if not self._connected.is_set():
+            return MISSING
+        return super().get(key)
+
+    def _read(self):
+        """Read reply or message, including RESP3 push messages"""
+        if is_resp3(self._connection):
+            return self._connection.read_response(push_request=True)
+        return self._connection.read_response()
+
+    def _subscribe(self) -> None:
+        connection = self._connection
+        connection.disconnect()
+        connection.connect()
+        connection.send_command('CLIENT', 'ID')
+        client_id = connection.read_response()
+        resp3 = is_resp3(connection)
+        if resp3:
+            # redis-py drops `invalidate` push messages without handler
+            parser = getattr(connection, '_parser', None)
+            if hasattr(parser, 'set_invalidation_push_handler'):
+                parser.set_invalidation_push_handler(_push_message)
+        for command in tracking_commands(
+            client_id, self._model_classes, resp3
+        ):
+            connection.send_command(*command)
+            self._read()
+        self.clear()
+        self._connected.set()
+
+    def _listen(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                if not self._connected.is_set():
+                    self._subscribe()
+                if not self._connection.can_read(timeout=self.retry_interval):
+                    continue
+                keys = invalidated_keys(self._read())
+            except (ConnectionError, TimeoutError, OSError):
+                self._connected.clear()
+                self.clear()
+                self._stopped.wait(self.retry_interval)
+                continue
+            if keys is not MISSING:
+                self.invalidate(keys)
@@ -1,13 +1,44 @@
-from typing import Any, List, Optional, Union, TypeVar
+from typing import Any, Iterable, List, Optional, Tuple, Union, TypeVar
 
-from txredisapi import BaseRedisProtocol, ConnectionHandler
+from txredisapi import (
+    BaseRedisProtocol,
+    ConnectionHandler,
+    ScriptDoesNotExist,
+)
 from twisted.internet.defer import inlineCallbacks
 
-from RSO.base import BaseModel, BaseHashIndex, BaseListIndex, BaseSetIndex
+from RSO.base import (
+    CHUNK_SIZE,
+    HASH_INDEX_SEARCH_SCRIPT,
+    HASH_INDEX_SEARCH_SHA,
+    SCAN_COUNT,
+    BaseModel,
+    BaseHashIndex,
+    BaseListIndex,
+    BaseSetIndex,
+    BaseSortedSetIndex,
+    decode_cursor,
+    encode_cursor,
+)
+from RSO.cache import MISSING
+from RSO.codec import MODEL
 
 T = TypeVar('T')
 
 
+@inlineCallbacks
+def evalsha(
+    redis: ConnectionHandler, script: str, sha: str, keys: list, args: list
+):
+    """EVALSHA cached `script`, load the script when redis lost it"""
+    try:
+        result = yield redis.evalsha(sha, keys, args)
+    except ScriptDoesNotExist:
+        yield redis.script_load(script)
+        result = yield redis.evalsha(sha, keys, args)
+    return result
+
+
 class HashIndex(BaseHashIndex):
     @classmethod
     @inlineCallbacks
@@ -31,23 +62,45 @@ class HashIndex(BaseHashIndex):
     def remove(
         cls, redis: Union[BaseRedisProtocol, ConnectionHandler], model_obj: T
     ):
-        yield redis.hdel(
-            cls.redis_key(),
-            cls.index_key_value(model_obj)
+        yield cls.remove_value(
+            redis,
+            cls.index_key_value(model_obj),
+            cls.model_key_value(model_obj)
         )
 
     @classmethod
     @inlineCallbacks
-    def search_model(cls, redis: ConnectionHandler, index_value):
-        redis_key = cls.redis_key()
-        is_exist = yield redis.exists(redis_key)
-        if not is_exist:
-            return
-        model_primary_value = yield redis.hget(redis_key, index_value)
-        if model_primary_value is None:
-            return
-        result = yield cls.__model__.search(redis, model_primary_value)
-        return result
+    def remove_value(
+        cls, redis: Union[BaseRedisProtocol, ConnectionHandler],
+        index_value: Any, model_value: Any
+    ):
+        index_value = cls.encode_index_value(index_value)
+        if isinstance(redis, BaseRedisProtocol):
+            redis.hdel(cls.redis_key(), index_value)
+        else:
+            yield redis.hdel(cls.redis_key(), index_value)
+
+    @classmethod
+    @inlineCallbacks
+    def search_model(
+        cls, redis: ConnectionHandler, index_value, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ):
+        index_value = cls.encode_index_value(index_value)
+        fields = cls.__model__._projection(only, defer)
+        instance = cls._cached_search_model(index_value, mode, fields)
+        if instance is not MISSING:
+            return instance
+        generation = cls.__model__._cache_generation()
+
+        keys, args = cls._search_script_params(index_value, fields)
+        result = yield evalsha(
+            redis, HASH_INDEX_SEARCH_SCRIPT, HASH_INDEX_SEARCH_SHA, keys, args
+        )
+        return cls._parse_search_script(
+            index_value, result, generation, mode, fields
+        )
 
 
 class ListIndex(BaseListIndex):
@@ -76,28 +129,41 @@ class ListIndex(BaseListIndex):
         """
         count = 0 to remove all
         """
-        yield redis.lrem(
-            cls.redis_key(model_obj),
-            count,
-            cls.model_key_value(model_obj)
+        yield cls.remove_value(
+            redis,
+            cls.index_key_value(model_obj),
+            cls.model_key_value(model_obj),
+            count
         )
 
     @classmethod
     @inlineCallbacks
-    def search_models(
-        cls, redis: ConnectionHandler, index_value: Any
-    ) -> List[BaseModel]:
+    def remove_value(
+        cls, redis: Union[BaseRedisProtocol, ConnectionHandler],
+        index_value: Any, model_value: Any, count: int = 0
+    ):
+        """
+        count = 0 to remove all
+        """
         redis_key = cls.redis_key_from_value(index_value)
-        result = yield redis.exists(redis_key)
-        if not result:
-            return []
+        if isinstance(redis, BaseRedisProtocol):
+            redis.lrem(redis_key, count, model_value)
+        else:
+            yield redis.lrem(redis_key, count, model_value)
 
-        model_instances = []
-        result = yield cls.get_members(redis, index_value)
-        for value in result:
-            model_instance = yield cls.__model__.search(redis, value)
-            model_instances.append(model_instance)
-        return model_instances
+    @classmethod
+    @inlineCallbacks
+    def search_models(
+        cls, redis: ConnectionHandler, index_value: Any,
+        chunk_size: int = CHUNK_SIZE, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> List[BaseModel]:
+        members = yield cls.get_members(redis, index_value)
+        result = yield cls.__model__.get_many(
+            redis, members, chunk_size, mode, only, defer
+        )
+        return result
 
     @classmethod
     @inlineCallbacks
@@ -106,14 +172,63 @@ class ListIndex(BaseListIndex):
     ) -> List[Any]:
         redis_key = cls.redis_key_from_value(index_value)
         result = yield redis.lrange(redis_key, 0, -1)
-        return result
+        return cls.__model__.decode_key_values(result)
+
+    @classmethod
+    @inlineCallbacks
+    def page_members(
+        cls, redis: ConnectionHandler, index_value: Any,
+        cursor: Optional[str] = None, count: int = SCAN_COUNT
+    ) -> Tuple[List[Any], Optional[str]]:
+        """LRANGE window of `count` members from `cursor` token, `None` for
+        the first page, and the next page token, `None` after the last page
+        """
+        redis_key = cls.redis_key_from_value(index_value)
+        start = decode_cursor(cursor, redis_key)
+        values = yield redis.lrange(redis_key, start, start + count - 1)
+        if len(values) < count:
+            cursor = None
+        else:
+            cursor = encode_cursor(redis_key, start + count)
+        return cls.__model__.decode_key_values(values), cursor
+
+    @classmethod
+    @inlineCallbacks
+    def page_models(
+        cls, redis: ConnectionHandler, index_value: Any,
+        cursor: Optional[str] = None, count: int = SCAN_COUNT,
+        mode: str = MODEL, only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> Tuple[List[BaseModel], Optional[str]]:
+        """Models of `page_members` page and the next page token"""
+        members, cursor = yield cls.page_members(
+            redis, index_value, cursor, count
+        )
+        models = yield cls.__model__.get_many(
+            redis, members, count, mode, only, defer
+        )
+        return [model for model in models if model is not None], cursor
+
+    @classmethod
+    @inlineCallbacks
+    def delete_members(
+        cls, redis: ConnectionHandler, index_value: Any,
+        chunk_size: int = CHUNK_SIZE
+    ) -> int:
+        """Delete member models, their index entries and this index key"""
+        members = yield cls.get_members(redis, index_value)
+        deleted = yield cls.__model__.delete_many(
+            redis, dict.fromkeys(members), chunk_size
+        )
+        yield redis.delete(cls.redis_key_from_value(index_value))
+        return deleted
 
     @classmethod
     @inlineCallbacks
     def has_member(cls, redis: ConnectionHandler, model_obj: T) -> bool:
         result = yield cls.has_member_value(
             redis,
-            getattr(model_obj, cls.__key__),
+            cls.index_key_value(model_obj),
             getattr(model_obj, model_obj.__key__)
         )
         return result
@@ -126,7 +241,7 @@ class ListIndex(BaseListIndex):
         result = yield redis.execute_command(
             'LPOS',
             cls.redis_key_from_value(index_value),
-            model_value
+            cls.__model__.encode_key_value(model_value)
         )
         return result is not None
 
@@ -139,7 +254,9 @@ class ListIndex(BaseListIndex):
             return None
         else:
             value = yield redis.rpoplpush(redis_key, redis_key)
-            result = yield cls.__model__.search(redis, value)
+            result = yield cls.__model__.search(
+                redis, cls.__model__.decode_key_value(value)
+            )
             return result
 
 
@@ -165,11 +282,24 @@ class SetIndex(BaseSetIndex):
     def remove(
         cls, redis: Union[BaseRedisProtocol, ConnectionHandler], model_obj: T
     ):
-        yield redis.srem(
-            key=cls.redis_key(model_obj),
-            members=cls.model_key_value(model_obj)
+        yield cls.remove_value(
+            redis,
+            cls.index_key_value(model_obj),
+            cls.model_key_value(model_obj)
         )
 
+    @classmethod
+    @inlineCallbacks
+    def remove_value(
+        cls, redis: Union[BaseRedisProtocol, ConnectionHandler],
+        index_value: Any, model_value: Any
+    ):
+        redis_key = cls.redis_key_from_value(index_value)
+        if isinstance(redis, BaseRedisProtocol):
+            redis.srem(key=redis_key, members=model_value)
+        else:
+            yield redis.srem(key=redis_key, members=model_value)
+
     @classmethod
     @inlineCallbacks
     def get_members(
@@ -177,21 +307,177 @@ class SetIndex(BaseSetIndex):
     ) -> List[Any]:
         redis_key = cls.redis_key_from_value(index_value)
         result = yield redis.smembers(redis_key)
-        return result
+        return cls.__model__.decode_key_values(result)
+
+    @classmethod
+    @inlineCallbacks
+    def page_members(
+        cls, redis: ConnectionHandler, index_value: Any,
+        cursor: Optional[str] = None, count: int = SCAN_COUNT
+    ) -> Tuple[List[Any], Optional[str]]:
+        """SSCAN page of `count` hint from `cursor` token, `None` for the
+        first page, and the next page token, `None` after the last page
+
+        Page may be empty before the last page.
+        """
+        redis_key = cls.redis_key_from_value(index_value)
+        position, values = yield redis.sscan(
+            redis_key, decode_cursor(cursor, redis_key), count=count
+        )
+        position = int(position)
+        cursor = encode_cursor(redis_key, position) if position else None
+        return cls.__model__.decode_key_values(values), cursor
+
+    @classmethod
+    @inlineCallbacks
+    def page_models(
+        cls, redis: ConnectionHandler, index_value: Any,
+        cursor: Optional[str] = None, count: int = SCAN_COUNT,
+        mode: str = MODEL, only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> Tuple[List[BaseModel], Optional[str]]:
+        """Models of `page_members` page and the next page token"""
+        members, cursor = yield cls.page_members(
+            redis, index_value, cursor, count
+        )
+        models = yield cls.__model__.get_many(
+            redis, members, count, mode, only, defer
+        )
+        return [model for model in models if model is not None], cursor
 
     @classmethod
     @inlineCallbacks
     def search_models(
-        cls, redis: ConnectionHandler, index_value: Any
+        cls, redis: ConnectionHandler, index_value: Any,
+        chunk_size: int = CHUNK_SIZE, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
     ) -> List[BaseModel]:
-        redis_key = cls.redis_key_from_value(index_value)
-        result = yield redis.exists(redis_key)
-        if not result:
-            return []
+        """Load members using SSCAN pages of `chunk_size`
 
+        The next SSCAN page is requested on the same pipeline as
+        the current page models, so each page costs a single round trip.
+        """
+        redis_key = cls.redis_key_from_value(index_value)
+        model_class = cls.__model__
+        fields = model_class._projection(only, defer)
         model_instances = []
-        result = yield redis.smembers(redis_key)
-        for value in result:
-            model_instance = yield cls.__model__.search(redis, value)
-            model_instances.append(model_instance)
+        seen = set()
+        cursor, values = yield redis.sscan(redis_key, 0, count=chunk_size)
+        cursor = int(cursor)
+        while values or cursor:
+            # SSCAN may return a member more than once
+            values = [
+                value for value in model_class.decode_key_values(values)
+                if value not in seen
+            ]
+            seen.update(values)
+            pipe = yield redis.pipeline()
+            for value in values:
+                model_class._queue_search(pipe, value, fields)
+            if cursor:
+                pipe.sscan(redis_key, cursor, count=chunk_size)
+            result_data = yield pipe.execute_pipeline()
+            if cursor:
+                cursor, values = result_data.pop()
+                cursor = int(cursor)
+            else:
+                values = []
+            model_instances.extend(
+                model_class._parse_search(data, mode, fields)
+                for data in result_data
+            )
         return model_instances
+
+    @classmethod
+    @inlineCallbacks
+    def delete_members(
+        cls, redis: ConnectionHandler, index_value: Any,
+        chunk_size: int = CHUNK_SIZE
+    ) -> int:
+        """Delete member models, their index entries and this index key"""
+        members = yield cls.get_members(redis, index_value)
+        deleted = yield cls.__model__.delete_many(
+            redis, members, chunk_size
+        )
+        yield redis.delete(cls.redis_key_from_value(index_value))
+        return deleted
+
+
+class SortedSetIndex(BaseSortedSetIndex):
+    @classmethod
+    @inlineCallbacks
+    def save(
+        cls, redis: Union[BaseRedisProtocol, ConnectionHandler], model_obj: T
+    ):
+        score = cls.score(getattr(model_obj, cls.__key__))
+        if isinstance(redis, BaseRedisProtocol):
+            redis.zadd(
+                cls.redis_key(), score, cls.model_key_value(model_obj)
+            )
+        else:
+            yield redis.zadd(
+                cls.redis_key(), score, cls.model_key_value(model_obj)
+            )
+
+    @classmethod
+    @inlineCallbacks
+    def remove(
+        cls, redis: Union[BaseRedisProtocol, ConnectionHandler], model_obj: T
+    ):
+        yield cls.remove_value(
+            redis,
+            cls.index_key_value(model_obj),
+            cls.model_key_value(model_obj)
+        )
+
+    @classmethod
+    @inlineCallbacks
+    def remove_value(
+        cls, redis: Union[BaseRedisProtocol, ConnectionHandler],
+        index_value: Any, model_value: Any
+    ):
+        if isinstance(redis, BaseRedisProtocol):
+            redis.zrem(cls.redis_key(), model_value)
+        else:
+            yield redis.zrem(cls.redis_key(), model_value)
+
+    @classmethod
+    @inlineCallbacks
+    def range_members(
+        cls, redis: ConnectionHandler, min: Any = None, max: Any = None,
+        offset: int = 0, limit: Optional[int] = None, reverse: bool = False
+    ) -> List[Any]:
+        """Primary key values of index values from `min` to `max`"""
+        result = yield redis.execute_command(
+            *cls._range_command(min, max, offset, limit, reverse)
+        )
+        return cls.__model__.decode_key_values(result)
+
+    @classmethod
+    @inlineCallbacks
+    def range_models(
+        cls, redis: ConnectionHandler, min: Any = None, max: Any = None,
+        offset: int = 0, limit: Optional[int] = None, reverse: bool = False,
+        chunk_size: int = CHUNK_SIZE, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> List[BaseModel]:
+        """Models of index values from `min` to `max` ordered by index
+        value, loaded by pipelined `get_many`
+        """
+        members = yield cls.range_members(
+            redis, min, max, offset, limit, reverse
+        )
+        result = yield cls.__model__.get_many(
+            redis, members, chunk_size, mode, only, defer
+        )
+        return [model for model in result if model is not None]
+
+    @classmethod
+    @inlineCallbacks
+    def count_range(
+        cls, redis: ConnectionHandler, min: Any = None, max: Any = None
+    ) -> int:
+        result = yield redis.execute_command(*cls._count_command(min, max))
+        return result
@@ -1,19 +1,46 @@
-from typing import List, Optional, Union
+from itertools import chain
+from typing import Iterable, List, Optional, Tuple, Union
 
-from txredisapi import BaseRedisProtocol, ConnectionHandler
-from twisted.internet.defer import inlineCallbacks
+from txredisapi import BaseRedisProtocol, ConnectionHandler, RedisError
+from twisted.internet.defer import FirstError, inlineCallbacks
 
-from RSO.base import BaseModel
+from RSO.base import (
+    CHUNK_SIZE,
+    SCAN_COUNT,
+    BaseIndex,
+    BaseListIndex,
+    BaseModel,
+    chunked,
+)
+from RSO.cache import MISSING
+from RSO.codec import MODEL
 
 
 class Model(BaseModel):
+    __slots__ = ()
+
     @inlineCallbacks
     def is_exist(self, redis: ConnectionHandler):
-        result = yield redis.exists(self.redis_key)
+        result = yield redis.execute_command(*self._exists_command())
         return bool(result)
 
+    @inlineCallbacks
+    def load_deferred(self, redis: ConnectionHandler):
+        """Load fields deferred by `only` / `defer` using a single HMGET"""
+        fields = self._deferred_fields()
+        if fields:
+            redis_data = yield redis.hmget(
+                self.redis_key, self._stored_fields(fields)
+            )
+            self._set_deferred(fields, redis_data)
+
     @inlineCallbacks
     def save(self, redis: Union[BaseRedisProtocol, ConnectionHandler]):
+        """Write the model, only its changes when it is loaded or saved
+
+        Saving on a pipeline or transaction fires the pending snapshot,
+        taken by `_take_snapshot` once it is executed.
+        """
         if isinstance(redis, ConnectionHandler):
             pipe = yield redis.multi()
             do_commit = True
@@ -21,53 +48,357 @@ class Model(BaseModel):
             pipe = redis
             do_commit = False
 
-        pipe.hmset(self.redis_key, self.to_redis())
-        for index_class in self.__indexes__ or []:
-            if getattr(self, index_class.__key__, None) is None:
+        changes = self._diff_snapshot()
+        if changes is None:
+            for command in self._write_commands():
+                pipe.execute_command(*command)
+            if self.__registry__:
+                key_value = getattr(self, self.__key__)
+                pipe.zadd(
+                    self.registry_key(),
+                    self.registry_score(key_value),
+                    self.registry_member(key_value)
+                )
+            for index_class in self.__indexes__ or []:
+                if index_class.index_key_value(self) is None:
+                    continue
+                yield index_class.save(pipe, self)
+        else:
+            # loaded model, only write the changes
+            for command in self._write_commands(changes):
+                pipe.execute_command(*command)
+            _, _, indexes = changes
+            for index_class, old_value, new_value in indexes:
+                if old_value is not None:
+                    yield index_class.remove_value(
+                        pipe, old_value, BaseIndex.model_key_value(self)
+                    )
+                if new_value is not None:
+                    yield index_class.save(pipe, self)
+            changed = {index_class for index_class, _, _ in indexes}
+            for index_class in self.__indexes__ or []:
+                # every save pushes list index member, e.g. to queue again
+                if issubclass(index_class, BaseListIndex) \
+                        and index_class not in changed \
+                        and index_class.index_key_value(self) is not None:
+                    yield index_class.save(pipe, self)
+        snapshot = self._snapshot()
+        if not do_commit:
+            # dropped again once the pipeline is executed, see `save_many`
+            self._cache_discard_model()
+            return snapshot
+        yield pipe.commit()
+        self._cache_discard_model()
+        self._take_snapshot(snapshot)
+        return None
+
+    @classmethod
+    @inlineCallbacks
+    def save_many(
+        cls, redis: ConnectionHandler, models: Iterable['Model'],
+        chunk_size: int = CHUNK_SIZE, transactional: bool = False
+    ) -> List[Tuple[List['Model'], Exception]]:
+        """Save models and their indexes using one pipeline per chunk
+
+        Failed chunk does not stop the next chunks, the failed chunks are
+        returned with their first error. Empty list means all is saved.
+        """
+        failures = []
+        for chunk in chunked(models, chunk_size):
+            if transactional:
+                pipe = yield redis.multi()
+            else:
+                pipe = yield redis.pipeline()
+            snapshots = []
+            for model in chunk:
+                snapshot = yield model.save(pipe)
+                snapshots.append(snapshot)
+            try:
+                if transactional:
+                    result = yield pipe.commit()
+                else:
+                    result = yield pipe.execute_pipeline()
+            except FirstError as error:
+                # pipeline reply errors are wrapped by DeferredList
+                failures.append((chunk, error.subFailure.value))
                 continue
-            yield index_class.save(pipe, self)
-        if do_commit:
-            yield pipe.commit()
+            except RedisError as error:
+                failures.append((chunk, error))
+                continue
+            finally:
+                # search during execute may have cached the old model
+                for model in chunk:
+                    model._cache_discard_model()
+            error = next(
+                (item for item in result if isinstance(item, Exception)), None
+            )
+            if error is not None:
+                # replies are not told apart by model, none is taken
+                failures.append((chunk, error))
+                continue
+            for model, snapshot in zip(chunk, snapshots):
+                model._take_snapshot(snapshot)
+        return failures
 
     @classmethod
     @inlineCallbacks
-    def search(cls, redis: ConnectionHandler, value) -> Optional['Model']:
-        redis_key = cls.redis_key_from_value(value)
-        result = yield redis.exists(redis_key)
-        if bool(result):
-            fields = cls.get_fields()
-            redis_data = yield redis.hmget(redis_key, fields)
-            dict_data = cls.from_redis(dict(zip(fields, redis_data)))
-            return cls(**dict_data)
-        return
+    def search(
+        cls, redis: ConnectionHandler, value, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> Optional['Model']:
+        fields = cls._projection(only, defer)
+        instance = cls._cached_search(value, mode, fields)
+        if instance is not MISSING:
+            return instance
+        generation = cls._cache_generation()
+
+        result = yield cls._queue_search(redis, value, fields)
+        redis_data = cls._search_reply(result)
+        if fields is None or redis_data is None:
+            cls._cache_search(value, redis_data, generation)
+        if redis_data is None:
+            return None
+        return cls._parse_search(redis_data, mode, fields)
 
     @classmethod
     @inlineCallbacks
-    def all(cls, redis: ConnectionHandler) -> List['Model']:
-        redis_key = cls.redis_key_from_value('*')
-        members = yield redis.keys(redis_key)
-        indexes = []
-        for index_class in cls.__indexes__:
-            indexes.append(
-                f'::{index_class.__index_name__}::{index_class.__key__}'
+    def get_many(
+        cls, redis: ConnectionHandler, values: Iterable,
+        chunk_size: int = CHUNK_SIZE, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> List[Optional['Model']]:
+        """Search models by primary key values using pipelined HMGET
+
+        Result follows `values` order, `None` for not found model.
+        """
+        fields = cls._projection(only, defer)
+        result = []
+        for chunk in chunked(values, chunk_size):
+            pipe = yield redis.pipeline()
+            for value in chunk:
+                cls._queue_search(pipe, value, fields)
+            result_data = yield pipe.execute_pipeline()
+            result.extend(
+                cls._parse_search(data, mode, fields)
+                for data in result_data
             )
+        return result
 
-        pipe = yield redis.multi()
-        for member in members:
-            is_index = False
-            for index in indexes:
-                if index in member:
-                    is_index = True
-                    break
-            if not is_index:
-                yield pipe.hgetall(member)
-        result_data = yield pipe.commit()
+    @classmethod
+    @inlineCallbacks
+    def all(
+        cls, redis: ConnectionHandler, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> List['Model']:
+        if cls.__registry__:
+            members = yield redis.zrange(cls.registry_key(), 0, -1)
+            result = yield cls.get_many(
+                redis, cls.decode_key_values(members), mode=mode, only=only,
+                defer=defer
+            )
+            return [instance for instance in result if instance is not None]
 
-        result = []
-        for data in result_data:
-            result.append(cls(**data))
+        cursor, result = yield cls.scan_page(
+            redis, mode=mode, only=only, defer=defer
+        )
+        while cursor:
+            cursor, page = yield cls.scan_page(
+                redis, cursor, mode=mode, only=only, defer=defer
+            )
+            result.extend(page)
         return result
 
+    @classmethod
+    @inlineCallbacks
+    def _scan_key_values(
+        cls, redis: ConnectionHandler, cursor: int = 0,
+        count: int = SCAN_COUNT
+    ) -> Tuple[int, List[str]]:
+        """Page of primary key values found by keyspace SCAN
+
+        Primary key values of bucketed layout are its bucket hash fields.
+        """
+        layout = cls.__layout__
+        cursor, keys = yield redis.scan(
+            cursor, pattern=layout.scan_pattern(cls), count=count
+        )
+        if keys and layout.bucketed:
+            pipe = yield redis.pipeline()
+            for key in keys:
+                pipe.hkeys(key)
+            result = yield pipe.execute_pipeline()
+            return int(cursor), list(chain.from_iterable(result))
+        return int(cursor), [cls.key_value_from_redis_key(key) for key in keys]
+
+    @classmethod
+    @inlineCallbacks
+    def _key_values_page(
+        cls, redis: ConnectionHandler, cursor: int = 0,
+        count: int = SCAN_COUNT
+    ) -> Tuple[int, List[str]]:
+        """Page of primary key values, from registry if enabled"""
+        if not cls.__registry__:
+            result = yield cls._scan_key_values(redis, cursor, count)
+            return result
+
+        cursor, members = yield redis.zscan(
+            cls.registry_key(), cursor, count=count
+        )
+        # ZSCAN reply is a flat list of member and score
+        return int(cursor), cls.decode_key_values(members[::2])
+
+    @classmethod
+    @inlineCallbacks
+    def scan_page(
+        cls, redis: ConnectionHandler, cursor: int = 0,
+        count: int = SCAN_COUNT, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> Tuple[int, List['Model']]:
+        """Load a page of models using SCAN `cursor` with `count` hint
+
+        Return next cursor and the page models, iteration is complete when
+        the returned cursor is `0`. Model keys (or registry members) of
+        the page are loaded in a single non-transactional pipeline.
+        """
+        fields = cls._projection(only, defer)
+        cursor, values = yield cls._key_values_page(redis, cursor, count)
+        result = []
+        if values:
+            pipe = yield redis.pipeline()
+            for value in values:
+                cls._queue_search(pipe, value, fields)
+            result_data = yield pipe.execute_pipeline()
+            for data in result_data:
+                instance = cls._parse_search(data, mode, fields)
+                if instance is not None:
+                    result.append(instance)
+        return cursor, result
+
+    @classmethod
+    @inlineCallbacks
+    def count(cls, redis: ConnectionHandler) -> int:
+        if cls.__registry__:
+            result = yield redis.zcard(cls.registry_key())
+            return result
+
+        cursor, values = yield cls._key_values_page(redis)
+        total = len(values)
+        while cursor:
+            cursor, values = yield cls._key_values_page(redis, cursor)
+            total += len(values)
+        return total
+
+    @classmethod
+    @inlineCallbacks
+    def page(
+        cls, redis: ConnectionHandler, offset: int = 0,
+        limit: int = CHUNK_SIZE, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> List['Model']:
+        """Models ordered by primary key, registry is required"""
+        cls._check_registry()
+        members = cls.decode_key_values((yield redis.zrange(
+            cls.registry_key(), offset, offset + limit - 1
+        )))
+        result = yield cls.get_many(
+            redis, members, mode=mode, only=only, defer=defer
+        )
+        return [instance for instance in result if instance is not None]
+
+    @classmethod
+    @inlineCallbacks
+    def random(
+        cls, redis: ConnectionHandler, count: int = 1, mode: str = MODEL,
+        only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> List['Model']:
+        """Sample distinct random models, registry is required"""
+        cls._check_registry()
+        members = yield redis.execute_command(
+            'ZRANDMEMBER', cls.registry_key(), count
+        )
+        result = yield cls.get_many(
+            redis, cls.decode_key_values(members or []), mode=mode,
+            only=only, defer=defer
+        )
+        return [instance for instance in result if instance is not None]
+
+    @classmethod
+    @inlineCallbacks
+    def build_registry(
+        cls, redis: ConnectionHandler, count: int = SCAN_COUNT
+    ) -> int:
+        """Register existing models found by SCAN, return registered count"""
+        cls._check_registry()
+        total = 0
+        cursor = 0
+        while True:
+            cursor, values = yield cls._scan_key_values(redis, cursor, count)
+            if values:
+                args = []
+                for value in values:
+                    args.extend((
+                        cls.registry_score(value), cls.registry_member(value)
+                    ))
+                yield redis.zadd(cls.registry_key(), *args)
+                total += len(values)
+            if not cursor:
+                break
+        return total
+
+    @classmethod
+    @inlineCallbacks
+    def delete_many(
+        cls, redis: ConnectionHandler, keys_or_models: Iterable,
+        chunk_size: int = CHUNK_SIZE
+    ) -> int:
+        """Delete models by primary key values or model instances
+
+        Only index fields of primary key values are loaded to clean up
+        the indexes. Return the number of deleted models.
+        """
+        index_fields = cls._index_fields()
+        deleted = 0
+        for chunk in chunked(keys_or_models, chunk_size):
+            values = [
+                item for item in chunk if not isinstance(item, BaseModel)
+            ]
+            result_data = []
+            if values and index_fields:
+                pipe = yield redis.pipeline()
+                for value in values:
+                    cls._queue_search(pipe, value, index_fields)
+                result_data = yield pipe.execute_pipeline()
+            rows = cls._delete_rows(chunk, iter(result_data))
+
+            pipe = yield redis.pipeline()
+            commands = cls._delete_commands([
+                key_value for key_value, _ in rows
+            ])
+            for command in commands:
+                pipe.execute_command(*command)
+            for key_value, index_data in rows:
+                for index_class in cls.__indexes__ or []:
+                    index_value = index_data.get(index_class)
+                    if index_value is not None:
+                        index_class.remove_value(
+                            pipe, index_value, cls.encode_key_value(key_value)
+                        )
+            if cls.__registry__:
+                pipe.zrem(cls.registry_key(), *[
+                    cls.registry_member(key_value) for key_value, _ in rows
+                ])
+            result = yield pipe.execute_pipeline()
+            deleted += sum(result[:len(commands)])
+            for key_value, _ in rows:
+                cls._cache_discard(key_value)
+        return deleted
+
     @inlineCallbacks
     def delete(self, redis: Union[BaseRedisProtocol, ConnectionHandler]):
         if isinstance(redis, ConnectionHandler):
@@ -77,10 +408,25 @@ class Model(BaseModel):
             pipe = redis
             do_commit = False
 
+        changed = self._changed_index_values()
         for index_class in self.__indexes__ or []:
-            if getattr(self, index_class.__key__) is None:
-                continue
-            index_class.remove(pipe, self)
-        yield pipe.delete(self.redis_key)
+            if index_class in changed:
+                # loaded model, remove the stored index value
+                if changed[index_class] is not None:
+                    index_class.remove_value(
+                        pipe, changed[index_class],
+                        BaseIndex.model_key_value(self)
+                    )
+            elif index_class.index_key_value(self) is not None:
+                index_class.remove(pipe, self)
+        for command in self._delete_commands([getattr(self, self.__key__)]):
+            yield pipe.execute_command(*command)
+        if self.__registry__:
+            yield pipe.zrem(
+                self.registry_key(),
+                self.registry_member(getattr(self, self.__key__))
+            )
         if do_commit:
             yield pipe.commit()
+        self._cache_discard_model()
+        self._forget_snapshot()
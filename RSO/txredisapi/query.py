@@ -0,0 +1,66 @@
+"""Set algebra queries of txredisapi models, see `RSO.query`"""
+from typing import Any, Iterable, List, Optional
+
+from twisted.internet.defer import inlineCallbacks
+from txredisapi import ConnectionHandler
+
+from RSO.base import CHUNK_SIZE, BaseModel
+from RSO.codec import MODEL
+from RSO.query import BaseQuery
+
+
+class Query(BaseQuery):
+    @inlineCallbacks
+    def _execute(
+        self, redis: ConnectionHandler, read: str, offset: int = 0,
+        limit: Optional[int] = None
+    ) -> Any:
+        if self.ttl is not None and self._operation[0] is not None:
+            pipe = yield redis.multi()
+            for command in self._cached_commands(read, offset, limit):
+                pipe.execute_command(*command)
+            exists, result = yield pipe.commit()
+            if exists:
+                return result
+        commands, index = self._commands(read, offset, limit)
+        if len(commands) == 1:
+            result = yield redis.execute_command(*commands[0])
+            return result
+        pipe = yield redis.multi()
+        for command in commands:
+            pipe.execute_command(*command)
+        result = yield pipe.commit()
+        return result[index]
+
+    @inlineCallbacks
+    def ids(
+        self, redis: ConnectionHandler, offset: int = 0,
+        limit: Optional[int] = None
+    ) -> List[Any]:
+        """Primary key values of the result, sorted when it is paged"""
+        result = yield self._execute(redis, 'members', offset, limit)
+        return list(self.model.decode_key_values(result))
+
+    @inlineCallbacks
+    def count(self, redis: ConnectionHandler) -> int:
+        result = yield self._execute(redis, 'count')
+        return result
+
+    @inlineCallbacks
+    def models(
+        self, redis: ConnectionHandler, offset: int = 0,
+        limit: Optional[int] = None, chunk_size: int = CHUNK_SIZE,
+        mode: str = MODEL, only: Optional[Iterable[str]] = None,
+        defer: Optional[Iterable[str]] = None
+    ) -> List[BaseModel]:
+        """Models of the result loaded by pipelined `get_many`"""
+        ids = yield self.ids(redis, offset, limit)
+        result = yield self.model.get_many(
+            redis, ids, chunk_size, mode, only, defer
+        )
+        return [model for model in result if model is not None]
+
+    @inlineCallbacks
+    def clear(self, redis: ConnectionHandler) -> None:
+        """Drop the kept result"""
+        yield redis.delete(self.redis_key)
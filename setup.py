@@ -54,7 +54,8 @@ setup(
         'aiocontextvars;python_version<"3.7"',
     ],
     extras_require={
-        "all": ["redis", "pyopenssl", "txredisapi"],
+        "all": ["redis", "pyopenssl", "txredisapi", "msgpack"],
+        "msgpack": ["msgpack"],
         "redis-py": ["redis"],
         "txredisapi": ["pyopenssl", "txredisapi"],
     },
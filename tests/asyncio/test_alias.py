@@ -0,0 +1,39 @@
+from uuid import uuid4
+
+import pytest
+
+from RSO.codec import Base62UUIDKey
+from tests.models.const import REDIS_MODEL_PREFIX
+from ..models.asyncio import DeviceModel, DeviceOwnerIndex, DeviceSerialIndex
+
+
+@pytest.mark.asyncio
+async def test_alias(async_redis):
+    devices = [
+        DeviceModel(device_id=uuid4(), serial_number=f'sn_{number}',
+                    owner_id=1)
+        for number in range(3)
+    ]
+    for device in devices:
+        await device.save(async_redis)
+
+    device = devices[0]
+    stored_key = Base62UUIDKey().encode(device.device_id)
+    assert device.redis_key == f'{REDIS_MODEL_PREFIX}::d:{stored_key}'
+    assert await async_redis.hgetall(device.redis_key) == {
+        'device_id': str(device.device_id), 's': 'sn_0', 'o': '1'
+    }
+    assert await DeviceModel.search(async_redis, device.device_id) == device
+    assert await DeviceSerialIndex.search_model(async_redis, 'sn_0') \
+           == device
+    assert await DeviceOwnerIndex.get_members(async_redis, 1) == {
+        device.device_id for device in devices
+    }
+    assert len(await DeviceOwnerIndex.search_models(async_redis, 1)) == 3
+    assert sorted(
+        device.serial_number for device in await DeviceModel.all(async_redis)
+    ) == ['sn_0', 'sn_1', 'sn_2']
+
+    assert await DeviceModel.delete_many(async_redis, [device.device_id]) == 1
+    assert await DeviceModel.count(async_redis) == 2
+    assert len(await DeviceOwnerIndex.get_members(async_redis, 1)) == 2
@@ -0,0 +1,42 @@
+import pytest
+
+from RSO.cache import ModelCache
+from ..models.asyncio import UserModel, SingleIndexEmail
+
+
+@pytest.fixture
+def cache(monkeypatch) -> ModelCache:
+    cache = ModelCache(max_entries=10, ttl=60, negative_ttl=60)
+    monkeypatch.setattr(UserModel, '__cache__', cache)
+    return cache
+
+
+@pytest.mark.asyncio
+class TestCachedModel:
+    async def test_search(self, async_redis, cache):
+        user = UserModel(user_id=1, username='username', email='old@email')
+        await user.save(async_redis)
+
+        assert (await UserModel.search(async_redis, 1)).email == 'old@email'
+        await async_redis.hset(user.redis_key, 'email', 'other@email')
+        assert (await UserModel.search(async_redis, 1)).email == 'old@email'
+        assert cache.hits == 1
+
+        user.email = 'new@email'
+        await user.save(async_redis)
+        assert (await UserModel.search(async_redis, 1)).email == 'new@email'
+
+        await user.delete(async_redis)
+        assert await UserModel.search(async_redis, 1) is None
+
+    async def test_search_model(self, async_redis, cache):
+        assert await SingleIndexEmail.search_model(async_redis, 'old@email') \
+               is None
+        user = UserModel(user_id=1, username='username', email='old@email')
+        await user.save(async_redis)
+
+        result = await SingleIndexEmail.search_model(async_redis, 'old@email')
+        assert result.username == 'username'
+        await async_redis.hset(user.redis_key, 'username', 'other')
+        result = await SingleIndexEmail.search_model(async_redis, 'old@email')
+        assert result.username == 'username'
@@ -0,0 +1,63 @@
+from dataclasses import dataclass
+
+import pytest
+
+from RSO.asyncio.index import HashIndex, SetIndex
+from RSO.asyncio.model import Model
+from tests.models.base import BaseIndexEmail, BaseIndexGroupID, BaseUserModel
+from tests.models.asyncio import SingleIndexEmail, UserModel
+from tests.data import USERS
+
+
+@dataclass
+class TaggedUserModel(Model, BaseUserModel):
+    __model_name__ = 'tagged'
+    __hash_tag__ = True
+
+
+class TaggedIndexEmail(BaseIndexEmail, HashIndex):
+    __model__ = TaggedUserModel
+
+
+class TaggedIndexGroupID(BaseIndexGroupID, SetIndex):
+    __model__ = TaggedUserModel
+
+
+TaggedUserModel.__indexes__ = [TaggedIndexEmail, TaggedIndexGroupID]
+
+
+@pytest.mark.asyncio
+async def test_untagged(async_cluster):
+    users = [UserModel(**data) for data in USERS]
+    assert await UserModel.save_many(async_cluster, users) == []
+
+    assert await UserModel.search(async_cluster, 1) == users[0]
+    assert sorted(
+        await UserModel.all(async_cluster), key=lambda user: user.user_id
+    ) == users
+    assert await UserModel.count(async_cluster) == len(users)
+    assert await SingleIndexEmail.search_model(
+        async_cluster, users[1].email
+    ) == users[1]
+
+    await users[0].delete(async_cluster)
+    assert await UserModel.delete_many(async_cluster, [2, 3, 4]) == 3
+    assert await UserModel.all(async_cluster) == [users[4]]
+    with pytest.raises(RuntimeError):
+        await UserModel.save_many(async_cluster, users, transactional=True)
+
+
+@pytest.mark.asyncio
+async def test_tagged(async_cluster):
+    users = [TaggedUserModel(**data) for data in USERS]
+    assert await TaggedUserModel.save_many(
+        async_cluster, users, transactional=True
+    ) == []
+    await users[0].save(async_cluster)
+
+    assert await TaggedUserModel.count(async_cluster) == len(users)
+    assert await TaggedIndexEmail.search_model(
+        async_cluster, users[1].email
+    ) == users[1]
+    assert await TaggedUserModel.delete_many(async_cluster, [1, 2]) == 2
+    assert await TaggedIndexGroupID.get_members(async_cluster, 1) == {'3'}
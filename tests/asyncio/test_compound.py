@@ -0,0 +1,72 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import pytest
+
+from RSO.asyncio.index import HashIndex, SetIndex
+from RSO.asyncio.model import Model
+from tests.models.const import REDIS_MODEL_PREFIX
+
+
+@dataclass
+class AccountModel(Model):
+    __prefix__ = REDIS_MODEL_PREFIX
+    __model_name__ = 'account'
+    __key__ = 'account_id'
+
+    account_id: int
+    tenant: str
+    email: Optional[str] = None
+    group_id: Optional[int] = None
+    active: bool = True
+
+
+class AccountTenantEmailIndex(HashIndex):
+    __prefix__ = REDIS_MODEL_PREFIX
+    __model__ = AccountModel
+    __key__ = ('tenant', 'email')
+
+
+class AccountGroupActiveIndex(SetIndex):
+    __prefix__ = REDIS_MODEL_PREFIX
+    __model__ = AccountModel
+    __key__ = ('group_id', 'active')
+
+
+AccountModel.__indexes__ = [AccountTenantEmailIndex, AccountGroupActiveIndex]
+
+
+@pytest.mark.asyncio
+async def test_compound_index(async_redis):
+    accounts = [
+        AccountModel(
+            account_id=account_id, tenant=f'tenant_{account_id % 2}',
+            email=f'{account_id}@email', group_id=1,
+            active=account_id < 4
+        )
+        for account_id in range(1, 6)
+    ]
+    await AccountModel.save_many(async_redis, accounts)
+
+    assert await AccountTenantEmailIndex.search_model(
+        async_redis, ('tenant_1', '3@email')
+    ) == accounts[2]
+    assert await AccountGroupActiveIndex.get_members(
+        async_redis, (1, True)
+    ) == {'1', '2', '3'}
+
+    account = await AccountModel.search(async_redis, 1)
+    account.active = False
+    await account.save(async_redis)
+    await accounts[1].delete(async_redis)
+    assert await AccountModel.delete_many(async_redis, [3, 4]) == 2
+    assert await AccountGroupActiveIndex.get_members(
+        async_redis, (1, True)
+    ) == set()
+    assert sorted(
+        account.account_id for account in
+        await AccountGroupActiveIndex.search_models(async_redis, (1, False))
+    ) == [1, 5]
+    assert await AccountTenantEmailIndex.search_model(
+        async_redis, ('tenant_1', '3@email')
+    ) is None
@@ -3,8 +3,11 @@ from datetime import date
 import pytest
 
 from ..models.asyncio import (
+    BirthDateUserModel,
     UserModel,
     ListIndexQueue,
+    SetIndexGroupID,
+    SortedSetIndexBirthDate,
 )
 
 
@@ -32,6 +35,16 @@ class TestHashIndex:
         result = await UserModel.search_by_email(async_redis, 'not_exist@x.com')
         assert result is None
 
+    async def test_search_model_script_flushed(self, async_redis):
+        user = UserModel(user_id=1, username='username', email='email@x.com')
+        await user.save(async_redis)
+        await async_redis.script_flush()
+
+        result = await UserModel.search_by_username(async_redis, 'username')
+        assert result.username == user.username
+        assert result.email == user.email
+
+
 @pytest.mark.asyncio
 class TestListIndex:
     async def test_has_list_index(self, async_redis):
@@ -142,6 +155,27 @@ class TestListIndex:
         users = await ListIndexQueue.search_models(async_redis, index_value=3)
         assert len(users) == 1
 
+    async def test_pagination(self, async_redis):
+        for user_id in range(1, 8):
+            user = UserModel(
+                user_id=user_id, username=f'username_{user_id}', queue_id=3
+            )
+            await user.save(async_redis)
+
+        assert [
+            member async for member in
+            ListIndexQueue.iter_members(async_redis, 3, count=3)
+        ] == [str(user_id) for user_id in range(7, 0, -1)]
+        members, cursor = await ListIndexQueue.page_members(
+            async_redis, 3, count=4
+        )
+        assert members == ['7', '6', '5', '4']
+        models, cursor = await ListIndexQueue.page_models(
+            async_redis, 3, cursor, count=4
+        )
+        assert [user.user_id for user in models] == [3, 2, 1]
+        assert cursor is None
+
 
 @pytest.mark.asyncio
 class TestSetIndex:
@@ -170,3 +204,89 @@ class TestSetIndex:
         result = await UserModel.search_by_group_id(async_redis, 3)
         assert isinstance(result, list)
         assert len(result) == 0
+
+    async def test_search_models_chunked(self, async_redis):
+        for user_id in range(1, 41):
+            user = UserModel(
+                user_id=user_id, username=f'username_{user_id}', group_id=3
+            )
+            await user.save(async_redis)
+
+        result = await SetIndexGroupID.search_models(
+            async_redis, 3, chunk_size=7
+        )
+        assert len(result) == 40
+        assert {user.username for user in result} == {
+            f'username_{user_id}' for user_id in range(1, 41)
+        }
+
+    async def test_pagination(self, async_redis):
+        for user_id in range(1, 101):
+            user = UserModel(
+                user_id=user_id, username=f'username_{user_id}', group_id=3
+            )
+            await user.save(async_redis)
+
+        members = [
+            member async for member in
+            SetIndexGroupID.iter_members(async_redis, 3, count=7)
+        ]
+        assert set(members) == {str(user_id) for user_id in range(1, 101)}
+        models, cursor = [], None
+        while True:
+            page, cursor = await SetIndexGroupID.page_models(
+                async_redis, 3, cursor, count=30
+            )
+            models.extend(page)
+            if cursor is None:
+                break
+        assert {user.user_id for user in models} == set(range(1, 101))
+
+    async def test_delete_members(self, async_redis):
+        for user_id in range(1, 4):
+            user = UserModel(
+                user_id=user_id, username=f'username_{user_id}',
+                group_id=3 if user_id < 3 else 4
+            )
+            await user.save(async_redis)
+
+        assert await SetIndexGroupID.delete_members(async_redis, 3) == 2
+        assert not await async_redis.exists(
+            SetIndexGroupID.redis_key_from_value(3)
+        )
+        assert await UserModel.search_by_username(async_redis, 'username_1') \
+               is None
+        assert len(await UserModel.search_by_group_id(async_redis, 4)) == 1
+
+
+@pytest.mark.asyncio
+class TestSortedSetIndex:
+    async def test_range_models(self, async_redis):
+        users = [
+            BirthDateUserModel(
+                user_id=user_id, username=f'username_{user_id}',
+                birth_date=date(1990 + user_id, 1, 1)
+            )
+            for user_id in range(1, 6)
+        ]
+        await BirthDateUserModel.save_many(async_redis, users)
+
+        assert await SortedSetIndexBirthDate.range_models(async_redis) \
+               == users
+        assert await SortedSetIndexBirthDate.range_models(
+            async_redis, date(1992, 1, 1), date(1994, 1, 1)
+        ) == users[1:4]
+        assert await SortedSetIndexBirthDate.range_models(
+            async_redis, offset=1, limit=2, reverse=True
+        ) == [users[3], users[2]]
+        assert await SortedSetIndexBirthDate.count_range(
+            async_redis, max=date(1992, 1, 1)
+        ) == 2
+
+        users[0].birth_date = date(2000, 1, 1)
+        await users[0].save(async_redis)
+        await users[1].delete(async_redis)
+        assert await SortedSetIndexBirthDate.range_members(
+            async_redis, date(1995, 1, 1)
+        ) == ['5', '1']
+        assert await SortedSetIndexBirthDate.count_range(async_redis) == 4
@@ -0,0 +1,53 @@
+import pytest
+
+from RSO.layout import HASH_LAYOUT, BucketLayout, MsgpackLayout, StructLayout
+from ..models.asyncio import UserModel, SetIndexGroupID, SingleIndexEmail
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    'layout_class', [MsgpackLayout, StructLayout, BucketLayout]
+)
+async def test_packed_layout(async_redis, monkeypatch, layout_class):
+    layout = layout_class()
+    monkeypatch.setattr(UserModel, '__layout__', layout)
+    for user_id in range(1, 3):
+        await UserModel(
+            user_id=user_id, username=f'username_{user_id}',
+            email=f'{user_id}@email', group_id=1
+        ).save(async_redis)
+
+    user = await UserModel.search(async_redis, 1)
+    assert user.username == 'username_1'
+    assert await async_redis.type(layout.storage_key(UserModel, 1)) \
+           == ('hash' if layout.bucketed else 'string')
+    assert (
+        await SingleIndexEmail.search_model(async_redis, '2@email')
+    ).user_id == 2
+    assert len(await SetIndexGroupID.search_models(async_redis, 1)) == 2
+
+    user.email = 'new@email'
+    await user.save(async_redis)
+    assert (await UserModel.search(async_redis, 1)).email == 'new@email'
+    await user.delete(async_redis)
+    assert [user.user_id for user in await UserModel.all(async_redis)] == [2]
+
+
+@pytest.mark.asyncio
+async def test_migrate_layout(async_redis, monkeypatch):
+    for user_id in range(1, 4):
+        await UserModel(
+            user_id=user_id, username=f'username_{user_id}',
+            email=f'{user_id}@email', group_id=1
+        ).save(async_redis)
+
+    layout = BucketLayout(bucket_size=2)
+    monkeypatch.setattr(UserModel, '__layout__', layout)
+    assert await UserModel.migrate_layout(async_redis, HASH_LAYOUT) == 3
+    assert await async_redis.hkeys(layout.storage_key(UserModel, 2)) \
+           == ['2', '3']
+    assert await UserModel.count(async_redis) == 3
+    assert (
+        await SingleIndexEmail.search_model(async_redis, '3@email')
+    ).user_id == 3
+    assert await UserModel.delete_many(async_redis, [1, 2, 3]) == 3
@@ -2,12 +2,15 @@ from datetime import date
 
 import pytest
 
+from RSO.codec import RAW, ROW
 from ..data import USERS
 from ..models.asyncio import (
     UserModel,
     SingleIndexUsername,
     SingleIndexEmail,
-    SetIndexGroupID
+    SetIndexGroupID,
+    ListIndexQueue,
+    RegistryUserModel,
 )
 
 
@@ -64,6 +67,183 @@ class TestModelGet:
         assert len(users) == len(USERS)
         assert isinstance(users[0], UserModel)
 
+    async def test_iter_all(self, async_redis):
+        for data in USERS:
+            user = UserModel(**data)
+            await user.save(async_redis)
+
+        users = [
+            user async for user in UserModel.iter_all(async_redis, count=2)
+        ]
+        assert all(isinstance(user, UserModel) for user in users)
+        assert {user.username for user in users} == {
+            data['username'] for data in USERS
+        }
+
+    async def test_get_many(self, async_redis):
+        for data in USERS:
+            user = UserModel(**data)
+            await user.save(async_redis)
+
+        users = await UserModel.get_many(
+            async_redis, [3, 100, 1, 2], chunk_size=2
+        )
+        assert len(users) == 4
+        assert users[0].username == 'third_user'
+        assert users[1] is None
+        assert users[2].username == 'first_user'
+        assert users[3].username == 'second_user'
+
+    async def test_read_modes(self, async_redis):
+        for data in USERS:
+            await UserModel(**data).save(async_redis)
+
+        row = await UserModel.search(async_redis, 1, mode=ROW)
+        assert (row.user_id, row.username) == (1, 'first_user')
+        raw = await UserModel.search(async_redis, 1, mode=RAW)
+        assert raw['user_id'] == '1'
+        assert len(await UserModel.all(async_redis, mode=ROW)) == len(USERS)
+        rows = await SetIndexGroupID.search_models(async_redis, 1, mode=ROW)
+        assert {row.group_id for row in rows} == {1}
+        row = await SingleIndexUsername.search_model(
+            async_redis, 'first_user', mode=ROW
+        )
+        assert row.user_id == 1
+
+
+@pytest.mark.asyncio
+class TestModelSaveMany:
+    async def test_success(self, async_redis):
+        users = [UserModel(**data) for data in USERS]
+        result = await UserModel.save_many(async_redis, users, chunk_size=2)
+        assert result == []
+
+        assert await UserModel.count(async_redis) == len(USERS)
+        assert await UserModel.search_by_username(async_redis, 'fifth_user') \
+               is not None
+
+    async def test_transactional_chunk_failure(self, async_redis):
+        users = [UserModel(**data) for data in USERS]
+        await async_redis.set(users[2].redis_key, 'not a hash')
+
+        failures = await UserModel.save_many(
+            async_redis, users, chunk_size=2, transactional=True
+        )
+        assert len(failures) == 1
+        assert failures[0][0] == users[2:4]
+        assert await UserModel.search(async_redis, 5) is not None
+
+    async def test_retry_failed_chunk(self, async_redis):
+        await UserModel.save_many(
+            async_redis, [UserModel(**data) for data in USERS]
+        )
+        users = await UserModel.get_many(async_redis, [1, 2, 3, 4])
+        for user in users:
+            user.email = f'{user.username}@new'
+            user.group_id = 3 if user.user_id < 3 else 4
+            user.queue_id = 5
+        group_key = SetIndexGroupID.redis_key_from_value(4)
+        await async_redis.set(group_key, 'not a set')
+
+        failures = await UserModel.save_many(
+            async_redis, users, chunk_size=2, transactional=True
+        )
+        assert [chunk for chunk, _ in failures] == [users[2:]]
+
+        await async_redis.delete(group_key)
+        assert await UserModel.save_many(
+            async_redis, users, chunk_size=2, transactional=True
+        ) == []
+        assert await UserModel.get_many(async_redis, [1, 2, 3, 4]) == users
+        assert set(await async_redis.hkeys(SingleIndexEmail.redis_key())) \
+               == {f'{user.username}@new' for user in users}
+        assert await SetIndexGroupID.get_members(async_redis, 4) \
+               == {'3', '4'}
+        # every save pushes list index member, the retry pushes it again
+        assert await ListIndexQueue.get_members(async_redis, 5) \
+               == ['4', '3', '2', '1'] * 2
+
+
+@pytest.mark.asyncio
+class TestModelUpdate:
+    async def test_changed_fields_only(self, async_redis):
+        await UserModel(
+            user_id=1, username='username', email='old@email', group_id=1
+        ).save(async_redis)
+
+        user = await UserModel.search(async_redis, 1)
+        user.email = 'new@email'
+        user.group_id = 2
+        await user.save(async_redis)
+
+        assert await SingleIndexEmail.search_model(async_redis, 'old@email') \
+               is None
+        assert await SingleIndexEmail.search_model(async_redis, 'new@email') \
+               is not None
+        assert await SetIndexGroupID.get_members(async_redis, 1) == set()
+        assert await SetIndexGroupID.get_members(async_redis, 2) == {'1'}
+
+    async def test_removed_field(self, async_redis):
+        await UserModel(
+            user_id=1, username='username', group_id=1
+        ).save(async_redis)
+
+        user = await UserModel.search(async_redis, 1)
+        user.group_id = None
+        await user.save(async_redis)
+
+        assert not await async_redis.hexists(user.redis_key, 'group_id')
+        assert await SetIndexGroupID.get_members(async_redis, 1) == set()
+
+    async def test_save_new_then_change(self, async_redis):
+        user = UserModel(
+            user_id=1, username='username', email='old@email', group_id=1
+        )
+        await user.save(async_redis)
+        user.email = None
+        user.group_id = 2
+        await user.save(async_redis)
+
+        assert not await async_redis.hexists(user.redis_key, 'email')
+        assert await async_redis.hkeys(SingleIndexEmail.redis_key()) == []
+        assert await SetIndexGroupID.get_members(async_redis, 1) == set()
+        assert await SetIndexGroupID.get_members(async_redis, 2) == {'1'}
+
+
+@pytest.mark.asyncio
+class TestModelRegistry:
+    async def test_all_and_count(self, async_redis):
+        assert await RegistryUserModel.count(async_redis) == 0
+
+        for data in USERS:
+            await RegistryUserModel(**data).save(async_redis)
+        await UserModel(**USERS[0]).save(async_redis)
+
+        assert await RegistryUserModel.count(async_redis) == len(USERS)
+        users = await RegistryUserModel.all(async_redis)
+        assert [user.username for user in users] == [
+            data['username'] for data in USERS
+        ]
+
+        users = await RegistryUserModel.page(async_redis, offset=1, limit=2)
+        assert [user.username for user in users] == [
+            'second_user', 'third_user'
+        ]
+        users = await RegistryUserModel.random(async_redis, 2)
+        assert len(users) == 2
+
+        await users[0].delete(async_redis)
+        assert await RegistryUserModel.count(async_redis) == len(USERS) - 1
+
+    async def test_build_registry(self, async_redis):
+        for data in USERS:
+            await RegistryUserModel(**data).save(async_redis)
+        await async_redis.delete(RegistryUserModel.registry_key())
+
+        result = await RegistryUserModel.build_registry(async_redis)
+        assert result == len(USERS)
+        assert await RegistryUserModel.count(async_redis) == len(USERS)
+
 
 @pytest.mark.asyncio
 class TestModelDelete:
@@ -83,3 +263,18 @@ class TestModelDelete:
         assert await user.delete(async_redis) is None
         assert bool(await async_redis.exists(redis_key)) is False
         assert await async_redis.keys('*') == []
+
+    async def test_delete_many(self, async_redis):
+        for data in USERS:
+            await UserModel(**data).save(async_redis)
+
+        deleted = await UserModel.delete_many(
+            async_redis, [1, UserModel(**USERS[1]), 100]
+        )
+        assert deleted == 2
+        assert await UserModel.search_by_username(async_redis, 'first_user') \
+               is None
+        assert await SetIndexGroupID.get_members(async_redis, 1) == {'3'}
+
+        assert await UserModel.delete_many(async_redis, [3, 4, 5]) == 3
+        assert await async_redis.keys('*') == []
@@ -0,0 +1,28 @@
+import pytest
+
+from RSO.codec import DEFERRED
+from ..models.asyncio import ProfileModel, ProfileEmailIndex
+
+
+@pytest.mark.asyncio
+class TestProjection:
+    async def test_search(self, async_redis):
+        profile = ProfileModel(
+            profile_id=1, name='name', email='test@email', bio='bio'
+        )
+        await profile.save(async_redis)
+
+        result = await ProfileModel.search(async_redis, 1, only=['name'])
+        assert result.email == 'test@email'
+        assert result.bio is DEFERRED
+        result = await ProfileEmailIndex.search_model(
+            async_redis, 'test@email', defer=['bio']
+        )
+        assert result.name == 'name'
+        assert result.bio is DEFERRED
+
+        await result.load_deferred(async_redis)
+        assert result == profile
+        result.name = 'new_name'
+        await result.save(async_redis)
+        assert (await ProfileModel.search(async_redis, 1)).bio == 'bio'
@@ -0,0 +1,28 @@
+import pytest
+
+from RSO.asyncio.query import Query
+from RSO.query import Match
+from tests.models.asyncio import SetIndexGroupID, UserModel
+from tests.data import USERS
+
+
+@pytest.mark.asyncio
+async def test_query(async_redis):
+    users = [UserModel(**data) for data in USERS]
+    await UserModel.save_many(async_redis, users)
+    group_1, group_2 = Match(SetIndexGroupID, 1), Match(SetIndexGroupID, 2)
+
+    assert sorted(await Query(group_1 | group_2).ids(async_redis)) \
+           == ['1', '2', '3', '4', '5']
+    assert await Query(group_1 & group_2).count(async_redis) == 0
+    assert await Query(group_1 | group_2).models(
+        async_redis, offset=1, limit=3
+    ) == users[1:4]
+
+    query = Query(group_1 - group_2, ttl=60)
+    assert await query.count(async_redis) == 3
+    await users[0].delete(async_redis)
+    assert len(await query.models(async_redis)) == 2
+    assert sorted(await query.ids(async_redis)) == ['1', '2', '3']
+    await query.clear(async_redis)
+    assert sorted(await query.ids(async_redis)) == ['2', '3']
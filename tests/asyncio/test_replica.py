@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+import pytest
+from redis.asyncio import Redis
+
+from RSO.asyncio.replica import ReplicaRouter
+from RSO.replica import LatencyWindow
+from tests.conftest import REDIS_DB, REDIS_PASS
+from tests.models.asyncio import SingleIndexEmail, UserModel
+from tests.data import USERS
+
+
+class RecordingRedis(Redis):
+    """Client of the test server recording its commands"""
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__(
+            db=REDIS_DB, password=REDIS_PASS, decode_responses=True
+        )
+        self.delay = delay
+        self.commands = []
+
+    async def execute_command(self, *args, **options):
+        await asyncio.sleep(self.delay)
+        self.commands.append(args[0])
+        return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        self.commands.append('PIPELINE')
+        return super().pipeline(transaction, shard_hint)
+
+
+@pytest.mark.asyncio
+async def test_routing(async_redis):
+    router = ReplicaRouter(
+        RecordingRedis(), [RecordingRedis(), RecordingRedis()],
+        pin_seconds=60
+    )
+    primary, replica_1, replica_2 = router.primary, *router.replicas
+    users = [UserModel(**data) for data in USERS]
+    await UserModel.save_many(router, users)
+    assert primary.commands == ['PIPELINE']
+
+    # read your writes
+    assert await UserModel.search(router, 1) == users[0]
+    assert primary.commands == ['PIPELINE', 'HMGET']
+
+    router._pinned_until.set(0.0)
+    assert await UserModel.get_many(router, [2, 3]) == users[1:3]
+    assert await SingleIndexEmail.search_model(router, users[1].email) \
+           == users[1]
+    assert replica_1.commands == ['PIPELINE']
+    assert 'EVALSHA' in replica_2.commands
+
+
+@pytest.mark.asyncio
+async def test_hedge(async_redis):
+    slow = RecordingRedis(delay=0.5)
+    router = ReplicaRouter(
+        RecordingRedis(), [slow, RecordingRedis()],
+        hedge=LatencyWindow(initial=0.02)
+    )
+    await async_redis.set('key', 'value')
+    start = time.perf_counter()
+    assert await router.get('key') == 'value'
+    assert time.perf_counter() - start < 0.3
+    assert router.replicas[1].commands == ['GET']
+    # late read is cancelled
+    assert slow.commands == []
+
+
+@pytest.mark.asyncio
+async def test_replicas(async_redis, async_replicas):
+    router = ReplicaRouter(async_redis, async_replicas)
+    users = [UserModel(**data) for data in USERS]
+    await UserModel.save_many(router, users)
+    await async_redis.wait(len(async_replicas), 1000)
+    for _ in async_replicas:
+        assert await UserModel.search(router, 1) == users[0]
@@ -0,0 +1,39 @@
+import pytest
+
+from RSO.asyncio.session import Session
+from ..models.asyncio import UserModel, ListIndexQueue, SetIndexGroupID
+
+
+@pytest.mark.asyncio
+class TestSession:
+    async def test_identity_map(self, async_redis):
+        await UserModel(user_id=1, username='username').save(async_redis)
+
+        session = Session(async_redis)
+        user = await session.search(UserModel, 1)
+        await async_redis.delete(user.redis_key)
+        assert await session.search(UserModel, 1) is user
+        assert await session.get_many(UserModel, [2, 1]) == [None, user]
+
+    async def test_flush_once(self, async_redis):
+        async with Session(async_redis, transaction=True) as session:
+            user = UserModel(user_id=1, username='username', queue_id=3)
+            session.add(user)
+            session.add(user)
+            assert not await user.is_exists(async_redis)
+
+        assert await user.is_exists(async_redis)
+        assert await ListIndexQueue.get_members(async_redis, 3) == ['1']
+
+    async def test_save_then_delete(self, async_redis):
+        await UserModel(
+            user_id=1, username='username', group_id=1
+        ).save(async_redis)
+
+        async with Session(async_redis) as session:
+            user = await session.search(UserModel, 1)
+            session.add(user)
+            session.delete(user)
+
+        assert await UserModel.search(async_redis, 1) is None
+        assert await SetIndexGroupID.get_members(async_redis, 1) == set()
@@ -0,0 +1,60 @@
+import pytest
+
+from RSO.asyncio.sharding import ShardedRedis, rebalance
+from tests.asyncio.test_cluster import TaggedIndexEmail, TaggedUserModel
+from tests.models.asyncio import SetIndexGroupID, SingleIndexEmail, UserModel
+from tests.data import USERS
+
+
+def sharded(clients: list) -> ShardedRedis:
+    return ShardedRedis({
+        f'node{number}': client for number, client in enumerate(clients)
+    })
+
+
+@pytest.mark.asyncio
+async def test_model(async_shards):
+    redis = sharded(async_shards)
+    users = [UserModel(**data) for data in USERS]
+    assert await UserModel.save_many(redis, users) == []
+
+    assert await UserModel.search(redis, 1) == users[0]
+    assert sorted(
+        await UserModel.all(redis), key=lambda user: user.user_id
+    ) == users
+    assert await UserModel.count(redis) == len(users)
+    assert await SingleIndexEmail.search_model(redis, users[1].email) \
+           == users[1]
+
+    await users[0].delete(redis)
+    assert await UserModel.delete_many(redis, [2, 3, 4]) == 3
+    assert await UserModel.all(redis) == [users[4]]
+    assert await SetIndexGroupID.get_members(redis, 1) == set()
+
+
+@pytest.mark.asyncio
+async def test_hash_tag(async_shards):
+    redis = sharded(async_shards)
+    users = [TaggedUserModel(**data) for data in USERS]
+    assert await TaggedUserModel.save_many(
+        redis, users, transactional=True
+    ) == []
+    assert await TaggedIndexEmail.search_model(redis, users[1].email) \
+           == users[1]
+
+
+@pytest.mark.asyncio
+async def test_rebalance(async_shards):
+    redis = sharded(async_shards[:2])
+    users = [
+        UserModel(user_id=user_id, username=f'user_{user_id}')
+        for user_id in range(50)
+    ]
+    await UserModel.save_many(redis, users)
+    total = await redis.dbsize()
+
+    redis.add_node('node2', async_shards[2])
+    assert 0 < await rebalance(redis, count=10) < total
+    assert await rebalance(redis) == 0
+    assert await redis.dbsize() == total
+    assert await UserModel.get_many(redis, range(50)) == users
@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+
+from RSO.asyncio.tracking import TrackingCache
+from ..models.asyncio import UserModel
+
+
+@pytest.fixture
+async def cache(async_redis, monkeypatch):
+    cache = TrackingCache(ttl=None, negative_ttl=None, retry_interval=0.1)
+    monkeypatch.setattr(UserModel, '__cache__', cache)
+    await cache.start(async_redis, UserModel)
+    yield cache
+    await cache.stop()
+
+
+@pytest.mark.asyncio
+class TestTrackingCache:
+    async def test_other_client_write(self, async_redis, cache):
+        user = UserModel(user_id=1, username='username', email='old@email')
+        await user.save(async_redis)
+        assert (await UserModel.search(async_redis, 1)).email == 'old@email'
+        assert (await UserModel.search(async_redis, 1)).email == 'old@email'
+        assert cache.hits == 1
+
+        await async_redis.hset(user.redis_key, 'email', 'new@email')
+        for _ in range(100):
+            user = await UserModel.search(async_redis, 1)
+            if user.email == 'new@email':
+                break
+            await asyncio.sleep(0.01)
+        assert user.email == 'new@email'
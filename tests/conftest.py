@@ -6,10 +6,40 @@ import pytest_twisted
 import txredisapi
 from redis import Redis as SyncRedis
 from redis.asyncio import Redis as AsyncRedis
+from redis.asyncio.cluster import RedisCluster as AsyncRedisCluster
+from redis.cluster import RedisCluster as SyncRedisCluster
 from twisted.internet.defer import inlineCallbacks
 
 REDIS_DB = int(os.getenv('REDIS_TEST_DB', 14))
 REDIS_PASS = os.getenv('REDIS_TEST_PASS', 'RedisPassword')
+# `host:port` of a cluster node, cluster tests are skipped without it
+REDIS_CLUSTER = os.getenv('REDIS_TEST_CLUSTER')
+# `host:port,...` of standalone nodes of sharding tests, databases of the
+# test server by default
+REDIS_SHARDS = os.getenv('REDIS_TEST_SHARDS')
+SHARD_DBS = (11, 12, 13)
+# `host:port,...` of replicas of the test server, replica tests are
+# skipped without it
+REDIS_REPLICAS = os.getenv('REDIS_TEST_REPLICAS')
+
+
+def cluster_address() -> tuple:
+    if not REDIS_CLUSTER:
+        pytest.skip('REDIS_TEST_CLUSTER is not set')
+    host, port = REDIS_CLUSTER.rsplit(':', 1)
+    return host, int(port)
+
+
+def shard_options() -> list:
+    """Client options of every sharding test node"""
+    options = dict(password=REDIS_PASS, decode_responses=True)
+    if not REDIS_SHARDS:
+        return [dict(options, db=db) for db in SHARD_DBS]
+    result = []
+    for address in REDIS_SHARDS.split(','):
+        host, port = address.rsplit(':', 1)
+        result.append(dict(options, host=host, port=int(port)))
+    return result
 
 
 @pytest.fixture
@@ -26,6 +56,67 @@ async def async_redis() -> AsyncRedis:
     return conn
 
 
+@pytest.fixture
+def sync_cluster() -> SyncRedisCluster:
+    host, port = cluster_address()
+    server = SyncRedisCluster(
+        host=host, port=port, password=REDIS_PASS, decode_responses=True
+    )
+    server.flushall(target_nodes=SyncRedisCluster.PRIMARIES)
+    yield server
+    server.close()
+
+
+@pytest.fixture
+async def async_cluster() -> AsyncRedisCluster:
+    host, port = cluster_address()
+    conn = AsyncRedisCluster(
+        host=host, port=port, password=REDIS_PASS, decode_responses=True
+    )
+    await conn.flushall(target_nodes=AsyncRedisCluster.PRIMARIES)
+    yield conn
+    await conn.aclose()
+
+
+@pytest.fixture
+def sync_shards() -> list:
+    clients = [SyncRedis(**options) for options in shard_options()]
+    for client in clients:
+        client.flushdb()
+    return clients
+
+
+@pytest.fixture
+async def async_shards() -> list:
+    clients = [AsyncRedis(**options) for options in shard_options()]
+    for client in clients:
+        await client.flushdb()
+    return clients
+
+
+def replica_options() -> list:
+    if not REDIS_REPLICAS:
+        pytest.skip('REDIS_TEST_REPLICAS is not set')
+    result = []
+    for address in REDIS_REPLICAS.split(','):
+        host, port = address.rsplit(':', 1)
+        result.append(dict(
+            host=host, port=int(port), db=REDIS_DB, password=REDIS_PASS,
+            decode_responses=True
+        ))
+    return result
+
+
+@pytest.fixture
+def sync_replicas(sync_redis) -> list:
+    return [SyncRedis(**options) for options in replica_options()]
+
+
+@pytest.fixture
+def async_replicas(async_redis) -> list:
+    return [AsyncRedis(**options) for options in replica_options()]
+
+
 @pytest.fixture
 def tx_redis():
     d = txredisapi.Connection(dbid=REDIS_DB, password=REDIS_PASS)
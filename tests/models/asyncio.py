@@ -2,14 +2,22 @@ import typing as t
 from dataclasses import dataclass
 
 from redis.asyncio.client import Redis, Pipeline
-from RSO.asyncio.index import HashIndex, ListIndex, SetIndex
+from RSO.asyncio.index import (
+    HashIndex, ListIndex, SetIndex, SortedSetIndex
+)
 from RSO.asyncio.model import Model
 
 from .base import (
+    BaseIndexBirthDate,
+    BaseIndexCity,
+    BaseIndexDeviceOwner,
+    BaseIndexDeviceSerial,
     BaseIndexEmail,
     BaseIndexGroupID,
     BaseIndexQueue,
     BaseIndexUsername,
+    BaseDeviceModel,
+    BaseProfileModel,
     BaseUserModel
 )
 
@@ -69,7 +77,58 @@ UserModel.__indexes__ = [
 ]
 
 
+@dataclass
+class BirthDateUserModel(UserModel):
+    __model_name__ = 'birth_date_user'
+
+
+class SortedSetIndexBirthDate(BaseIndexBirthDate, SortedSetIndex):
+    __model__ = BirthDateUserModel
+
+
+BirthDateUserModel.__indexes__ = [SortedSetIndexBirthDate]
+
+
 # TODO
 class ExtendedUserModel(UserModel):
     async def save(self, redis: t.Union[Pipeline, Redis]) -> None:
         return await super(ExtendedUserModel, self).extended_save(redis)
+
+
+@dataclass
+class RegistryUserModel(BaseUserModel, Model):
+    __model_name__ = 'registry_user'
+    __registry__ = True
+    __indexes__ = []
+
+
+@dataclass
+class ProfileModel(BaseProfileModel, Model):
+    pass
+
+
+class ProfileEmailIndex(BaseIndexEmail, HashIndex):
+    __model__ = ProfileModel
+
+
+class ProfileCityIndex(BaseIndexCity, SetIndex):
+    __model__ = ProfileModel
+
+
+ProfileModel.__indexes__ = [ProfileEmailIndex, ProfileCityIndex]
+
+
+@dataclass
+class DeviceModel(BaseDeviceModel, Model):
+    pass
+
+
+class DeviceSerialIndex(BaseIndexDeviceSerial, HashIndex):
+    __model__ = DeviceModel
+
+
+class DeviceOwnerIndex(BaseIndexDeviceOwner, SetIndex):
+    __model__ = DeviceModel
+
+
+DeviceModel.__indexes__ = [DeviceSerialIndex, DeviceOwnerIndex]
@@ -1,5 +1,10 @@
 from dataclasses import dataclass, field
-from datetime import date
+from datetime import date, datetime
+from enum import Enum
+from typing import Optional
+from uuid import UUID
+
+from RSO.codec import Base62Key, Base62UUIDKey
 
 from .const import REDIS_MODEL_PREFIX
 
@@ -24,6 +29,11 @@ class BaseIndexQueue:
     __key__ = 'queue_id'
 
 
+class BaseIndexBirthDate:
+    __prefix__ = REDIS_MODEL_PREFIX
+    __key__ = 'birth_date'
+
+
 @dataclass
 class BaseUserModel:
     __prefix__ = REDIS_MODEL_PREFIX
@@ -37,3 +47,131 @@ class BaseUserModel:
     queue_id: int = field(default=None)
     birth_date: date = field(default=None)
     boolean: bool = field(default=False)
+
+
+class Status(Enum):
+    ACTIVE = 'active'
+    DONE = 'done'
+
+
+class BaseIndexStatus:
+    __prefix__ = REDIS_MODEL_PREFIX
+    __key__ = 'status'
+
+
+class BaseIndexDue:
+    __prefix__ = REDIS_MODEL_PREFIX
+    __key__ = 'due'
+
+
+class BaseIndexUrgent:
+    __prefix__ = REDIS_MODEL_PREFIX
+    __key__ = 'urgent'
+
+
+@dataclass
+class BaseTaskModel:
+    __prefix__ = REDIS_MODEL_PREFIX
+    __model_name__ = 'task'
+    __key__ = 'task_id'
+
+    task_id: int
+    status: Status
+    due: datetime
+    urgent: bool = field(default=False)
+
+
+class BaseIndexCity:
+    __prefix__ = REDIS_MODEL_PREFIX
+    __key__ = 'city'
+
+
+@dataclass
+class BaseProfileModel:
+    __prefix__ = REDIS_MODEL_PREFIX
+    __model_name__ = 'profile'
+    __key__ = 'profile_id'
+
+    profile_id: int
+    name: str
+    email: Optional[str] = None
+    city: Optional[str] = None
+    bio: Optional[str] = None
+    birth_date: Optional[date] = None
+
+
+@dataclass
+class BaseRecordModel:
+    __prefix__ = REDIS_MODEL_PREFIX
+    __model_name__ = 'record'
+    __key__ = 'record_id'
+
+    record_id: int
+    name: str
+    ratio: float = 0.0
+    active: bool = False
+    day: Optional[date] = None
+    data: Optional[bytes] = None
+    note: Optional[str] = None
+
+
+class BaseIndexMemberEmail:
+    __prefix__ = REDIS_MODEL_PREFIX
+    __key__ = 'email'
+    __tag__ = 'e'
+
+
+class BaseIndexMemberGroup:
+    __prefix__ = REDIS_MODEL_PREFIX
+    __key__ = 'group_id'
+    __tag__ = 'g'
+
+
+class BaseIndexMemberQueue:
+    __prefix__ = REDIS_MODEL_PREFIX
+    __key__ = 'group_id'
+    __tag__ = 'q'
+
+
+@dataclass
+class BaseMemberModel:
+    __prefix__ = REDIS_MODEL_PREFIX
+    __model_name__ = 'member'
+    __tag__ = 'm'
+    __key__ = 'member_id'
+    __aliases__ = {'birth_date': 'bd', 'group_id': 'g', 'email': 'e'}
+    __key_codec__ = Base62Key()
+    __registry__ = True
+
+    member_id: int
+    name: str
+    email: Optional[str] = None
+    group_id: Optional[int] = None
+    birth_date: Optional[date] = None
+
+
+class BaseIndexDeviceSerial:
+    __prefix__ = REDIS_MODEL_PREFIX
+    __key__ = 'serial_number'
+    __tag__ = 's'
+
+
+class BaseIndexDeviceOwner:
+    __prefix__ = REDIS_MODEL_PREFIX
+    __key__ = 'owner_id'
+    __tag__ = 'o'
+
+
+@dataclass
+class BaseDeviceModel:
+    __prefix__ = REDIS_MODEL_PREFIX
+    __model_name__ = 'device'
+    __tag__ = 'd'
+    __key__ = 'device_id'
+    __aliases__ = {'serial_number': 's', 'owner_id': 'o'}
+    __key_codec__ = Base62UUIDKey()
+    __registry__ = True
+
+    device_id: UUID
+    serial_number: str
+    owner_id: Optional[int] = None
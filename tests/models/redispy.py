@@ -1,14 +1,28 @@
 from dataclasses import dataclass
 
 from redis import Redis
-from RSO.index import HashIndex, ListIndex, SetIndex
+from RSO.index import (
+    HashIndex, ListIndex, SetIndex, SortedSetIndex
+)
 from RSO.model import Model
 
 from .base import (
+    BaseIndexBirthDate,
+    BaseIndexCity,
+    BaseIndexDue,
     BaseIndexGroupID,
+    BaseIndexMemberEmail,
+    BaseIndexMemberGroup,
+    BaseIndexMemberQueue,
     BaseIndexEmail,
+    BaseIndexStatus,
+    BaseIndexUrgent,
     BaseIndexUsername,
     BaseIndexQueue,
+    BaseMemberModel,
+    BaseProfileModel,
+    BaseRecordModel,
+    BaseTaskModel,
     BaseUserModel
 )
 
@@ -44,6 +58,18 @@ UserModel.__indexes__ = [
 ]
 
 
+@dataclass
+class BirthDateUserModel(UserModel):
+    __model_name__ = 'birth_date_user'
+
+
+class SortedSetIndexBirthDate(BaseIndexBirthDate, SortedSetIndex):
+    __model__ = BirthDateUserModel
+
+
+BirthDateUserModel.__indexes__ = [SortedSetIndexBirthDate]
+
+
 @dataclass
 class NoPrefixUserModel(Model, BaseUserModel):
     __prefix__ = None
@@ -75,3 +101,73 @@ NoPrefixUserModel.__indexes__ = [
     NoPrefixSetIndexGroupID,
     NoPrefixListIndexQueue
 ]
+
+
+@dataclass
+class RegistryUserModel(Model, BaseUserModel):
+    __model_name__ = 'registry_user'
+    __registry__ = True
+    __indexes__ = []
+
+
+@dataclass
+class TaskModel(Model, BaseTaskModel):
+    pass
+
+
+class SetIndexStatus(BaseIndexStatus, SetIndex):
+    __model__ = TaskModel
+
+
+class SetIndexDue(BaseIndexDue, SetIndex):
+    __model__ = TaskModel
+
+
+class ListIndexUrgent(BaseIndexUrgent, ListIndex):
+    __model__ = TaskModel
+
+
+TaskModel.__indexes__ = [SetIndexStatus, SetIndexDue, ListIndexUrgent]
+
+
+@dataclass
+class ProfileModel(Model, BaseProfileModel):
+    pass
+
+
+class ProfileEmailIndex(BaseIndexEmail, HashIndex):
+    __model__ = ProfileModel
+
+
+class ProfileCityIndex(BaseIndexCity, SetIndex):
+    __model__ = ProfileModel
+
+
+ProfileModel.__indexes__ = [ProfileEmailIndex, ProfileCityIndex]
+
+
+@dataclass
+class RecordModel(Model, BaseRecordModel):
+    __indexes__ = []
+
+
+@dataclass
+class MemberModel(BaseMemberModel, Model):
+    pass
+
+
+class MemberEmailIndex(BaseIndexMemberEmail, HashIndex):
+    __model__ = MemberModel
+
+
+class MemberGroupIndex(BaseIndexMemberGroup, SetIndex):
+    __model__ = MemberModel
+
+
+class MemberQueueIndex(BaseIndexMemberQueue, ListIndex):
+    __model__ = MemberModel
+
+
+MemberModel.__indexes__ = [
+    MemberEmailIndex, MemberGroupIndex, MemberQueueIndex
+]
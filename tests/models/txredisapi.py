@@ -4,10 +4,13 @@ from typing import Union
 from twisted.internet import defer
 from txredisapi import BaseRedisProtocol, ConnectionHandler
 
-from RSO.txredisapi.index import HashIndex, ListIndex, SetIndex
+from RSO.txredisapi.index import (
+    HashIndex, ListIndex, SetIndex, SortedSetIndex
+)
 from RSO.txredisapi.model import Model
 
 from .base import (
+    BaseIndexBirthDate,
     BaseIndexEmail,
     BaseIndexGroupID,
     BaseIndexQueue,
@@ -58,3 +61,22 @@ UserModel.__indexes__ = [
     SetIndexGroupID,
     ListIndexQueue
 ]
+
+
+@dataclass
+class BirthDateUserModel(UserModel):
+    __model_name__ = 'birth_date_user'
+
+
+class SortedSetIndexBirthDate(BaseIndexBirthDate, SortedSetIndex):
+    __model__ = BirthDateUserModel
+
+
+BirthDateUserModel.__indexes__ = [SortedSetIndexBirthDate]
+
+
+@dataclass
+class RegistryUserModel(BaseUserModel, Model):
+    __model_name__ = 'registry_user'
+    __registry__ = True
+    __indexes__ = []
@@ -0,0 +1,124 @@
+from dataclasses import dataclass
+from datetime import date
+from uuid import UUID, uuid4
+
+import pytest
+
+from RSO.codec import RAW, Base62Key, Base62UUIDKey
+from RSO.layout import StructLayout
+from RSO.model import Model
+from tests.models.const import REDIS_MODEL_PREFIX
+from .models.redispy import (
+    MemberModel,
+    MemberEmailIndex,
+    MemberGroupIndex,
+    MemberQueueIndex,
+)
+
+
+@pytest.fixture
+def members(sync_redis) -> list:
+    members = [
+        MemberModel(
+            member_id=member_id, name=f'name_{member_id}',
+            email=f'{member_id}@email', group_id=1,
+            birth_date=date(2000, 1, 1)
+        )
+        for member_id in (1, 62, 1000)
+    ]
+    MemberModel.save_many(sync_redis, members)
+    return members
+
+
+class TestAlias:
+    def test_keys(self, sync_redis, members):
+        prefix = f'{REDIS_MODEL_PREFIX}::m'
+        assert sorted(sync_redis.keys(f'{prefix}*')) == [
+            f'{prefix}:1', f'{prefix}:10', f'{prefix}::index::e',
+            f'{prefix}::index::g:1', f'{prefix}::index::q:1',
+            f'{prefix}::registry', f'{prefix}:G8',
+        ]
+        assert sync_redis.hgetall(f'{prefix}:G8') == {
+            'member_id': '1000', 'name': 'name_1000', 'e': '1000@email',
+            'g': '1', 'bd': '2000-01-01',
+        }
+        assert sync_redis.hget(f'{prefix}::index::e', '62@email') == '10'
+        assert sync_redis.smembers(f'{prefix}::index::g:1') == {
+            '1', '10', 'G8'
+        }
+        assert sync_redis.zrange(f'{prefix}::registry', 0, -1) == [
+            '1', '10', 'G8'
+        ]
+
+    def test_read(self, sync_redis, members):
+        assert MemberModel.search(sync_redis, 1000) == members[2]
+        assert MemberModel.search(sync_redis, 1000, mode=RAW)['email'] \
+               == '1000@email'
+        assert MemberModel.all(sync_redis) == members
+        assert MemberModel.page(sync_redis, 1, 1) == [members[1]]
+        assert list(MemberModel.iter_all(sync_redis)) == members
+        assert MemberEmailIndex.search_model(sync_redis, '62@email') \
+               == members[1]
+        assert sorted(
+            member.member_id for member in
+            MemberGroupIndex.search_models(sync_redis, 1)
+        ) == [1, 62, 1000]
+        assert MemberGroupIndex.get_members(sync_redis, 1) == {1, 62, 1000}
+        assert MemberQueueIndex.has_member(sync_redis, members[0])
+        assert MemberQueueIndex.get_by_rpoplpush(sync_redis, 1) == members[0]
+
+    def test_write(self, sync_redis, members):
+        member = MemberModel.search(sync_redis, 62, only=['name'])
+        member.birth_date = date(2001, 1, 1)
+        member.load_deferred(sync_redis)
+        member.email = 'new@email'
+        member.save(sync_redis)
+        assert MemberModel.search(sync_redis, 62) == MemberModel(
+            member_id=62, name='name_62', email='new@email', group_id=1,
+            birth_date=date(2001, 1, 1)
+        )
+        assert MemberEmailIndex.search_model(sync_redis, '62@email') is None
+
+        member.delete(sync_redis)
+        assert MemberModel.delete_many(sync_redis, [1000]) == 1
+        assert MemberModel.all(sync_redis) == [members[0]]
+        # saved twice, delete removes one list index member
+        assert MemberQueueIndex.get_members(sync_redis, 1) == [62, 1]
+
+    def test_packed_layout(self, sync_redis, monkeypatch):
+        monkeypatch.setattr(MemberModel, '__layout__', StructLayout())
+        member = MemberModel(
+            member_id=1, name='name', birth_date=date(2000, 1, 1)
+        )
+        member.save(sync_redis)
+        assert MemberModel.search(sync_redis, 1) == member
+
+    def test_unknown_alias(self):
+        @dataclass
+        class AliasModel(Model):
+            __model_name__ = 'alias'
+            __key__ = 'alias_id'
+            __aliases__ = {'unknown': 'u'}
+
+            alias_id: int
+
+        with pytest.raises(ValueError):
+            AliasModel(alias_id=1)
+
+
+class TestKeyCodec:
+    def test_base62(self):
+        codec = Base62Key()
+        for value in (0, 61, 62, 2 ** 63):
+            assert codec.decode(codec.encode(value)) == value
+        assert codec.encode(1000) == 'G8'
+        with pytest.raises(ValueError):
+            codec.encode(-1)
+
+    def test_base62_uuid(self):
+        codec = Base62UUIDKey()
+        value = uuid4()
+        assert len(codec.encode(value)) == 22
+        assert codec.decode(codec.encode(value)) == value
+        assert codec.encode(str(value)) == codec.encode(value)
+        assert codec.encode(UUID(int=0)) == '0' * 22
@@ -0,0 +1,146 @@
+import pytest
+from redis.client import Pipeline
+
+from RSO.cache import MISSING, ModelCache
+from RSO.codec import RAW, ROW
+from RSO.session import Session
+from .models.redispy import UserModel, SingleIndexEmail
+
+
+@pytest.fixture
+def cache(monkeypatch) -> ModelCache:
+    cache = ModelCache(max_entries=10, ttl=60, negative_ttl=60)
+    monkeypatch.setattr(UserModel, '__cache__', cache)
+    return cache
+
+
+class TestModelCache:
+    def test_lru_eviction(self):
+        cache = ModelCache(max_entries=2)
+        cache.set('1', ['a'])
+        cache.set('2', ['b'])
+        assert cache.get('1') == ['a']
+        cache.set('3', ['c'])
+
+        assert cache.get('2') is MISSING
+        assert cache.get('1') == ['a']
+        assert cache.stats()['evictions'] == 1
+        assert len(cache) == 2
+
+    def test_max_bytes(self):
+        cache = ModelCache(max_entries=None, max_bytes=1000)
+        for key in range(100):
+            cache.set(str(key), ['x' * 10])
+        assert 0 < cache.bytes <= 1000
+        assert cache.evictions == 100 - len(cache)
+
+    def test_ttl(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr('RSO.cache.monotonic', lambda: now[0])
+        cache = ModelCache(ttl=10, negative_ttl=1)
+        cache.set('found', ['a'])
+        cache.set('not_found', None)
+        assert cache.get('not_found') is None
+
+        now[0] += 2
+        assert cache.get('not_found') is MISSING
+        assert cache.get('found') == ['a']
+
+        now[0] += 10
+        assert cache.get('found') is MISSING
+        assert cache.stats() == {
+            'hits': 2, 'misses': 2, 'evictions': 0, 'entries': 0, 'bytes': 0
+        }
+
+    def test_negative_ttl_disabled(self):
+        cache = ModelCache(negative_ttl=0)
+        cache.set('not_found', None)
+        assert cache.get('not_found') is MISSING
+
+
+class TestCachedModel:
+    def test_search(self, sync_redis, cache):
+        user = UserModel(user_id=1, username='username', email='old@email')
+        user.save(sync_redis)
+
+        assert UserModel.search(sync_redis, 1).email == 'old@email'
+        sync_redis.hset(user.redis_key, 'email', 'other@email')
+        assert UserModel.search(sync_redis, 1).email == 'old@email'
+        assert cache.hits == 1
+
+        user.email = 'new@email'
+        user.save(sync_redis)
+        assert UserModel.search(sync_redis, 1).email == 'new@email'
+
+        user.delete(sync_redis)
+        assert UserModel.search(sync_redis, 1) is None
+
+    def test_negative_cache(self, sync_redis, cache):
+        assert UserModel.search(sync_redis, 1) is None
+        sync_redis.hset(UserModel.redis_key_from_value(1), 'user_id', 1)
+        assert UserModel.search(sync_redis, 1) is None
+
+        UserModel(user_id=1, username='username').save(sync_redis)
+        assert UserModel.search(sync_redis, 1) is not None
+
+    def test_search_model(self, sync_redis, cache):
+        assert SingleIndexEmail.search_model(sync_redis, 'old@email') is None
+        user = UserModel(user_id=1, username='username', email='old@email')
+        user.save(sync_redis)
+
+        result = SingleIndexEmail.search_model(sync_redis, 'old@email')
+        assert result.username == 'username'
+        hits = cache.hits
+        assert SingleIndexEmail.search_model(sync_redis, 'old@email') \
+               == result
+        assert cache.hits == hits + 2
+
+        user = UserModel.search(sync_redis, 1)
+        user.email = 'new@email'
+        user.save(sync_redis)
+        assert SingleIndexEmail.search_model(sync_redis, 'old@email') is None
+        assert SingleIndexEmail.search_model(sync_redis, 'new@email') \
+               .username == 'username'
+
+    def test_read_modes(self, sync_redis, cache):
+        UserModel(user_id=1, username='username', email='a@email').save(
+            sync_redis
+        )
+        assert UserModel.search(sync_redis, 1).username == 'username'
+        assert UserModel.search(sync_redis, 1, mode=ROW).user_id == 1
+        assert UserModel.search(sync_redis, 1, mode=RAW)['user_id'] == '1'
+        assert cache.hits == 2
+
+        assert SingleIndexEmail.search_model(sync_redis, 'a@email') \
+               .username == 'username'
+        assert SingleIndexEmail.search_model(
+            sync_redis, 'a@email', mode=ROW
+        ).username == 'username'
+        assert cache.hits == 4
+
+    def test_delete_many(self, sync_redis, cache):
+        UserModel(user_id=1, username='username').save(sync_redis)
+        assert UserModel.search(sync_redis, 1) is not None
+
+        UserModel.delete_many(sync_redis, [1])
+        assert UserModel.search(sync_redis, 1) is None
+
+    def test_search_during_execute(self, sync_redis, cache, monkeypatch):
+        user = UserModel(user_id=1, username='username', email='old@email')
+        user.save(sync_redis)
+        execute = Pipeline.execute
+
+        def search_execute(pipe, *args, **kwargs):
+            # model is cached before the queued writes are executed
+            UserModel.search(sync_redis, 1)
+            return execute(pipe, *args, **kwargs)
+
+        monkeypatch.setattr(Pipeline, 'execute', search_execute)
+        user.email = 'new@email'
+        assert UserModel.save_many(sync_redis, [user]) == []
+        assert UserModel.search(sync_redis, 1).email == 'new@email'
+
+        with Session(sync_redis) as session:
+            user.email = 'session@email'
+            session.add(user)
+        assert UserModel.search(sync_redis, 1).email == 'session@email'
@@ -0,0 +1,134 @@
+from dataclasses import dataclass
+
+import pytest
+
+from RSO.cluster import key_slot, scan_nodes, split_commands
+from RSO.index import HashIndex, SetIndex
+from RSO.layout import BucketLayout
+from RSO.model import Model
+from RSO.query import Match, Query
+from tests.models.base import BaseIndexEmail, BaseIndexGroupID, BaseUserModel
+from tests.models.const import REDIS_MODEL_PREFIX
+from .models.redispy import (
+    UserModel,
+    RegistryUserModel,
+    SetIndexGroupID,
+    SingleIndexEmail,
+)
+from .data import USERS
+
+
+@dataclass
+class TaggedUserModel(Model, BaseUserModel):
+    __model_name__ = 'tagged'
+    __hash_tag__ = True
+    __registry__ = True
+
+
+class TaggedIndexEmail(BaseIndexEmail, HashIndex):
+    __model__ = TaggedUserModel
+
+
+class TaggedIndexGroupID(BaseIndexGroupID, SetIndex):
+    __model__ = TaggedUserModel
+
+
+TaggedUserModel.__indexes__ = [TaggedIndexEmail, TaggedIndexGroupID]
+
+
+class TestCluster:
+    def test_hash_tag(self):
+        assert TaggedUserModel.redis_key_from_value(1) \
+               == f'{REDIS_MODEL_PREFIX}::{{tagged}}:1'
+        assert TaggedIndexEmail.redis_key() \
+               == f'{REDIS_MODEL_PREFIX}::{{tagged}}::index::email'
+        keys = [
+            TaggedUserModel.redis_key_from_value(1),
+            TaggedUserModel.redis_key_from_value(2),
+            TaggedUserModel.registry_key(),
+            TaggedIndexEmail.redis_key(),
+            TaggedIndexGroupID.redis_key_from_value(1),
+        ]
+        assert len({key_slot(key) for key in keys}) == 1
+
+    def test_split_commands(self):
+        keys = [UserModel.redis_key_from_value(value) for value in range(20)]
+        commands = split_commands([('DEL', *keys), ('HDEL', 'key', 'a')])
+        assert commands[-1] == ('HDEL', 'key', 'a')
+        assert sorted(key for command in commands[:-1]
+                      for key in command[1:]) == sorted(keys)
+        for command in commands[:-1]:
+            assert len({key_slot(key) for key in command[1:]}) == 1
+
+    def test_untagged(self, sync_cluster):
+        users = [UserModel(**data) for data in USERS]
+        assert UserModel.save_many(sync_cluster, users) == []
+        assert len(scan_nodes(sync_cluster, UserModel.redis_key_pattern())) \
+               == len(sync_cluster.get_primaries())
+
+        assert UserModel.search(sync_cluster, 1) == users[0]
+        assert sorted(
+            UserModel.all(sync_cluster), key=lambda user: user.user_id
+        ) == users
+        assert UserModel.count(sync_cluster) == len(users)
+        assert SingleIndexEmail.search_model(
+            sync_cluster, users[1].email
+        ) == users[1]
+        assert SingleIndexEmail.search_model(sync_cluster, 'none') is None
+        assert SetIndexGroupID.get_members(sync_cluster, 1) == {'1', '2', '3'}
+
+        users[0].delete(sync_cluster)
+        assert UserModel.delete_many(sync_cluster, [2, 3, 4]) == 3
+        assert UserModel.all(sync_cluster) == [users[4]]
+        assert SetIndexGroupID.get_members(sync_cluster, 1) == set()
+        with pytest.raises(RuntimeError):
+            UserModel.save_many(sync_cluster, users, transactional=True)
+
+    def test_registry(self, sync_cluster):
+        users = [RegistryUserModel(**data) for data in USERS]
+        RegistryUserModel.save_many(sync_cluster, users)
+        assert RegistryUserModel.all(sync_cluster) == users
+        assert RegistryUserModel.count(sync_cluster) == len(users)
+
+    def test_tagged(self, sync_cluster):
+        users = [TaggedUserModel(**data) for data in USERS]
+        assert TaggedUserModel.save_many(
+            sync_cluster, users, transactional=True
+        ) == []
+        users[0].save(sync_cluster)
+        assert len(scan_nodes(
+            sync_cluster, TaggedUserModel.redis_key_pattern()
+        )) == 1
+
+        assert TaggedUserModel.all(sync_cluster) == users
+        assert TaggedIndexEmail.search_model(
+            sync_cluster, users[1].email
+        ) == users[1]
+        assert TaggedUserModel.delete_many(sync_cluster, [1, 2]) == 2
+        assert TaggedUserModel.count(sync_cluster) == len(users) - 2
+        assert TaggedIndexGroupID.get_members(sync_cluster, 1) == {'3'}
+
+    def test_query(self, sync_cluster):
+        users = [TaggedUserModel(**data) for data in USERS]
+        TaggedUserModel.save_many(sync_cluster, users)
+        query = Query(
+            Match(TaggedIndexGroupID, 1) | Match(TaggedIndexGroupID, 2),
+            ttl=10
+        )
+        assert query.count(sync_cluster) == len(users)
+        assert query.models(sync_cluster, offset=1, limit=2) == users[1:3]
+
+        UserModel.save_many(sync_cluster, [UserModel(**USERS[0])])
+        with pytest.raises(RuntimeError):
+            Query(
+                Match(SetIndexGroupID, 1) & Match(SetIndexGroupID, 2)
+            ).ids(sync_cluster)
+        assert Query(Match(SetIndexGroupID, 1)).ids(sync_cluster) == ['1']
+
+    def test_bucket_layout(self, sync_cluster, monkeypatch):
+        monkeypatch.setattr(UserModel, '__layout__', BucketLayout())
+        users = [UserModel(**data) for data in USERS]
+        UserModel.save_many(sync_cluster, users)
+        assert UserModel.count(sync_cluster) == len(users)
+        assert UserModel.delete_many(sync_cluster, [1, 2]) == 2
+        assert UserModel.count(sync_cluster) == len(users) - 2
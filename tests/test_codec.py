@@ -0,0 +1,196 @@
+import sys
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from enum import Enum, IntEnum
+from typing import Optional
+from uuid import UUID, uuid4
+
+import pytest
+
+from RSO.codec import RAW, ROW, model_codec
+from RSO.model import Model
+from tests.models.const import REDIS_MODEL_PREFIX
+from .models.redispy import SetIndexGroupID, SingleIndexUsername, UserModel
+
+
+class Color(Enum):
+    RED = 'red'
+    BLUE = 'blue'
+
+
+class Level(IntEnum):
+    LOW = 1
+    HIGH = 2
+
+
+@dataclass
+class TypedModel(Model):
+    __prefix__ = REDIS_MODEL_PREFIX
+    __model_name__ = 'typed'
+    __key__ = 'uid'
+    __indexes__ = []
+
+    uid: UUID
+    count: int = 0
+    ratio: float = 0.0
+    active: bool = False
+    birth_date: Optional[date] = None
+    created: Optional[datetime] = None
+    color: Color = Color.RED
+    level: Optional[Level] = None
+    note: Optional[str] = field(default=None)
+
+
+@dataclass
+class PostInitModel(TypedModel):
+    __model_name__ = 'post_init'
+
+    def __post_init__(self):
+        super().__post_init__()
+        self.note = 'post_init'
+
+
+if sys.version_info >= (3, 10):
+    @dataclass(slots=True)
+    class SlotsModel(Model):
+        __prefix__ = REDIS_MODEL_PREFIX
+        __model_name__ = 'slots'
+        __key__ = 'uid'
+        __indexes__ = []
+
+        uid: int
+        name: Optional[str] = None
+
+
+class TestModelCodec:
+    def test_round_trip(self, sync_redis):
+        model = TypedModel(
+            uid=uuid4(), count=3, ratio=0.5, active=True,
+            birth_date=date(2000, 2, 20),
+            created=datetime(2020, 1, 2, 3, 4, 5),
+            color=Color.BLUE, level=Level.HIGH
+        )
+        model.save(sync_redis)
+        assert sync_redis.hgetall(model.redis_key) == {
+            'uid': str(model.uid), 'count': '3', 'ratio': '0.5',
+            'active': '1', 'birth_date': '2000-02-20',
+            'created': '2020-01-02T03:04:05', 'color': 'blue', 'level': '2',
+        }
+
+        result = TypedModel.search(sync_redis, model.uid)
+        assert result == model
+        assert type(result.count) is int
+        assert type(result.level) is Level
+
+    def test_missing_fields(self, sync_redis):
+        model = TypedModel(uid=uuid4())
+        model.save(sync_redis)
+
+        result = TypedModel.search(sync_redis, model.uid)
+        assert result == model
+        assert result.active is False
+        assert result.birth_date is None
+
+    def test_post_init_overridden(self, sync_redis):
+        assert not model_codec(PostInitModel).trusted
+        model = PostInitModel(uid=uuid4(), count=1)
+        model.save(sync_redis)
+
+        result = PostInitModel.search(sync_redis, model.uid)
+        assert result.count == 1
+        assert result.note == 'post_init'
+
+    def test_coerce_user_values(self):
+        model = TypedModel(
+            uid=str(UUID(int=1)), count='2', active='0',
+            birth_date='2000-02-20', color='blue', level='1'
+        )
+        assert model.uid == UUID(int=1)
+        assert model.count == 2
+        assert model.active is False
+        assert model.birth_date == date(2000, 2, 20)
+        assert model.color is Color.BLUE
+        assert model.level is Level.LOW
+
+    def test_undecodable_values(self, sync_redis):
+        model = TypedModel(uid=uuid4())
+        model.save(sync_redis)
+        sync_redis.hset(
+            model.redis_key, mapping={'count': '', 'color': 'green'}
+        )
+
+        result = TypedModel.search(sync_redis, model.uid)
+        assert result.count == ''
+        assert result.color == 'green'
+        assert TypedModel.get_many(sync_redis, [model.uid]) == [result]
+        assert TypedModel(uid=model.uid, ratio='x').ratio == 'x'
+
+    def test_get_fields_cached(self):
+        assert UserModel.get_fields() is UserModel.get_fields()
+        assert model_codec(UserModel).trusted
+
+    @pytest.mark.skipif(
+        sys.version_info < (3, 10), reason='dataclass slots requires 3.10'
+    )
+    def test_slots_model(self, sync_redis):
+        assert model_codec(SlotsModel).trusted
+        model = SlotsModel(uid=1, name='name')
+        model.save(sync_redis)
+
+        result = SlotsModel.search(sync_redis, 1)
+        assert result == model
+        assert not hasattr(result, '__dict__')
+        assert result._redis_snapshot == ('1', 'name')
+
+        result.name = 'new_name'
+        result.save(sync_redis)
+        assert sync_redis.hgetall(model.redis_key) == {
+            'uid': '1', 'name': 'new_name'
+        }
+
+
+class TestReadModes:
+    def test_search(self, sync_redis):
+        model = TypedModel(uid=UUID(int=1), count=3, level=Level.HIGH)
+        model.save(sync_redis)
+
+        row = TypedModel.search(sync_redis, model.uid, mode=ROW)
+        assert isinstance(row, tuple)
+        assert row._fields == tuple(TypedModel.get_fields())
+        assert row.uid == model.uid
+        assert row.count == 3
+        assert row.level is Level.HIGH
+        assert row.birth_date is None
+
+        raw = TypedModel.search(sync_redis, model.uid, mode=RAW)
+        assert raw == {
+            'uid': str(model.uid), 'count': '3', 'ratio': '0.0',
+            'active': '0', 'color': 'red', 'level': '2',
+        }
+        assert TypedModel.search(sync_redis, UUID(int=2), mode=ROW) is None
+
+    def test_unknown_mode(self, sync_redis):
+        TypedModel(uid=UUID(int=1)).save(sync_redis)
+        with pytest.raises(ValueError):
+            TypedModel.search(sync_redis, UUID(int=1), mode='json')
+
+    def test_many(self, sync_redis):
+        for user_id in range(1, 4):
+            UserModel(
+                user_id=user_id, username=f'username_{user_id}', group_id=1
+            ).save(sync_redis)
+
+        rows = UserModel.get_many(sync_redis, [1, 4, 2], mode=ROW)
+        assert [row and row.user_id for row in rows] == [1, None, 2]
+        assert sorted(
+            row.username for row in UserModel.all(sync_redis, mode=ROW)
+        ) == ['username_1', 'username_2', 'username_3']
+        assert sorted(
+            data['user_id']
+            for data in SetIndexGroupID.search_models(sync_redis, 1, mode=RAW)
+        ) == ['1', '2', '3']
+
+        row = SingleIndexUsername.search_model(
+            sync_redis, 'username_2', mode=ROW
+        )
+        assert (row.user_id, row.group_id) == (2, 1)
@@ -0,0 +1,116 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import pytest
+
+from RSO.index import HashIndex, SetIndex
+from RSO.model import Model
+from RSO.schema import INDEX_KEY, ParsedKey, parse_key
+from tests.models.const import REDIS_MODEL_PREFIX
+
+
+@dataclass
+class AccountModel(Model):
+    __prefix__ = REDIS_MODEL_PREFIX
+    __model_name__ = 'account'
+    __key__ = 'account_id'
+
+    account_id: int
+    tenant: str
+    email: Optional[str] = None
+    group_id: Optional[int] = None
+    active: bool = True
+
+
+class AccountTenantEmailIndex(HashIndex):
+    __prefix__ = REDIS_MODEL_PREFIX
+    __model__ = AccountModel
+    __key__ = ('tenant', 'email')
+
+
+class AccountGroupActiveIndex(SetIndex):
+    __prefix__ = REDIS_MODEL_PREFIX
+    __model__ = AccountModel
+    __key__ = ('group_id', 'active')
+
+
+class AccountGroupIndex(SetIndex):
+    __prefix__ = REDIS_MODEL_PREFIX
+    __model__ = AccountModel
+    __key__ = 'group_id'
+
+
+AccountModel.__indexes__ = [
+    AccountTenantEmailIndex, AccountGroupActiveIndex, AccountGroupIndex
+]
+
+
+@pytest.fixture
+def accounts(sync_redis) -> list:
+    accounts = [
+        AccountModel(
+            account_id=account_id, tenant=f'tenant_{account_id % 2}',
+            email=f'{account_id}@email', group_id=1,
+            active=account_id < 4
+        )
+        for account_id in range(1, 6)
+    ]
+    AccountModel.save_many(sync_redis, accounts)
+    return accounts
+
+
+class TestCompoundIndex:
+    def test_redis_key(self):
+        prefix = f'{REDIS_MODEL_PREFIX}::account::index'
+        assert AccountTenantEmailIndex.redis_key() \
+               == f'{prefix}::tenant+email'
+        assert AccountGroupActiveIndex.redis_key_from_value((1, True)) \
+               == f'{prefix}::group_id+active:1:1'
+        assert parse_key(
+            f'{prefix}::group_id+active:1:1', [AccountModel]
+        ) == ParsedKey(
+            INDEX_KEY, AccountModel, AccountGroupActiveIndex, '1:1'
+        )
+
+    def test_encode_index_value(self):
+        encode = AccountTenantEmailIndex.encode_index_value
+        assert encode(('a:b', 'c')) == 'a\\:b:c'
+        assert encode(('a', 'b:c')) == 'a:b\\:c'
+        assert encode(('a', None)) is None
+        assert encode('a:b') == 'a:b'
+        with pytest.raises(ValueError):
+            encode(('a',))
+
+    def test_search(self, sync_redis, accounts):
+        assert AccountTenantEmailIndex.search_model(
+            sync_redis, ('tenant_1', '3@email')
+        ) == accounts[2]
+        assert AccountTenantEmailIndex.search_model(
+            sync_redis, ('tenant_0', '3@email')
+        ) is None
+        assert AccountGroupActiveIndex.get_members(sync_redis, (1, True)) \
+               == {'1', '2', '3'}
+        assert sorted(
+            account.account_id for account in
+            AccountGroupActiveIndex.search_models(sync_redis, (1, False))
+        ) == [4, 5]
+
+    def test_write(self, sync_redis, accounts):
+        account = AccountModel.search(sync_redis, 1)
+        account.active = False
+        account.email = None
+        account.save(sync_redis)
+        assert AccountGroupActiveIndex.get_members(sync_redis, (1, False)) \
+               == {'1', '4', '5'}
+        assert AccountTenantEmailIndex.search_model(
+            sync_redis, ('tenant_1', '1@email')
+        ) is None
+
+        accounts[1].delete(sync_redis)
+        assert AccountModel.delete_many(sync_redis, [3, 4]) == 2
+        assert AccountGroupActiveIndex.get_members(sync_redis, (1, True)) \
+               == set()
+        assert AccountGroupActiveIndex.get_members(sync_redis, (1, False)) \
+               == {'1', '5'}
+        assert sync_redis.hkeys(AccountTenantEmailIndex.redis_key()) \
+               == ['tenant_1:5@email']
@@ -1,17 +1,22 @@
-from datetime import date
+from datetime import date, datetime, timezone
+
+import pytest
 
 from tests.models.const import REDIS_MODEL_PREFIX
 from .models.redispy import (
     UserModel,
+    BirthDateUserModel,
     SingleIndexEmail,
     SingleIndexUsername,
     SetIndexGroupID,
     ListIndexQueue,
+    SortedSetIndexBirthDate,
     NoPrefixUserModel,
     NoPrefixSingleIndexUsername,
     NoPrefixSetIndexGroupID,
     NoPrefixListIndexQueue,
 )
+from .data import USERS
 
 BIRTH_DATE = date.fromisoformat('1999-09-09')
 
@@ -44,6 +49,17 @@ class TestHashIndex:
         assert SingleIndexEmail.search_model(sync_redis, 'not_exist@email') \
                is None
 
+    def test_search_model_script_flushed(self, sync_redis):
+        user = UserModel(user_id=1, username='username', email='test@email')
+        user.save(sync_redis)
+        sync_redis.script_flush()
+
+        result = SingleIndexUsername.search_model(sync_redis, user.username)
+        assert result.username == user.username
+        assert result.email == user.email
+        assert SingleIndexUsername.search_model(sync_redis, 'not_exist') \
+               is None
+
     def test_after_delete(self, sync_redis):
         user = UserModel(
             user_id=1, username='username', email='test@email'
@@ -167,6 +183,50 @@ class TestListIndex:
         assert len(ListIndexQueue.search_models(sync_redis, user.queue_id)) \
                == 0
 
+    def test_delete_members(self, sync_redis):
+        for data in USERS:
+            user = UserModel(**data, queue_id=data['group_id'])
+            user.save(sync_redis)
+        user.save(sync_redis)
+
+        assert ListIndexQueue.delete_members(sync_redis, 2) == 2
+        assert ListIndexQueue.get_members(sync_redis, 2) == []
+        assert SetIndexGroupID.get_members(sync_redis, 2) == set()
+        assert UserModel.count(sync_redis) == 3
+
+    def test_search_models_chunked(self, sync_redis):
+        for user_id in range(1, 11):
+            user = UserModel(
+                user_id=user_id, username=f'username_{user_id}', queue_id=3
+            )
+            user.save(sync_redis)
+        user.save(sync_redis)
+
+        result = ListIndexQueue.search_models(sync_redis, 3, chunk_size=3)
+        user_ids = [10, 10, 9, 8, 7, 6, 5, 4, 3, 2, 1]
+        assert [user.username for user in result] == [
+            f'username_{user_id}' for user_id in user_ids
+        ]
+
+    def test_pagination(self, sync_redis):
+        for user_id in range(1, 11):
+            UserModel(
+                user_id=user_id, username=f'username_{user_id}', queue_id=3
+            ).save(sync_redis)
+
+        assert list(ListIndexQueue.iter_members(sync_redis, 3, count=4)) \
+               == [str(user_id) for user_id in range(10, 0, -1)]
+        members, cursor = ListIndexQueue.page_members(sync_redis, 3, count=5)
+        assert members == ['10', '9', '8', '7', '6']
+        models, cursor = ListIndexQueue.page_models(
+            sync_redis, 3, cursor, count=5
+        )
+        assert [user.user_id for user in models] == [5, 4, 3, 2, 1]
+        assert ListIndexQueue.page_members(sync_redis, 3, cursor, 5) \
+               == ([], None)
+        with pytest.raises(ValueError):
+            ListIndexQueue.page_members(sync_redis, 4, cursor)
+
 
 class TestSetIndex:
 
@@ -207,3 +267,129 @@ class TestSetIndex:
 
     def test_not_found(self, sync_redis):
         assert len(SetIndexGroupID.search_models(sync_redis, 10)) == 0
+
+    def test_delete_members(self, sync_redis):
+        for data in USERS:
+            UserModel(**data).save(sync_redis)
+
+        assert SetIndexGroupID.delete_members(sync_redis, 1) == 3
+        assert not sync_redis.exists(
+            SetIndexGroupID.redis_key_from_value(1)
+        )
+        assert SingleIndexUsername.search_model(sync_redis, 'first_user') \
+               is None
+        assert UserModel.count(sync_redis) == 2
+        assert len(SetIndexGroupID.search_models(sync_redis, 2)) == 2
+
+    def test_search_models_chunked(self, sync_redis):
+        for user_id in range(1, 41):
+            user = UserModel(
+                user_id=user_id, username=f'username_{user_id}', group_id=10
+            )
+            user.save(sync_redis)
+
+        result = SetIndexGroupID.search_models(sync_redis, 10, chunk_size=7)
+        assert len(result) == 40
+        assert {user.username for user in result} == {
+            f'username_{user_id}' for user_id in range(1, 41)
+        }
+
+    def test_pagination(self, sync_redis):
+        users = [
+            UserModel(
+                user_id=user_id, username=f'username_{user_id}', group_id=10
+            )
+            for user_id in range(1, 201)
+        ]
+        UserModel.save_many(sync_redis, users)
+
+        members = list(SetIndexGroupID.iter_members(sync_redis, 10, count=7))
+        assert set(members) == {str(user.user_id) for user in users}
+
+        models, cursor = [], None
+        while True:
+            page, cursor = SetIndexGroupID.page_models(
+                sync_redis, 10, cursor, count=50, only=['username']
+            )
+            models.extend(page)
+            if cursor is None:
+                break
+            assert isinstance(cursor, str)
+        assert {user.user_id for user in models} \
+               == {user.user_id for user in users}
+        with pytest.raises(ValueError):
+            SetIndexGroupID.page_members(sync_redis, 10, 'invalid')
+
+
+class TestSortedSetIndex:
+    @staticmethod
+    def save_users(redis) -> list:
+        users = [
+            BirthDateUserModel(**data, birth_date=date(1990 + number, 1, 1))
+            for number, data in enumerate(USERS)
+        ]
+        BirthDateUserModel.save_many(redis, users)
+        return users
+
+    def test_score(self):
+        assert SortedSetIndexBirthDate.score(date(1970, 1, 2)) == 86400
+        assert SortedSetIndexBirthDate.score(datetime(1970, 1, 2)) == 86400
+        assert SortedSetIndexBirthDate.score(
+            datetime(1970, 1, 2, tzinfo=timezone.utc)
+        ) == 86400
+        assert SortedSetIndexBirthDate.score(10) == 10.0
+
+    def test_range_models(self, sync_redis):
+        users = self.save_users(sync_redis)
+
+        assert SortedSetIndexBirthDate.range_models(sync_redis) == users
+        assert SortedSetIndexBirthDate.range_models(
+            sync_redis, date(1991, 1, 1), date(1993, 1, 1)
+        ) == users[1:4]
+        assert SortedSetIndexBirthDate.range_models(
+            sync_redis, min=date(1991, 1, 1), offset=1, limit=2,
+            reverse=True
+        ) == [users[3], users[2]]
+        assert SortedSetIndexBirthDate.range_members(
+            sync_redis, max=datetime(1991, 6, 1)
+        ) == ['1', '2']
+        assert SortedSetIndexBirthDate.count_range(
+            sync_redis, date(1991, 1, 1)
+        ) == 4
+        assert SortedSetIndexBirthDate.count_range(sync_redis) == 5
+
+        result = SortedSetIndexBirthDate.range_models(
+            sync_redis, limit=1, only=['username']
+        )
+        assert result[0].username == users[0].username
+        assert result[0]._deferred_fields() == [
+            'email', 'group_id', 'queue_id', 'boolean'
+        ]
+
+    def test_exclusive_bound(self, sync_redis):
+        self.save_users(sync_redis)
+        score = SortedSetIndexBirthDate.score(date(1991, 1, 1))
+        assert SortedSetIndexBirthDate.range_members(
+            sync_redis, f'({score}', f'({score + 1}'
+        ) == []
+        assert SortedSetIndexBirthDate.count_range(
+            sync_redis, f'({score}'
+        ) == 3
+
+    def test_save_and_delete(self, sync_redis):
+        users = self.save_users(sync_redis)
+
+        user = BirthDateUserModel.search(sync_redis, 1)
+        user.birth_date = date(2000, 1, 1)
+        user.save(sync_redis)
+        assert SortedSetIndexBirthDate.range_members(
+            sync_redis, reverse=True, limit=1
+        ) == ['1']
+
+        user.birth_date = None
+        user.save(sync_redis)
+        assert SortedSetIndexBirthDate.count_range(sync_redis) == 4
+
+        users[1].delete(sync_redis)
+        BirthDateUserModel.delete_many(sync_redis, [3, 4])
+        assert SortedSetIndexBirthDate.range_models(sync_redis) == [users[4]]
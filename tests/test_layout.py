@@ -0,0 +1,184 @@
+from datetime import date
+
+import pytest
+
+from RSO.cache import ModelCache
+from RSO.codec import RAW
+from RSO.layout import (
+    HASH_LAYOUT, BucketLayout, HashLayout, MsgpackLayout, StructLayout
+)
+from tests.models.const import REDIS_MODEL_PREFIX
+from .models.redispy import (
+    UserModel,
+    RecordModel,
+    ListIndexQueue,
+    SetIndexGroupID,
+    SingleIndexEmail,
+    SingleIndexUsername,
+)
+
+
+def bucket_layout() -> BucketLayout:
+    return BucketLayout(MsgpackLayout(), bucket_size=2)
+
+
+@pytest.fixture(params=[MsgpackLayout, StructLayout, bucket_layout])
+def layout(request, monkeypatch) -> HashLayout:
+    layout = request.param()
+    monkeypatch.setattr(UserModel, '__layout__', layout)
+    monkeypatch.setattr(RecordModel, '__layout__', layout)
+    return layout
+
+
+class TestPackedLayout:
+    def test_round_trip(self, sync_redis, layout):
+        record = RecordModel(
+            record_id=1, name='náme', ratio=0.5, active=True,
+            day=date(2000, 2, 20), data=b'\x00\xff'
+        )
+        record.save(sync_redis)
+        assert sync_redis.type(layout.storage_key(RecordModel, 1)) \
+               == ('hash' if layout.bucketed else 'string')
+        assert record.is_exists(sync_redis)
+
+        result = RecordModel.search(sync_redis, 1)
+        assert result == record
+        assert RecordModel.search(sync_redis, 2) is None
+        assert RecordModel.search(sync_redis, 1, mode=RAW)['name'] == 'náme'
+
+    def test_update(self, sync_redis, layout):
+        RecordModel(record_id=1, name='name', note='note').save(sync_redis)
+        record = RecordModel.search(sync_redis, 1, only=['name'])
+        record.note = None
+        record.save(sync_redis)
+        assert RecordModel.search(sync_redis, 1) == RecordModel(
+            record_id=1, name='name'
+        )
+
+    def test_model_and_indexes(self, sync_redis, layout):
+        for user_id in range(1, 4):
+            UserModel(
+                user_id=user_id, username=f'username_{user_id}',
+                email=f'{user_id}@email', group_id=1, queue_id=2
+            ).save(sync_redis)
+
+        assert len(UserModel.all(sync_redis)) == 3
+        assert [
+            user.user_id for user in UserModel.get_many(sync_redis, [3, 1])
+        ] == [3, 1]
+        assert SingleIndexEmail.search_model(sync_redis, '2@email') \
+               .username == 'username_2'
+        assert len(SetIndexGroupID.search_models(sync_redis, 1)) == 3
+        assert len(ListIndexQueue.search_models(sync_redis, 2)) == 3
+
+        user = UserModel.search(sync_redis, 1)
+        user.username = 'new_username'
+        user.save(sync_redis)
+        assert SingleIndexUsername.search_model(
+            sync_redis, 'username_1'
+        ) is None
+        assert SingleIndexUsername.search_model(
+            sync_redis, 'new_username'
+        ).user_id == 1
+
+        user.delete(sync_redis)
+        assert UserModel.delete_many(sync_redis, [2]) == 1
+        assert SingleIndexEmail.search_model(sync_redis, '2@email') is None
+        assert [user.user_id for user in UserModel.all(sync_redis)] == [3]
+        assert SetIndexGroupID.get_members(sync_redis, 1) == {'3'}
+
+
+class TestBucketLayout:
+    @pytest.fixture
+    def records(self, sync_redis, monkeypatch) -> list:
+        monkeypatch.setattr(
+            RecordModel, '__layout__', BucketLayout(bucket_size=2)
+        )
+        records = [
+            RecordModel(record_id=record_id, name=f'name_{record_id}')
+            for record_id in range(5)
+        ]
+        RecordModel.save_many(sync_redis, records)
+        return records
+
+    def test_buckets(self, sync_redis, records):
+        bucket_key = RecordModel.redis_key_from_value(':bucket:1')
+        assert sorted(sync_redis.keys(f'{REDIS_MODEL_PREFIX}::record*')) == [
+            RecordModel.redis_key_from_value(f':bucket:{bucket}')
+            for bucket in range(3)
+        ]
+        assert sync_redis.hkeys(bucket_key) == ['2', '3']
+        assert sync_redis.object('encoding', bucket_key) \
+               in ('ziplist', 'listpack')
+
+    def test_read_write(self, sync_redis, records):
+        assert RecordModel.count(sync_redis) == 5
+        assert sorted(
+            record.record_id for record in RecordModel.all(sync_redis)
+        ) == list(range(5))
+        assert RecordModel.get_many(sync_redis, [4, 5, 0]) == [
+            records[4], None, records[0]
+        ]
+
+        record = RecordModel.search(sync_redis, 3)
+        record.note = 'note'
+        record.save(sync_redis)
+        assert RecordModel.search(sync_redis, 3).note == 'note'
+        assert RecordModel.search(sync_redis, 2) == records[2]
+
+        record.delete(sync_redis)
+        assert not record.is_exists(sync_redis)
+        assert RecordModel.delete_many(sync_redis, [0, 1, 2, 3]) == 3
+        assert RecordModel.count(sync_redis) == 1
+
+    def test_integer_key(self, sync_redis, records):
+        with pytest.raises(ValueError):
+            RecordModel.search(sync_redis, 'name')
+
+    def test_cache(self, sync_redis, records, monkeypatch):
+        cache = ModelCache()
+        monkeypatch.setattr(RecordModel, '__cache__', cache)
+        RecordModel.search(sync_redis, 2)
+        RecordModel.search(sync_redis, 4)
+        # written bucket, e.g. invalidated by `TrackingCache`
+        cache.invalidate([RecordModel.redis_key_from_value(':bucket:1')])
+        assert len(cache) == 1
+        cache.invalidate([RecordModel.redis_key_from_value(4)])
+        assert len(cache) == 0
+
+    def test_migrate_layout(self, sync_redis, monkeypatch):
+        for user_id in range(1, 4):
+            UserModel(
+                user_id=user_id, username=f'username_{user_id}',
+                email=f'{user_id}@email', group_id=1
+            ).save(sync_redis)
+
+        layout = BucketLayout(bucket_size=10)
+        monkeypatch.setattr(UserModel, '__layout__', layout)
+        assert UserModel.migrate_layout(sync_redis, HASH_LAYOUT) == 3
+        assert UserModel.migrate_layout(sync_redis, HASH_LAYOUT) == 0
+        assert sync_redis.exists(UserModel.redis_key_from_value(1)) == 0
+        assert sync_redis.hlen(layout.storage_key(UserModel, 1)) == 3
+        assert SingleIndexEmail.search_model(sync_redis, '2@email') \
+               .username == 'username_2'
+
+        monkeypatch.setattr(UserModel, '__layout__', HASH_LAYOUT)
+        assert UserModel.migrate_layout(sync_redis, layout) == 3
+        assert sync_redis.hget(
+            UserModel.redis_key_from_value(3), 'username'
+        ) == 'username_3'
+
+
+class TestStructLayout:
+    def test_added_field(self):
+        layout = StructLayout()
+        value = layout.dumps(RecordModel, {'record_id': 1, 'name': 'name'})
+        # value of older model version, without the last fields
+        value = value[:1] + layout.HEADER.pack(2) + value[3:]
+        assert layout.loads(RecordModel, value) == {
+            'record_id': 1, 'name': 'name'
+        }
+
+    def test_not_struct_value(self):
+        with pytest.raises(ValueError):
+            StructLayout().loads(RecordModel, b'\x81\xa1a\x01')
@@ -1,16 +1,37 @@
-from datetime import date
+from datetime import date, datetime
+
+import pytest
 
 from tests.models.const import REDIS_MODEL_PREFIX
+from .models.base import Status
 from .models.redispy import (
     UserModel,
     SingleIndexUsername,
     SingleIndexEmail,
     SetIndexGroupID,
-    NoPrefixUserModel
+    ListIndexQueue,
+    NoPrefixUserModel,
+    RegistryUserModel,
+    TaskModel,
+    SetIndexStatus,
+    SetIndexDue,
+    ListIndexUrgent,
 )
 from .data import USERS
 
 
+def save_tasks(redis) -> list:
+    tasks = [
+        TaskModel(
+            task_id=task_id, status=list(Status)[task_id % 2],
+            due=datetime(2020, 1, task_id, 10), urgent=task_id > 2
+        )
+        for task_id in range(1, 5)
+    ]
+    TaskModel.save_many(redis, tasks)
+    return tasks
+
+
 class TestModelCreate:
     def test_redis_key(self):
         # With prefix
@@ -97,6 +118,180 @@ class TestModelGet:
         assert len(users) == len(USERS)
         assert isinstance(users[0], UserModel)
 
+    def test_iter_all(self, sync_redis):
+        assert list(UserModel.iter_all(sync_redis)) == []
+
+        for data in USERS:
+            user = UserModel(**data)
+            user.save(sync_redis)
+
+        users = list(UserModel.iter_all(sync_redis, count=2))
+        assert all(isinstance(user, UserModel) for user in users)
+        assert {user.username for user in users} == {
+            data['username'] for data in USERS
+        }
+
+    def test_get_many(self, sync_redis):
+        for data in USERS:
+            user = UserModel(**data)
+            user.save(sync_redis)
+
+        users = UserModel.get_many(sync_redis, [3, 100, 1, 2], chunk_size=2)
+        assert len(users) == 4
+        assert users[0].username == 'third_user'
+        assert users[1] is None
+        assert users[2].username == 'first_user'
+        assert users[3].username == 'second_user'
+
+        assert UserModel.get_many(sync_redis, []) == []
+
+
+class TestModelSaveMany:
+    def test_success(self, sync_redis):
+        users = [UserModel(**data) for data in USERS]
+        assert UserModel.save_many(sync_redis, users, chunk_size=2) == []
+
+        assert UserModel.count(sync_redis) == len(USERS)
+        assert SingleIndexUsername.search_model(sync_redis, 'fifth_user') \
+               is not None
+        assert len(SetIndexGroupID.search_models(sync_redis, 1)) == 3
+
+    def test_chunk_failure(self, sync_redis):
+        users = [UserModel(**data) for data in USERS]
+        sync_redis.set(users[2].redis_key, 'not a hash')
+
+        failures = UserModel.save_many(sync_redis, users, chunk_size=2)
+        assert len(failures) == 1
+        chunk, error = failures[0]
+        assert chunk == users[2:4]
+        assert isinstance(error, Exception)
+        assert UserModel.search(sync_redis, 5) is not None
+
+    def test_retry_failed_chunk(self, sync_redis):
+        UserModel.save_many(sync_redis, [UserModel(**data) for data in USERS])
+        users = UserModel.get_many(sync_redis, [1, 2, 3, 4])
+        for user in users:
+            user.email = f'{user.username}@new'
+            user.group_id = 3 if user.user_id < 3 else 4
+            user.queue_id = 5
+        group_key = SetIndexGroupID.redis_key_from_value(4)
+        sync_redis.set(group_key, 'not a set')
+
+        failures = UserModel.save_many(sync_redis, users, chunk_size=2)
+        assert [chunk for chunk, _ in failures] == [users[2:]]
+
+        sync_redis.delete(group_key)
+        assert UserModel.save_many(sync_redis, users, chunk_size=2) == []
+        assert UserModel.get_many(sync_redis, [1, 2, 3, 4]) == users
+        assert SingleIndexEmail.search_model(sync_redis, 'fourth_user@new') \
+               == users[3]
+        assert SingleIndexEmail.search_model(
+            sync_redis, 'third_user@contoh.com'
+        ) is None
+        assert SetIndexGroupID.get_members(sync_redis, 1) == set()
+        assert SetIndexGroupID.get_members(sync_redis, 2) == {'5'}
+        assert SetIndexGroupID.get_members(sync_redis, 4) == {'3', '4'}
+        # every save pushes list index member, the retry pushes it again
+        assert ListIndexQueue.get_members(sync_redis, 5) \
+               == ['4', '3', '2', '1'] * 2
+
+
+class TestModelUpdate:
+    def test_changed_fields_only(self, sync_redis):
+        UserModel(
+            user_id=1, username='username', email='old@email', group_id=1
+        ).save(sync_redis)
+
+        user = UserModel.search(sync_redis, 1)
+        user.email = 'new@email'
+        user.group_id = 2
+        user.save(sync_redis)
+
+        assert SingleIndexEmail.search_model(sync_redis, 'old@email') is None
+        assert SingleIndexEmail.search_model(sync_redis, 'new@email') \
+               is not None
+        assert SetIndexGroupID.get_members(sync_redis, 1) == set()
+        assert SetIndexGroupID.get_members(sync_redis, 2) == {'1'}
+        assert SingleIndexUsername.search_model(sync_redis, 'username') \
+               is not None
+
+    def test_removed_field(self, sync_redis):
+        UserModel(user_id=1, username='username', group_id=1).save(sync_redis)
+
+        user = UserModel.search(sync_redis, 1)
+        user.group_id = None
+        user.save(sync_redis)
+
+        assert not sync_redis.hexists(user.redis_key, 'group_id')
+        assert SetIndexGroupID.get_members(sync_redis, 1) == set()
+        assert UserModel.search(sync_redis, 1).group_id is None
+
+    def test_save_new_then_change(self, sync_redis):
+        user = UserModel(
+            user_id=1, username='username', email='old@email', group_id=1
+        )
+        user.save(sync_redis)
+        user.email = 'new@email'
+        user.group_id = 2
+        user.save(sync_redis)
+
+        assert SetIndexGroupID.get_members(sync_redis, 1) == set()
+        assert SetIndexGroupID.get_members(sync_redis, 2) == {'1'}
+        assert sync_redis.hkeys(SingleIndexEmail.redis_key()) \
+               == ['new@email']
+
+        user.email = None
+        user.save(sync_redis)
+        assert not sync_redis.hexists(user.redis_key, 'email')
+        assert sync_redis.hkeys(SingleIndexEmail.redis_key()) == []
+
+
+class TestModelRegistry:
+    def test_all_and_count(self, sync_redis):
+        assert RegistryUserModel.count(sync_redis) == 0
+        assert RegistryUserModel.all(sync_redis) == []
+
+        for data in USERS:
+            RegistryUserModel(**data).save(sync_redis)
+        # not registered model
+        UserModel(**USERS[0]).save(sync_redis)
+
+        assert RegistryUserModel.count(sync_redis) == len(USERS)
+        users = RegistryUserModel.all(sync_redis)
+        assert [user.username for user in users] == [
+            data['username'] for data in USERS
+        ]
+        users = list(RegistryUserModel.iter_all(sync_redis, count=2))
+        assert len(users) == len(USERS)
+
+        users = RegistryUserModel.page(sync_redis, offset=1, limit=2)
+        assert [user.username for user in users] == [
+            'second_user', 'third_user'
+        ]
+        users = RegistryUserModel.random(sync_redis, 2)
+        assert len(users) == 2
+
+        users[0].delete(sync_redis)
+        assert RegistryUserModel.count(sync_redis) == len(USERS) - 1
+
+    def test_without_registry(self, sync_redis):
+        for data in USERS:
+            UserModel(**data).save(sync_redis)
+
+        assert UserModel.count(sync_redis) == len(USERS)
+        with pytest.raises(RuntimeError):
+            UserModel.page(sync_redis)
+
+    def test_build_registry(self, sync_redis):
+        for data in USERS:
+            user = RegistryUserModel(**data)
+            user.save(sync_redis)
+        sync_redis.delete(RegistryUserModel.registry_key())
+        assert RegistryUserModel.count(sync_redis) == 0
+
+        assert RegistryUserModel.build_registry(sync_redis) == len(USERS)
+        assert RegistryUserModel.count(sync_redis) == len(USERS)
+
 
 class TestModelDelete:
     def test_success(self, sync_redis):
@@ -115,3 +310,42 @@ class TestModelDelete:
         assert user.delete(sync_redis) is None
         assert bool(sync_redis.exists(redis_key)) is False
         assert sync_redis.keys('*') == []
+
+    def test_delete_many(self, sync_redis):
+        for data in USERS:
+            UserModel(**data, queue_id=data['group_id']).save(sync_redis)
+
+        deleted = UserModel.delete_many(
+            sync_redis, [1, UserModel(**USERS[1], queue_id=1), 100],
+            chunk_size=2
+        )
+        assert deleted == 2
+        assert UserModel.search(sync_redis, 1) is None
+        assert UserModel.search(sync_redis, 2) is None
+        assert SingleIndexUsername.search_model(sync_redis, 'first_user') \
+               is None
+        assert SingleIndexEmail.search_model(
+            sync_redis, 'second_user@contoh.com'
+        ) is None
+        assert SetIndexGroupID.get_members(sync_redis, 1) == {'3'}
+        assert ListIndexQueue.get_members(sync_redis, 1) == ['3']
+
+        assert UserModel.delete_many(sync_redis, [3, 4, 5]) == 3
+        assert sync_redis.keys('*') == []
+
+    def test_delete_many_decoded_index(self, sync_redis):
+        tasks = save_tasks(sync_redis)
+        assert SetIndexDue.redis_key(tasks[0]).endswith(
+            ':2020-01-01 10:00:00'
+        )
+
+        assert TaskModel.delete_many(sync_redis, [1, 2]) == 2
+        assert SetIndexStatus.get_members(sync_redis, Status.ACTIVE) == {'4'}
+        assert SetIndexDue.get_members(
+            sync_redis, datetime(2020, 1, 1, 10)
+        ) == set()
+        assert ListIndexUrgent.get_members(sync_redis, False) == []
+
+        assert SetIndexStatus.delete_members(sync_redis, Status.DONE) == 1
+        assert ListIndexUrgent.delete_members(sync_redis, True) == 1
+        assert sync_redis.keys('*') == []
@@ -0,0 +1,139 @@
+from datetime import date
+
+import pytest
+
+from RSO.cache import ModelCache
+from RSO.codec import DEFERRED, RAW, ROW
+from RSO.lazy import LazyModel
+from .models.redispy import (
+    ProfileModel,
+    ProfileCityIndex,
+    ProfileEmailIndex,
+)
+
+
+@pytest.fixture
+def profile(sync_redis) -> ProfileModel:
+    profile = ProfileModel(
+        profile_id=1, name='name', email='test@email', city='city',
+        bio='bio' * 100, birth_date=date(2000, 2, 20)
+    )
+    profile.save(sync_redis)
+    return profile
+
+
+class TestProjection:
+    def test_only(self, sync_redis, profile):
+        result = ProfileModel.search(sync_redis, 1, only=['name'])
+        assert (result.profile_id, result.name) == (1, 'name')
+        # index fields are always loaded
+        assert (result.email, result.city) == ('test@email', 'city')
+        assert result.bio is DEFERRED
+        assert result.birth_date is DEFERRED
+        assert result._deferred_fields() == ['bio', 'birth_date']
+
+    def test_defer(self, sync_redis, profile):
+        result = ProfileModel.search(sync_redis, 1, defer=['bio'])
+        assert result.bio is DEFERRED
+        assert result.birth_date == date(2000, 2, 20)
+
+        assert ProfileModel.search(sync_redis, 1, defer=[]) == profile
+
+    def test_unknown_field(self, sync_redis):
+        with pytest.raises(ValueError):
+            ProfileModel.search(sync_redis, 1, only=['unknown'])
+
+    def test_modes(self, sync_redis, profile):
+        row = ProfileModel.search(sync_redis, 1, mode=ROW, only=['name'])
+        assert row._fields == ('profile_id', 'name', 'email', 'city')
+        raw = ProfileModel.search(sync_redis, 1, mode=RAW, only=['name'])
+        assert raw == {
+            'profile_id': '1', 'name': 'name', 'email': 'test@email',
+            'city': 'city',
+        }
+
+    def test_save(self, sync_redis, profile):
+        result = ProfileModel.search(sync_redis, 1, only=['name'])
+        result.name = 'new_name'
+        result.save(sync_redis)
+        assert sync_redis.hgetall(profile.redis_key) == dict(
+            profile.to_redis(), profile_id='1', name='new_name'
+        )
+
+        result.bio = 'new_bio'
+        result.save(sync_redis)
+        assert sync_redis.hget(profile.redis_key, 'bio') == 'new_bio'
+
+    def test_save_deferred_none(self, sync_redis, profile):
+        result = ProfileModel.search(sync_redis, 1, only=['name'])
+        assert result._diff_snapshot() == ({}, [], [])
+        result.bio = None
+        assert result._diff_snapshot() == ({}, ['bio'], [])
+        result.save(sync_redis)
+        assert not sync_redis.hexists(profile.redis_key, 'bio')
+        assert sync_redis.hget(profile.redis_key, 'name') == 'name'
+
+    def test_load_deferred(self, sync_redis, profile):
+        result = ProfileModel.search(sync_redis, 1, only=['name'])
+        result.load_deferred(sync_redis)
+        assert result == profile
+        assert result._diff_snapshot() == ({}, [], [])
+
+    def test_many(self, sync_redis):
+        for profile_id in range(1, 4):
+            ProfileModel(
+                profile_id=profile_id, name=f'name_{profile_id}',
+                city='city', bio='bio'
+            ).save(sync_redis)
+
+        for result in (
+            ProfileModel.get_many(sync_redis, [1, 2, 3], only=['name']),
+            ProfileModel.all(sync_redis, defer=['bio']),
+            ProfileCityIndex.search_models(
+                sync_redis, 'city', defer=['bio']
+            ),
+        ):
+            assert len(result) == 3
+            assert all(profile.bio is DEFERRED for profile in result)
+
+    def test_search_model(self, sync_redis, profile):
+        result = ProfileEmailIndex.search_model(
+            sync_redis, 'test@email', only=['name']
+        )
+        assert result.name == 'name'
+        assert result.bio is DEFERRED
+
+    def test_cache(self, sync_redis, profile, monkeypatch):
+        cache = ModelCache()
+        monkeypatch.setattr(ProfileModel, '__cache__', cache)
+
+        ProfileModel.search(sync_redis, 1, only=['name'])
+        assert len(cache) == 0
+
+        ProfileModel.search(sync_redis, 1)
+        result = ProfileModel.search(sync_redis, 1, only=['name'])
+        assert cache.hits == 1
+        assert result.bio is DEFERRED
+
+
+class TestLazyModel:
+    def test_load_on_access(self, sync_redis, profile):
+        result = LazyModel(
+            sync_redis, ProfileModel.search(sync_redis, 1, only=['name'])
+        )
+        assert isinstance(result, ProfileModel)
+        assert result.name == 'name'
+
+        sync_redis.hset(profile.redis_key, 'city', 'other_city')
+        assert result.bio == profile.bio
+        # index fields are not reloaded
+        assert result.city == 'city'
+        assert result == profile
+
+    def test_save(self, sync_redis, profile):
+        result = LazyModel(
+            sync_redis, ProfileModel.search(sync_redis, 1, only=['name'])
+        )
+        result.name = 'new_name'
+        result.save(sync_redis)
+        assert ProfileModel.search(sync_redis, 1).name == 'new_name'
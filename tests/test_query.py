@@ -0,0 +1,126 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import pytest
+
+from RSO.index import HashIndex, SetIndex
+from RSO.model import Model
+from RSO.query import Match, Query
+from RSO.schema import QUERY_KEY, ParsedKey, parse_key
+from tests.models.const import REDIS_MODEL_PREFIX
+
+
+@dataclass
+class PlayerModel(Model):
+    __prefix__ = REDIS_MODEL_PREFIX
+    __model_name__ = 'player'
+    __key__ = 'player_id'
+
+    player_id: int
+    name: str
+    team_id: Optional[int] = None
+    level: Optional[int] = None
+
+
+class PlayerNameIndex(HashIndex):
+    __prefix__ = REDIS_MODEL_PREFIX
+    __model__ = PlayerModel
+    __key__ = 'name'
+
+
+class PlayerTeamIndex(SetIndex):
+    __prefix__ = REDIS_MODEL_PREFIX
+    __model__ = PlayerModel
+    __key__ = 'team_id'
+
+
+class PlayerLevelIndex(SetIndex):
+    __prefix__ = REDIS_MODEL_PREFIX
+    __model__ = PlayerModel
+    __key__ = 'level'
+
+
+PlayerModel.__indexes__ = [PlayerNameIndex, PlayerTeamIndex, PlayerLevelIndex]
+
+
+def team(team_id: int) -> Match:
+    return Match(PlayerTeamIndex, team_id)
+
+
+def level(level_id: int) -> Match:
+    return Match(PlayerLevelIndex, level_id)
+
+
+@pytest.fixture
+def players(sync_redis) -> list:
+    # players 1-12, teams 1-3, levels 1-2
+    players = [
+        PlayerModel(
+            player_id=player_id, name=f'player_{player_id}',
+            team_id=player_id % 3 + 1, level=player_id % 2 + 1
+        )
+        for player_id in range(1, 13)
+    ]
+    PlayerModel.save_many(sync_redis, players)
+    return players
+
+
+def ids(values) -> list:
+    return sorted(map(int, values))
+
+
+def query_keys(redis) -> list:
+    return redis.keys(f'{REDIS_MODEL_PREFIX}::player::query:*')
+
+
+class TestQuery:
+    def test_operations(self, sync_redis, players):
+        assert ids(Query(team(1)).ids(sync_redis)) == [3, 6, 9, 12]
+        assert ids(Query(team(1) & level(1)).ids(sync_redis)) == [6, 12]
+        assert ids(Query(team(1) | team(2)).ids(sync_redis)) \
+               == [1, 3, 4, 6, 7, 9, 10, 12]
+        assert ids(Query(team(1) - level(1)).ids(sync_redis)) == [3, 9]
+        assert ids(Query(
+            (team(1) | team(2)) & level(2) & ~team(2)
+        ).ids(sync_redis)) == [3, 9]
+        assert Query(team(1) & team(2)).count(sync_redis) == 0
+        # temporary keys are deleted
+        assert query_keys(sync_redis) == []
+
+    def test_page(self, sync_redis, players):
+        query = Query(level(1) | level(2))
+        assert query.ids(sync_redis, limit=3) == ['1', '2', '3']
+        assert [
+            player.player_id
+            for player in query.models(sync_redis, offset=8, limit=10)
+        ] == [9, 10, 11, 12]
+        assert query.models(sync_redis, offset=9) == players[9:]
+        assert query.count(sync_redis) == 12
+        assert query_keys(sync_redis) == []
+
+    def test_ttl(self, sync_redis, players):
+        query = Query(team(1) & level(1), ttl=60)
+        assert query.count(sync_redis) == 2
+        assert query_keys(sync_redis) == [query.redis_key]
+        assert 0 < sync_redis.ttl(query.redis_key) <= 60
+        assert parse_key(query.redis_key, [PlayerModel]) == ParsedKey(
+            QUERY_KEY, PlayerModel, None, query.redis_key.rsplit(':', 1)[1]
+        )
+
+        players[5].delete(sync_redis)
+        # kept result
+        assert ids(query.ids(sync_redis)) == [6, 12]
+        assert query.models(sync_redis) == [players[11]]
+
+        query.clear(sync_redis)
+        assert query.ids(sync_redis) == ['12']
+
+    def test_invalid(self, sync_redis):
+        with pytest.raises(ValueError):
+            Query(~team(1))
+        with pytest.raises(ValueError):
+            Query(team(1) | ~team(2))
+        with pytest.raises(ValueError):
+            Query(~team(1) & ~team(2))
+        with pytest.raises(TypeError):
+            Match(PlayerNameIndex, 'player_1')
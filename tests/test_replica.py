@@ -0,0 +1,117 @@
+import time
+
+import pytest
+from redis import Redis
+
+from RSO.replica import LatencyWindow, ReplicaRouter
+from tests.conftest import REDIS_DB, REDIS_PASS
+from .models.redispy import (
+    UserModel,
+    RegistryUserModel,
+    SetIndexGroupID,
+    SingleIndexEmail,
+)
+from .data import USERS
+
+
+class RecordingRedis(Redis):
+    """Client of the test server recording its commands"""
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__(
+            db=REDIS_DB, password=REDIS_PASS, decode_responses=True
+        )
+        self.delay = delay
+        self.commands = []
+
+    def execute_command(self, *args, **options):
+        time.sleep(self.delay)
+        self.commands.append(args[0])
+        return super().execute_command(*args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        self.commands.append('PIPELINE')
+        return super().pipeline(transaction, shard_hint)
+
+
+@pytest.fixture
+def router(sync_redis) -> ReplicaRouter:
+    return ReplicaRouter(
+        RecordingRedis(), [RecordingRedis(), RecordingRedis()]
+    )
+
+
+class TestReplicaRouter:
+    def test_routing(self, router):
+        primary, replica_1, replica_2 = router.primary, *router.replicas
+        users = [UserModel(**data) for data in USERS]
+        UserModel.save_many(router, users)
+        assert primary.commands == ['PIPELINE']
+
+        assert UserModel.search(router, 1) == users[0]
+        assert UserModel.get_many(router, [2, 3]) == users[1:3]
+        assert replica_1.commands == ['HMGET']
+        assert replica_2.commands == ['PIPELINE']
+
+        assert SingleIndexEmail.search_model(router, users[1].email) \
+               == users[1]
+        assert SetIndexGroupID.get_members(router, 1) == {'1', '2', '3'}
+        assert sorted(
+            UserModel.all(router), key=lambda user: user.user_id
+        ) == users
+        assert UserModel.count(router) == len(users)
+        assert primary.commands == ['PIPELINE']
+
+        users[0].delete(router)
+        assert primary.commands == ['PIPELINE', 'PIPELINE']
+
+    def test_registry(self, router):
+        users = [RegistryUserModel(**data) for data in USERS]
+        RegistryUserModel.save_many(router, users)
+        assert RegistryUserModel.all(router) == users
+        assert RegistryUserModel.count(router) == len(users)
+        assert RegistryUserModel.page(router, 1, 2) == users[1:3]
+        assert router.primary.commands == ['PIPELINE']
+
+    def test_pin(self, router):
+        router.pin_seconds = 60
+        UserModel(**USERS[0]).save(router)
+        assert router.is_pinned()
+        assert UserModel.search(router, 1) is not None
+        assert router.primary.commands == ['PIPELINE', 'HMGET']
+        assert router.replicas[0].commands == []
+
+        router._pinned_until.set(0.0)
+        assert UserModel.search(router, 1) is not None
+        assert router.primary.commands == ['PIPELINE', 'HMGET']
+
+    def test_hedge(self, sync_redis):
+        router = ReplicaRouter(
+            RecordingRedis(), [RecordingRedis(delay=0.5), RecordingRedis()],
+            hedge=LatencyWindow(initial=0.02)
+        )
+        sync_redis.set('key', 'value')
+        start = time.perf_counter()
+        assert router.get('key') == 'value'
+        assert time.perf_counter() - start < 0.3
+        assert router.replicas[1].commands == ['GET']
+
+    def test_latency_window(self):
+        window = LatencyWindow(min_samples=10, initial=1.0)
+        for number in range(9):
+            window.add(number / 100)
+        assert window.deadline() == 1.0
+        for number in range(9, 100):
+            window.add(number / 100)
+        assert window.deadline() == 0.94
+
+    def test_replicas(self, sync_redis, sync_replicas):
+        router = ReplicaRouter(sync_redis, sync_replicas)
+        users = [UserModel(**data) for data in USERS]
+        UserModel.save_many(router, users)
+        sync_redis.wait(len(sync_replicas), 1000)
+        for _ in sync_replicas:
+            assert UserModel.search(router, 1) == users[0]
+            assert SingleIndexEmail.search_model(
+                router, users[1].email
+            ) == users[1]
@@ -0,0 +1,76 @@
+from RSO.layout import BucketLayout
+from RSO.schema import (
+    BUCKET_KEY,
+    INDEX_KEY,
+    MODEL_KEY,
+    REGISTRY_KEY,
+    ParsedKey,
+    key_schema,
+    parse_key,
+)
+from tests.models.const import REDIS_MODEL_PREFIX
+from tests.test_alias import MemberGroupIndex, MemberModel
+from .models.redispy import (
+    NoPrefixSetIndexGroupID,
+    NoPrefixUserModel,
+    SetIndexGroupID,
+    SingleIndexEmail,
+    UserModel,
+)
+
+
+class TestKeySchema:
+    def test_keys(self):
+        schema = key_schema(UserModel)
+        assert schema is key_schema(UserModel)
+        assert schema.key(1) == f'{REDIS_MODEL_PREFIX}::user:1'
+        assert schema.keys([1, 2]) == [
+            UserModel.redis_key_from_value(1),
+            UserModel.redis_key_from_value(2),
+        ]
+        assert schema.registry_key == UserModel.registry_key()
+        assert key_schema(NoPrefixUserModel).key(1) == 'user:1'
+        assert key_schema(MemberModel).key(1000) \
+               == f'{REDIS_MODEL_PREFIX}::m:G8'
+
+        assert key_schema(SingleIndexEmail).base \
+               == f'{REDIS_MODEL_PREFIX}::user::index::email'
+        assert key_schema(SetIndexGroupID).key(1) \
+               == f'{REDIS_MODEL_PREFIX}::user::index::group_id:1'
+        assert key_schema(NoPrefixSetIndexGroupID).key(1) \
+               == 'user::index::group_id:1'
+
+    def test_subclass(self):
+        class OtherModel(UserModel):
+            __model_name__ = 'other'
+
+        key_schema(UserModel)
+        assert key_schema(OtherModel).prefix == f'{REDIS_MODEL_PREFIX}::other:'
+        assert key_schema(UserModel).prefix == f'{REDIS_MODEL_PREFIX}::user:'
+
+    def test_parse(self):
+        schema = key_schema(UserModel)
+        assert schema.parse(UserModel.redis_key_from_value('a:b')) \
+               == ParsedKey(MODEL_KEY, UserModel, None, 'a:b')
+        assert schema.parse(UserModel.registry_key()) \
+               == ParsedKey(REGISTRY_KEY, UserModel)
+        assert schema.parse(SingleIndexEmail.redis_key()) \
+               == ParsedKey(INDEX_KEY, UserModel, SingleIndexEmail)
+        assert schema.parse(SetIndexGroupID.redis_key_from_value('1:2')) \
+               == ParsedKey(INDEX_KEY, UserModel, SetIndexGroupID, '1:2')
+        assert schema.parse(
+            BucketLayout().storage_key(UserModel, 1234)
+        ) == ParsedKey(BUCKET_KEY, UserModel, None, 12)
+        assert schema.parse(f'{REDIS_MODEL_PREFIX}::user::unknown') is None
+        assert schema.parse('user:1') is None
+
+    def test_parse_key(self):
+        models = [UserModel, NoPrefixUserModel, MemberModel]
+        assert parse_key('user:1', models) \
+               == ParsedKey(MODEL_KEY, NoPrefixUserModel, None, '1')
+        assert parse_key(MemberModel.redis_key_from_value(1000), models) \
+               == ParsedKey(MODEL_KEY, MemberModel, None, 1000)
+        assert parse_key(
+            MemberGroupIndex.redis_key_from_value(1), models
+        ) == ParsedKey(INDEX_KEY, MemberModel, MemberGroupIndex, '1')
+        assert parse_key('other:1', models) is None
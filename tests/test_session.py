@@ -0,0 +1,98 @@
+import pytest
+from redis.exceptions import ResponseError
+
+from RSO.session import Session
+from .models.redispy import (
+    UserModel,
+    ListIndexQueue,
+    SetIndexGroupID,
+    SingleIndexEmail,
+)
+
+
+class TestSession:
+    def test_identity_map(self, sync_redis):
+        UserModel(user_id=1, username='username').save(sync_redis)
+
+        session = Session(sync_redis)
+        user = session.search(UserModel, 1)
+        sync_redis.delete(user.redis_key)
+        assert session.search(UserModel, 1) is user
+        assert session.search(UserModel, 2) is None
+
+        users = session.get_many(UserModel, [2, 1, 3])
+        assert users == [None, user, None]
+
+    def test_flush_once(self, sync_redis):
+        with Session(sync_redis) as session:
+            user = UserModel(user_id=1, username='username', queue_id=3)
+            session.add(user)
+            session.add(user)
+            assert user in session
+            assert session.search(UserModel, 1) is user
+            assert not user.is_exists(sync_redis)
+
+        assert user.is_exists(sync_redis)
+        assert ListIndexQueue.get_members(sync_redis, 3) == ['1']
+
+    def test_save_then_delete(self, sync_redis):
+        UserModel(user_id=1, username='username', group_id=1).save(sync_redis)
+
+        with Session(sync_redis, transaction=True) as session:
+            user = session.search(UserModel, 1)
+            user.group_id = 2
+            session.add(user)
+            session.add(UserModel(user_id=2, username='username_2'))
+            session.delete(user)
+            assert session.search(UserModel, 1) is None
+
+        assert UserModel.search(sync_redis, 1) is None
+        assert UserModel.search(sync_redis, 2) is not None
+        assert SetIndexGroupID.get_members(sync_redis, 1) == set()
+        assert SetIndexGroupID.get_members(sync_redis, 2) == set()
+
+    def test_delete_then_save(self, sync_redis):
+        UserModel(
+            user_id=1, username='username', email='old@email'
+        ).save(sync_redis)
+
+        with Session(sync_redis) as session:
+            user = session.search(UserModel, 1)
+            session.delete(user)
+            user.email = 'new@email'
+            session.add(user)
+
+        user = UserModel.search(sync_redis, 1)
+        assert user.username == 'username'
+        assert user.email == 'new@email'
+        assert SingleIndexEmail.search_model(sync_redis, 'new@email') \
+               is not None
+
+    def test_flush_failure(self, sync_redis):
+        UserModel(user_id=1, username='username', group_id=1).save(sync_redis)
+        group_key = SetIndexGroupID.redis_key_from_value(2)
+        sync_redis.set(group_key, 'not a set')
+
+        session = Session(sync_redis)
+        user = session.search(UserModel, 1)
+        user.group_id = 2
+        session.add(user)
+        session.add(UserModel(user_id=2, username='username_2'))
+        with pytest.raises(ResponseError):
+            session.flush()
+        # only the failed model is queued again
+        assert user in session
+        assert UserModel(user_id=2, username='username_2') not in session
+
+        sync_redis.delete(group_key)
+        session.flush()
+        assert SetIndexGroupID.get_members(sync_redis, 1) == set()
+        assert SetIndexGroupID.get_members(sync_redis, 2) == {'1'}
+
+    def test_rollback(self, sync_redis):
+        with pytest.raises(ValueError):
+            with Session(sync_redis) as session:
+                session.add(UserModel(user_id=1, username='username'))
+                raise ValueError
+
+        assert UserModel.search(sync_redis, 1) is None
@@ -0,0 +1,157 @@
+import pytest
+
+from RSO.sharding import HashRing, ShardedRedis, rebalance
+from tests.test_cluster import TaggedIndexEmail, TaggedUserModel
+from .models.redispy import (
+    UserModel,
+    SetIndexGroupID,
+    SingleIndexEmail,
+)
+from .data import USERS
+
+
+def sharded(clients: list) -> ShardedRedis:
+    return ShardedRedis({
+        f'node{number}': client for number, client in enumerate(clients)
+    })
+
+
+def node_keys(node) -> set:
+    return set(node.redis.scan_iter())
+
+
+class TestHashRing:
+    def test_distribution(self):
+        ring = HashRing()
+        for name in ('a', 'b', 'c'):
+            ring.add(name)
+        keys = [f'key:{number}' for number in range(3000)]
+        owners = {key: ring.get(key) for key in keys}
+        for name in ('a', 'b', 'c'):
+            assert 600 < list(owners.values()).count(name) < 1400
+
+        ring.add('d')
+        moved = [key for key in keys if ring.get(key) != owners[key]]
+        assert {ring.get(key) for key in moved} == {'d'}
+        assert 400 < len(moved) < 1200
+
+        ring.remove('d')
+        assert {key: ring.get(key) for key in keys} == owners
+
+    def test_hash_tag(self):
+        ring = HashRing()
+        for name in ('a', 'b', 'c'):
+            ring.add(name)
+        assert len({ring.get(f'{{tag}}:{number}') for number in range(50)}) \
+               == 1
+
+
+class TestShardedRedis:
+    def test_commands(self, sync_shards):
+        redis = sharded(sync_shards)
+        keys = [f'key:{number}' for number in range(30)]
+        for key in keys:
+            redis.set(key, key)
+        assert redis.get(keys[0]) == keys[0]
+        assert redis.dbsize() == len(keys)
+        assert all(node_keys(node) for node in redis.get_primaries())
+        assert redis.delete(*keys[:20]) == 20
+        assert sorted(redis.keys('key:*')) == sorted(keys[20:])
+
+        redis.sadd('{set}:a', 1, 2)
+        redis.sadd('{set}:b', 2, 3)
+        assert redis.sinter('{set}:a', '{set}:b') == {'2'}
+        with pytest.raises(RuntimeError):
+            redis.sinter(*keys)
+
+    def test_keyless_commands(self, sync_shards):
+        redis = sharded(sync_shards)
+        assert redis.ping()
+        assert len(redis.time()) == 2
+        assert redis.client_id() == redis.get_primaries()[0].redis.client_id()
+        assert redis.echo('text') == 'text'
+        with pytest.raises(RuntimeError):
+            redis.execute_command('SAVE')
+
+    def test_pipeline(self, sync_shards):
+        redis = sharded(sync_shards)
+        keys = [f'key:{number}' for number in range(30)]
+        with redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.set(key, key)
+            pipe.delete(*keys[:10])
+            for key in keys:
+                pipe.get(key)
+            result = pipe.execute()
+        assert result[len(keys)] == 10
+        assert result[len(keys) + 1:] == [None] * 10 + keys[10:]
+
+        with redis.pipeline(transaction=True) as pipe:
+            for key in keys:
+                pipe.get(key)
+            with pytest.raises(RuntimeError):
+                pipe.execute()
+
+
+class TestShardedModel:
+    def test_model(self, sync_shards):
+        redis = sharded(sync_shards)
+        users = [UserModel(**data) for data in USERS]
+        assert UserModel.save_many(redis, users) == []
+
+        assert UserModel.search(redis, 1) == users[0]
+        assert sorted(
+            UserModel.all(redis), key=lambda user: user.user_id
+        ) == users
+        assert UserModel.count(redis) == len(users)
+        assert SingleIndexEmail.search_model(redis, users[1].email) \
+               == users[1]
+        assert SetIndexGroupID.get_members(redis, 1) == {'1', '2', '3'}
+
+        users[0].delete(redis)
+        assert UserModel.delete_many(redis, [2, 3, 4]) == 3
+        assert UserModel.all(redis) == [users[4]]
+        with pytest.raises(RuntimeError):
+            UserModel.save_many(redis, users, transactional=True)
+
+    def test_hash_tag(self, sync_shards):
+        redis = sharded(sync_shards)
+        users = [TaggedUserModel(**data) for data in USERS]
+        assert TaggedUserModel.save_many(
+            redis, users, transactional=True
+        ) == []
+        assert [bool(node_keys(node)) for node in redis.get_primaries()] \
+               .count(True) == 1
+        assert TaggedUserModel.all(redis) == users
+        assert TaggedIndexEmail.search_model(redis, users[1].email) \
+               == users[1]
+
+    def test_rebalance(self, sync_shards):
+        redis = sharded(sync_shards[:2])
+        users = [
+            UserModel(user_id=user_id, username=f'user_{user_id}',
+                      group_id=user_id % 3)
+            for user_id in range(100)
+        ]
+        UserModel.save_many(redis, users)
+        redis.set('expiring', 1, ex=100)
+        total = redis.dbsize()
+
+        redis.add_node('node2', sync_shards[2])
+        assert None in UserModel.get_many(redis, range(100))
+        moved = rebalance(redis, count=10)
+        assert 0 < moved < total
+        assert rebalance(redis) == 0
+        assert redis.dbsize() == total
+        for node in redis.get_primaries():
+            assert node_keys(node)
+            for key in node_keys(node):
+                assert redis.get_node_from_key(key) == node
+
+        assert sorted(
+            UserModel.all(redis), key=lambda user: user.user_id
+        ) == users
+        assert SetIndexGroupID.get_members(redis, 1) == {
+            str(user_id) for user_id in range(1, 100, 3)
+        }
+        assert 0 < redis.ttl('expiring') <= 100
@@ -0,0 +1,86 @@
+import time
+
+import pytest
+from redis import Redis
+
+from RSO.tracking import TrackingCache
+from .conftest import REDIS_DB, REDIS_PASS
+from .models.redispy import UserModel, SingleIndexEmail
+
+
+def wait_for(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def cache(sync_redis, monkeypatch):
+    cache = TrackingCache(ttl=None, negative_ttl=None, retry_interval=0.1)
+    monkeypatch.setattr(UserModel, '__cache__', cache)
+    cache.start(sync_redis, UserModel)
+    yield cache
+    cache.stop()
+
+
+class TestTrackingCache:
+    def test_other_client_write(self, sync_redis, cache):
+        user = UserModel(user_id=1, username='username', email='old@email')
+        user.save(sync_redis)
+        assert UserModel.search(sync_redis, 1).email == 'old@email'
+        assert UserModel.search(sync_redis, 1).email == 'old@email'
+        assert cache.hits == 1
+
+        # not through the model, as another process would do
+        sync_redis.hset(user.redis_key, 'email', 'new@email')
+        assert wait_for(
+            lambda: UserModel.search(sync_redis, 1).email == 'new@email'
+        )
+
+    def test_index_not_found(self, sync_redis, cache):
+        assert SingleIndexEmail.search_model(sync_redis, 'new@email') is None
+        assert SingleIndexEmail.search_model(sync_redis, 'new@email') is None
+        assert cache.hits == 1
+
+        sync_redis.hset(UserModel.redis_key_from_value(1), mapping={
+            'user_id': 1, 'username': 'username', 'email': 'new@email'
+        })
+        sync_redis.hset(SingleIndexEmail.redis_key(), 'new@email', 1)
+        assert wait_for(
+            lambda: SingleIndexEmail.search_model(sync_redis, 'new@email')
+            is not None
+        )
+
+    def test_reconnect(self, sync_redis, cache):
+        UserModel(user_id=1, username='username').save(sync_redis)
+        assert UserModel.search(sync_redis, 1) is not None
+
+        for client in sync_redis.client_list():
+            if 't' in client['flags']:
+                sync_redis.client_kill_filter(_id=client['id'])
+        assert wait_for(lambda: len(cache) == 0)
+        sync_redis.delete(UserModel.redis_key_from_value(1))
+        assert wait_for(lambda: UserModel.search(sync_redis, 1) is None)
+
+    def test_resp2(self, sync_redis, monkeypatch):
+        redis = Redis(
+            db=REDIS_DB, password=REDIS_PASS, decode_responses=True,
+            protocol=2
+        )
+        cache = TrackingCache(ttl=None, retry_interval=0.1)
+        monkeypatch.setattr(UserModel, '__cache__', cache)
+        cache.start(redis, UserModel)
+        try:
+            user = UserModel(user_id=1, username='username', email='old@email')
+            user.save(redis)
+            assert UserModel.search(redis, 1).email == 'old@email'
+
+            sync_redis.hset(user.redis_key, 'email', 'new@email')
+            assert wait_for(
+                lambda: UserModel.search(redis, 1).email == 'new@email'
+            )
+        finally:
+            cache.stop()
@@ -1,13 +1,23 @@
+from dataclasses import dataclass
 from datetime import date
+from typing import Optional
 
 import pytest_twisted
 
+from RSO.query import Match
+from RSO.txredisapi.index import HashIndex, SetIndex
+from RSO.txredisapi.model import Model
+from RSO.txredisapi.query import Query
+from tests.models.const import REDIS_MODEL_PREFIX
+
 from ..models.txredisapi import (
+    BirthDateUserModel,
     UserModel,
     ListIndexQueue,
     SingleIndexUsername,
     SingleIndexEmail,
     SetIndexGroupID,
+    SortedSetIndexBirthDate,
 )
 
 
@@ -170,6 +180,22 @@ class TestHashIndex:
         res = yield SingleIndexEmail.search_model(tx_redis, user.email)
         assert isinstance(res, UserModel)
 
+    @pytest_twisted.inlineCallbacks
+    def test_search_model_fields(self, tx_redis):
+        user = UserModel(
+            user_id=1,
+            username='username',
+            email='test@create.success',
+        )
+        yield user.save(tx_redis)
+
+        res = yield SingleIndexUsername.search_model(tx_redis, user.username)
+        assert res.username == user.username
+        assert res.email == user.email
+
+        res = yield SingleIndexUsername.search_model(tx_redis, 'not_exist')
+        assert res is None
+
     @pytest_twisted.inlineCallbacks
     def search_model_not_found(self, tx_redis):
         res = yield SingleIndexUsername.search_model(tx_redis, 'not_exist')
@@ -222,3 +248,195 @@ class TestSetIndex:
 
         assert isinstance(res, list)
         assert len(res) == 0
+
+    @pytest_twisted.inlineCallbacks
+    def test_search_models_chunked(self, tx_redis):
+        for user_id in range(1, 41):
+            user = UserModel(
+                user_id=user_id, username=f'username_{user_id}', group_id=10
+            )
+            yield user.save(tx_redis)
+
+        res = yield SetIndexGroupID.search_models(tx_redis, 10, chunk_size=7)
+        assert len(res) == 40
+        assert {user.username for user in res} == {
+            f'username_{user_id}' for user_id in range(1, 41)
+        }
+
+    @pytest_twisted.inlineCallbacks
+    def test_delete_members(self, tx_redis):
+        for user_id in range(1, 4):
+            user = UserModel(
+                user_id=user_id, username=f'username_{user_id}',
+                group_id=10 if user_id < 3 else 11
+            )
+            yield user.save(tx_redis)
+
+        res = yield SetIndexGroupID.delete_members(tx_redis, 10)
+        assert res == 2
+        res = yield tx_redis.exists(SetIndexGroupID.redis_key_from_value(10))
+        assert not res
+        res = yield SingleIndexUsername.search_model(tx_redis, 'username_1')
+        assert res is None
+        res = yield SetIndexGroupID.search_models(tx_redis, 11)
+        assert len(res) == 1
+
+
+class TestSortedSetIndex:
+    @pytest_twisted.inlineCallbacks
+    def test_range_models(self, tx_redis):
+        users = [
+            BirthDateUserModel(
+                user_id=user_id, username=f'username_{user_id}',
+                birth_date=date(1990 + user_id, 1, 1)
+            )
+            for user_id in range(1, 6)
+        ]
+        for user in users:
+            yield user.save(tx_redis)
+
+        res = yield SortedSetIndexBirthDate.range_models(tx_redis)
+        assert res == users
+        res = yield SortedSetIndexBirthDate.range_models(
+            tx_redis, date(1992, 1, 1), date(1994, 1, 1)
+        )
+        assert res == users[1:4]
+        res = yield SortedSetIndexBirthDate.range_models(
+            tx_redis, offset=1, limit=2, reverse=True
+        )
+        assert res == [users[3], users[2]]
+        res = yield SortedSetIndexBirthDate.count_range(
+            tx_redis, max=date(1992, 1, 1)
+        )
+        assert res == 2
+
+        yield users[1].delete(tx_redis)
+        res = yield SortedSetIndexBirthDate.range_members(
+            tx_redis, date(1992, 1, 1)
+        )
+        assert res == [3, 4, 5]
+
+
+class TestPagination:
+    @pytest_twisted.inlineCallbacks
+    def test_list_index(self, tx_redis):
+        for user_id in range(1, 8):
+            user = UserModel(
+                user_id=user_id, username=f'username_{user_id}', queue_id=3
+            )
+            yield user.save(tx_redis)
+
+        members, cursor = yield ListIndexQueue.page_members(
+            tx_redis, 3, count=4
+        )
+        assert members == [7, 6, 5, 4]
+        models, cursor = yield ListIndexQueue.page_models(
+            tx_redis, 3, cursor, count=4
+        )
+        assert [user.user_id for user in models] == [3, 2, 1]
+        assert cursor is None
+
+    @pytest_twisted.inlineCallbacks
+    def test_set_index(self, tx_redis):
+        for user_id in range(1, 101):
+            user = UserModel(
+                user_id=user_id, username=f'username_{user_id}', group_id=3
+            )
+            yield user.save(tx_redis)
+
+        models, cursor = [], None
+        while True:
+            page, cursor = yield SetIndexGroupID.page_models(
+                tx_redis, 3, cursor, count=30
+            )
+            models.extend(page)
+            if cursor is None:
+                break
+        assert {user.user_id for user in models} == set(range(1, 101))
+
+
+@dataclass
+class AccountModel(Model):
+    __prefix__ = REDIS_MODEL_PREFIX
+    __model_name__ = 'account'
+    __key__ = 'account_id'
+
+    account_id: int
+    tenant: str
+    email: Optional[str] = None
+    group_id: Optional[int] = None
+    active: bool = True
+
+
+class AccountTenantEmailIndex(HashIndex):
+    __prefix__ = REDIS_MODEL_PREFIX
+    __model__ = AccountModel
+    __key__ = ('tenant', 'email')
+
+
+class AccountGroupActiveIndex(SetIndex):
+    __prefix__ = REDIS_MODEL_PREFIX
+    __model__ = AccountModel
+    __key__ = ('group_id', 'active')
+
+
+AccountModel.__indexes__ = [AccountTenantEmailIndex, AccountGroupActiveIndex]
+
+
+class TestCompoundIndex:
+    @pytest_twisted.inlineCallbacks
+    def test_compound_index(self, tx_redis):
+        accounts = [
+            AccountModel(
+                account_id=account_id, tenant=f'tenant_{account_id % 2}',
+                email=f'{account_id}@email', group_id=1,
+                active=account_id < 4
+            )
+            for account_id in range(1, 6)
+        ]
+        for account in accounts:
+            yield account.save(tx_redis)
+
+        res = yield AccountTenantEmailIndex.search_model(
+            tx_redis, ('tenant_1', '3@email')
+        )
+        assert res == accounts[2]
+        res = yield AccountGroupActiveIndex.get_members(tx_redis, (1, True))
+        assert res == {1, 2, 3}
+
+        account = yield AccountModel.search(tx_redis, 1)
+        account.active = False
+        yield account.save(tx_redis)
+        yield accounts[1].delete(tx_redis)
+        res = yield AccountModel.delete_many(tx_redis, [3, 4])
+        assert res == 2
+        res = yield AccountGroupActiveIndex.get_members(tx_redis, (1, True))
+        assert res == set()
+        res = yield AccountGroupActiveIndex.search_models(
+            tx_redis, (1, False)
+        )
+        assert sorted(account.account_id for account in res) == [1, 5]
+
+
+class TestQuery:
+    @pytest_twisted.inlineCallbacks
+    def test_query(self, tx_redis):
+        for user_id in range(1, 6):
+            user = UserModel(
+                user_id=user_id, username=f'username_{user_id}',
+                group_id=user_id % 2
+            )
+            yield user.save(tx_redis)
+        group_0 = Match(SetIndexGroupID, 0)
+        group_1 = Match(SetIndexGroupID, 1)
+
+        res = yield Query(group_0 | group_1).ids(tx_redis, offset=1, limit=3)
+        assert res == [2, 3, 4]
+        res = yield Query(group_0 & group_1).count(tx_redis)
+        assert res == 0
+
+        query = Query(group_1 - group_0, ttl=60)
+        res = yield query.models(tx_redis, limit=2)
+        assert [user.user_id for user in res] == [1, 3]
+        res = yield query.count(tx_redis)
+        assert res == 3
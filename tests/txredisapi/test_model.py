@@ -1,7 +1,9 @@
 from datetime import date
 
+import pytest
 import pytest_twisted
 
+from RSO.layout import BucketLayout, MsgpackLayout, StructLayout
 from RSO.txredisapi.index import HashIndex
 from ..data import USERS
 from ..models.txredisapi import (
@@ -10,6 +12,7 @@ from ..models.txredisapi import (
     SingleIndexUsername,
     SingleIndexEmail,
     SetIndexGroupID,
+    RegistryUserModel,
 )
 
 
@@ -77,6 +80,164 @@ class TestModelGet:
         assert len(result) == len(USERS)
         assert isinstance(result[0], UserModel)
 
+    @pytest_twisted.inlineCallbacks
+    def test_scan_page(self, tx_redis):
+        for data in USERS:
+            user = UserModel(**data)
+            yield user.save(tx_redis)
+
+        users = []
+        cursor, result = yield UserModel.scan_page(tx_redis, count=2)
+        users.extend(result)
+        while cursor:
+            cursor, result = yield UserModel.scan_page(
+                tx_redis, cursor, count=2
+            )
+            users.extend(result)
+
+        assert all(isinstance(user, UserModel) for user in users)
+        assert {user.username for user in users} == {
+            data['username'] for data in USERS
+        }
+
+    @pytest_twisted.inlineCallbacks
+    def test_get_many(self, tx_redis):
+        for data in USERS:
+            user = UserModel(**data)
+            yield user.save(tx_redis)
+
+        result = yield UserModel.get_many(
+            tx_redis, [3, 100, 1, 2], chunk_size=2
+        )
+        assert len(result) == 4
+        assert result[0].username == 'third_user'
+        assert result[1] is None
+        assert result[2].username == 'first_user'
+        assert result[3].username == 'second_user'
+
+
+class TestModelSaveMany:
+    @pytest_twisted.inlineCallbacks
+    def test_success(self, tx_redis):
+        users = [UserModel(**data) for data in USERS]
+        res = yield UserModel.save_many(tx_redis, users, chunk_size=2)
+        assert res == []
+
+        res = yield UserModel.count(tx_redis)
+        assert res == len(USERS)
+        res = yield SingleIndexUsername.search_model(tx_redis, 'fifth_user')
+        assert isinstance(res, UserModel)
+
+    @pytest_twisted.inlineCallbacks
+    def test_chunk_failure(self, tx_redis):
+        users = [UserModel(**data) for data in USERS]
+        yield tx_redis.set(users[2].redis_key, 'not a hash')
+
+        failures = yield UserModel.save_many(tx_redis, users, chunk_size=2)
+        assert len(failures) == 1
+        assert failures[0][0] == users[2:4]
+
+        res = yield UserModel.search(tx_redis, 5)
+        assert isinstance(res, UserModel)
+
+
+class TestModelUpdate:
+    @pytest_twisted.inlineCallbacks
+    def test_changed_fields_only(self, tx_redis):
+        yield UserModel(
+            user_id=1, username='username', email='old@email', group_id=1
+        ).save(tx_redis)
+
+        user = yield UserModel.search(tx_redis, 1)
+        user.email = 'new@email'
+        user.group_id = 2
+        yield user.save(tx_redis)
+
+        res = yield SingleIndexEmail.search_model(tx_redis, 'old@email')
+        assert res is None
+        res = yield SingleIndexEmail.search_model(tx_redis, 'new@email')
+        assert isinstance(res, UserModel)
+        res = yield SetIndexGroupID.get_members(tx_redis, 1)
+        assert len(res) == 0
+        res = yield SetIndexGroupID.get_members(tx_redis, 2)
+        assert len(res) == 1
+
+    @pytest_twisted.inlineCallbacks
+    def test_removed_field(self, tx_redis):
+        yield UserModel(
+            user_id=1, username='username', group_id=1
+        ).save(tx_redis)
+
+        user = yield UserModel.search(tx_redis, 1)
+        user.group_id = None
+        yield user.save(tx_redis)
+
+        res = yield tx_redis.hexists(user.redis_key, 'group_id')
+        assert not res
+        res = yield SetIndexGroupID.get_members(tx_redis, 1)
+        assert len(res) == 0
+
+    @pytest_twisted.inlineCallbacks
+    def test_save_new_then_change(self, tx_redis):
+        user = UserModel(
+            user_id=1, username='username', email='old@email', group_id=1
+        )
+        yield user.save(tx_redis)
+        user.email = None
+        user.group_id = 2
+        yield user.save(tx_redis)
+
+        res = yield tx_redis.hexists(user.redis_key, 'email')
+        assert not res
+        res = yield tx_redis.hkeys(SingleIndexEmail.redis_key())
+        assert res == []
+        res = yield SetIndexGroupID.get_members(tx_redis, 1)
+        assert len(res) == 0
+        res = yield SetIndexGroupID.get_members(tx_redis, 2)
+        assert len(res) == 1
+
+
+class TestModelRegistry:
+    @pytest_twisted.inlineCallbacks
+    def test_all_and_count(self, tx_redis):
+        res = yield RegistryUserModel.count(tx_redis)
+        assert res == 0
+
+        for data in USERS:
+            yield RegistryUserModel(**data).save(tx_redis)
+        yield UserModel(**USERS[0]).save(tx_redis)
+
+        res = yield RegistryUserModel.count(tx_redis)
+        assert res == len(USERS)
+        users = yield RegistryUserModel.all(tx_redis)
+        assert [user.username for user in users] == [
+            data['username'] for data in USERS
+        ]
+
+        users = yield RegistryUserModel.page(tx_redis, offset=1, limit=2)
+        assert [user.username for user in users] == [
+            'second_user', 'third_user'
+        ]
+        users = yield RegistryUserModel.random(tx_redis, 2)
+        assert len(users) == 2
+
+        yield users[0].delete(tx_redis)
+        res = yield RegistryUserModel.count(tx_redis)
+        assert res == len(USERS) - 1
+
+    @pytest_twisted.inlineCallbacks
+    def test_build_registry(self, tx_redis):
+        for data in USERS:
+            yield RegistryUserModel(**data).save(tx_redis)
+        yield tx_redis.delete(RegistryUserModel.registry_key())
+
+        res = yield RegistryUserModel.build_registry(tx_redis)
+        assert res == len(USERS)
+        res = yield UserModel.count(tx_redis)
+        assert res == 0
+        res = yield RegistryUserModel.count(tx_redis)
+        assert res == len(USERS)
+
 
 class TestModelDelete:
     @pytest_twisted.inlineCallbacks
@@ -153,3 +314,56 @@ class TestModelDelete:
 
         res = yield tx_redis.exists(user.redis_key)
         assert bool(res) is False, f'res={res}'
+
+    @pytest_twisted.inlineCallbacks
+    def test_delete_many(self, tx_redis):
+        for data in USERS:
+            yield UserModel(**data).save(tx_redis)
+
+        deleted = yield UserModel.delete_many(
+            tx_redis, [1, UserModel(**USERS[1]), 100]
+        )
+        assert deleted == 2
+        res = yield SingleIndexUsername.search_model(tx_redis, 'first_user')
+        assert res is None
+        res = yield SetIndexGroupID.get_members(tx_redis, 1)
+        assert res == {3}
+
+        deleted = yield UserModel.delete_many(tx_redis, [3, 4, 5])
+        assert deleted == 3
+        res = yield tx_redis.keys('*')
+        assert res == []
+
+
+class TestModelLayout:
+    @pytest.mark.parametrize(
+        'layout_class', [MsgpackLayout, StructLayout, BucketLayout]
+    )
+    @pytest_twisted.inlineCallbacks
+    def test_packed(self, tx_redis, monkeypatch, layout_class):
+        layout = layout_class()
+        monkeypatch.setattr(UserModel, '__layout__', layout)
+        for data in USERS:
+            yield UserModel(**data).save(tx_redis)
+
+        user = yield UserModel.search(tx_redis, 1)
+        assert user.username == 'first_user'
+        res = yield tx_redis.type(layout.storage_key(UserModel, 1))
+        assert res == ('hash' if layout.bucketed else 'string')
+        res = yield user.is_exist(tx_redis)
+        assert res is True
+        res = yield UserModel.all(tx_redis)
+        assert len(res) == len(USERS)
+        res = yield SingleIndexEmail.search_model(tx_redis, user.email)
+        assert res.user_id == 1
+        res = yield SetIndexGroupID.search_models(tx_redis, 1)
+        assert len(res) == 3
+
+        user.username = 'new_username'
+        yield user.save(tx_redis)
+        res = yield UserModel.search(tx_redis, 1)
+        assert res.username == 'new_username'
+        deleted = yield UserModel.delete_many(tx_redis, [1, 2])
+        assert deleted == 2
+        res = yield SetIndexGroupID.get_members(tx_redis, 1)
+        assert res == {3}